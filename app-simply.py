@@ -1,54 +1,67 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Blueprint, Flask, request, jsonify, session, Response, stream_with_context
 import requests
 import os
 import json
-from dotenv import load_dotenv
 from datetime import datetime
 from flask_cors import CORS
 import logging
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+import assets
+import batch
+import bootstrap
+import budget
+import cache
+import coalesce
+import compression
+import eventlog
+import fastjson
+import history
+import jobs
+import limits
+import metrics
+import postprocess
+import prompts
+import resilience
+import streaming
+import tenants
+import upstream
+import variants
+
 logger = logging.getLogger(__name__)
+# Eventos do caminho quente: JSON amostrado, escrito fora da requisição
+log = eventlog.get_logger("app-simply")
 
-# Carregar variáveis de ambiente
-load_dotenv()
+# Carregar variáveis de ambiente (uma vez por processo)
+bootstrap.load_env()
 
-app = Flask(__name__)
-CORS(app)  # Habilitar CORS para segurança
-app.secret_key = os.getenv("FLASK_SECRET_KEY", os.urandom(24).hex())
+# Rotas da aplicação; create_app() as registra numa aplicação nova
+routes = Blueprint("generation", __name__)
 
 # Configurações da API
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "openai/gpt-4o-mini")  # Modelo econômico para testes
 
-# Verificar configuração
-if not OPENROUTER_API_KEY:
-    logger.warning("⚠️  OPENROUTER_API_KEY não configurada no .env")
-    logger.warning("   Obtenha uma chave gratuita em: https://openrouter.ai")
-    logger.warning("   Adicione ao .env: OPENROUTER_API_KEY=sua_chave_aqui")
-
-# Templates de prompt otimizados
+# Templates de prompt otimizados (hashtags: faixa esperada, usada na nota das variantes)
 PLATFORM_CONFIGS = {
     "LinkedIn": {
         "prompt": "Crie um post profissional para LinkedIn com:\n1. Gancho impactante\n2. Insights práticos\n3. Dados relevantes\n4. Call-to-action claro\n5. 3-5 hashtags estratégicas",
-        "max_tokens": 400,
-        "temperature": 0.7
+        "temperature": 0.7,
+        "hashtags": (3, 5)
     },
     "Instagram": {
         "prompt": "Crie um post para Instagram com:\n1. Emojis estratégicos\n2. Texto conciso (máx 2200 chars)\n3. Pergunta engajadora\n4. Hashtags populares (5-10)\n5. Linguagem descontraída",
-        "max_tokens": 300,
-        "temperature": 0.8
+        "temperature": 0.8,
+        "hashtags": (5, 10)
     },
     "Facebook": {
         "prompt": "Crie um post para Facebook com:\n1. Título intrigante\n2. Texto conversacional\n3. Perguntas para interação\n4. Chamada para compartilhamento\n5. Hashtags moderadas",
-        "max_tokens": 500,
-        "temperature": 0.7
+        "temperature": 0.7,
+        "hashtags": (1, 3)
     },
     "Twitter/X": {
         "prompt": "Crie uma thread (2-3 tweets) para Twitter com:\n1. Tweet 1: Gancho + ponto principal\n2. Tweet 2: Dado ou exemplo\n3. Tweet 3: Conclusão + CTA\n4. Hashtags populares (2-3)\n5. Mencionar @perfis_relevantes se aplicável",
-        "max_tokens": 350,
-        "temperature": 0.75
+        "temperature": 0.75,
+        "hashtags": (2, 3)
     }
 }
 
@@ -61,63 +74,124 @@ TONES = {
     "Descontraído": "linguagem coloquial, primeira pessoa, tom pessoal"
 }
 
-@app.route('/')
-def home():
-    """Página principal"""
-    return render_template('index.html')
+# Palavras e max_tokens por plataforma/extensão ficam em budget.py
+LENGTHS = tuple(budget.LENGTH_WORDS)
 
-@app.route('/health')
-def health_check():
-    """Endpoint de verificação de saúde"""
-    return jsonify({
+# Templates predefinidos (usados por /templates)
+TEMPLATES = [
+    {
+        "id": "linkedin_leadership",
+        "name": "Liderança no LinkedIn",
+        "platform": "LinkedIn",
+        "tone": "Profissional",
+        "length": "medio",
+        "description": "Post para posicionar líderes e especialistas",
+        "example_topic": "Como desenvolver uma cultura de inovação na sua equipe"
+    },
+    {
+        "id": "instagram_promo",
+        "name": "Promoção no Instagram",
+        "platform": "Instagram",
+        "tone": "Descontraído",
+        "length": "curto",
+        "description": "Anúncio de produto/serviço com alto engajamento",
+        "example_topic": "Lançamento do novo curso de Marketing Digital"
+    },
+    {
+        "id": "facebook_community",
+        "name": "Engajamento no Facebook",
+        "platform": "Facebook",
+        "tone": "Conversacional",
+        "length": "longo",
+        "description": "Post para gerar discussão e interação",
+        "example_topic": "Quais são os maiores desafios do home office hoje?"
+    },
+    {
+        "id": "twitter_thread",
+        "name": "Thread Educativa",
+        "platform": "Twitter/X",
+        "tone": "Técnico",
+        "length": "medio",
+        "description": "Thread para ensinar um conceito complexo",
+        "example_topic": "5 conceitos de IA que todo profissional deveria conhecer"
+    }
+]
+
+
+def health_payload():
+    return {
         "status": "healthy",
         "api_configured": bool(OPENROUTER_API_KEY),
-        "model": OPENROUTER_MODEL
-    })
+        "model": OPENROUTER_MODEL,
+        "limits": limits.stats(upstream.get_client().limiter)
+    }
 
-@app.route('/generate', methods=['POST'])
-def generate_content():
-    """Endpoint principal para geração de conteúdo"""
-    try:
-        # Validar entrada
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "Nenhum dado recebido"}), 400
-        
-        # Extrair parâmetros
-        platform = data.get('platform', 'LinkedIn')
-        tone = data.get('tone', 'Profissional')
-        topic = data.get('topic', '').strip()
-        length = data.get('length', 'medio')
-        keywords = data.get('keywords', '')
-        
-        # Validações
-        if not topic:
-            return jsonify({"error": "O tema é obrigatório"}), 400
-        
-        if len(topic) > 150:
-            return jsonify({"error": "Tema muito longo (máximo 150 caracteres)"}), 400
-        
-        if not OPENROUTER_API_KEY:
-            return jsonify({"error": "API não configurada. Configure OPENROUTER_API_KEY no arquivo .env"}), 500
-        
-        # Log da requisição
-        logger.info(f"Gerando conteúdo para: {platform} | Tom: {tone} | Tema: {topic[:30]}...")
-        
-        # Configurar parâmetros baseados na plataforma
-        platform_config = PLATFORM_CONFIGS.get(platform, PLATFORM_CONFIGS['LinkedIn'])
-        
-        # Construir prompt otimizado
-        prompt = f"""
+
+# Corpo de /templates e parte fixa de /stats, montados uma vez
+TEMPLATES_BODY = fastjson.dumps({"templates": TEMPLATES}) + b"\n"
+TEMPLATES_ETAG = compression.weak_etag(TEMPLATES_BODY)
+STATS_STATIC = {
+    "status": "operational",
+    "version": "1.0.0",
+    "supported_platforms": list(PLATFORM_CONFIGS.keys()),
+    "supported_tones": list(TONES.keys()),
+    "model": OPENROUTER_MODEL,
+    "api_configured": bool(OPENROUTER_API_KEY)
+}
+
+
+def stats_payload():
+    import semantic
+
+    return dict(
+        STATS_STATIC,
+        cache=cache.stats(),
+        semantic_cache=semantic.stats(),
+        coalescing=coalesce.stats(),
+        jobs=jobs.stats(),
+        resilience=resilience.stats(),
+        prompt_templates=(PREFIX_CATALOG if PROMPT_LAYOUT == "prefix" else PROMPT_CATALOG).stats(),
+        prompt_cache=dict(metrics.prompt_cache_stats(), layout=PROMPT_LAYOUT)
+    )
+
+SYSTEM_MESSAGE = "Você é um redator especialista em marketing digital com 10 anos de experiência. Crie conteúdo original, persuasivo e otimizado para cada plataforma."
+
+
+def parse_generation_request(data):
+    """Extrai e valida os parâmetros de geração; retorna (params, mensagem_de_erro)"""
+    if not data:
+        return None, "Nenhum dado recebido"
+    
+    # Extrair parâmetros
+    params = {
+        "platform": data.get('platform', 'LinkedIn'),
+        "tone": data.get('tone', 'Profissional'),
+        "topic": data.get('topic', '').strip(),
+        "length": data.get('length', 'medio'),
+        "keywords": data.get('keywords', '')
+    }
+    
+    # Validações
+    if not params['topic']:
+        return None, "O tema é obrigatório"
+    
+    if len(params['topic']) > 150:
+        return None, "Tema muito longo (máximo 150 caracteres)"
+    
+    return params, None
+
+
+def prompt_layout(platform, tone, length):
+    """Texto do prompt com {topic} e {keywords_block} como campos variáveis"""
+    platform_config = PLATFORM_CONFIGS.get(platform, PLATFORM_CONFIGS['LinkedIn'])
+    return f"""
         {platform_config['prompt']}
         
         TOM: {tone} - {TONES.get(tone, TONES['Profissional'])}
         
-        TEMA: {topic}
-        
-        {"INCLUIR ESTAS PALAVRAS-CHAVE: " + keywords if keywords else ""}
+        TEMA: {{topic}}
         
-        EXTENSÃO: {length} (ajuste o comprimento conforme)
+        {{keywords_block}}EXTENSÃO: {length} (cerca de {budget.target_words(platform, length)} palavras)
         
         REGRAS IMPORTANTES:
         1. NÃO use markdown complexo, apenas **negrito** para ênfase
@@ -132,159 +206,529 @@ def generate_content():
         - Conclusão com CTA claro
         - Hashtags relevantes no final
         """
+
+
+def prefix_layout(platform, tone, length):
+    """Mensagem de sistema do layout "prefix": só texto estático, do mais comum ao mais específico"""
+    platform_config = PLATFORM_CONFIGS.get(platform, PLATFORM_CONFIGS['LinkedIn'])
+    return f"""
+        {SYSTEM_MESSAGE}
         
-        # Preparar requisição para OpenRouter
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "http://localhost:5000",
-            "X-Title": "InNovaArticlesAI"
-        }
+        REGRAS IMPORTANTES:
+        1. NÃO use markdown complexo, apenas **negrito** para ênfase
+        2. NÃO adicione títulos como "Post:" ou "Artigo:"
+        3. SEJA específico e evite generalidades
+        4. ADAPTE completamente ao tom indicado
+        5. Use parágrafos curtos para melhor legibilidade
         
-        payload = {
-            "model": OPENROUTER_MODEL,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "Você é um redator especialista em marketing digital com 10 anos de experiência. Crie conteúdo original, persuasivo e otimizado para cada plataforma."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": platform_config['max_tokens'],
-            "temperature": platform_config['temperature'],
-            "top_p": 0.9,
-            "frequency_penalty": 0.2,
-            "presence_penalty": 0.1,
-            "stream": False
-        }
+        ESTRUTURA DO CONTEÚDO:
+        - Introdução impactante
+        - Desenvolvimento com valor
+        - Conclusão com CTA claro
+        - Hashtags relevantes no final
+        
+        {platform_config['prompt']}
+        
+        TOM: {tone} - {TONES.get(tone, TONES['Profissional'])}
+        
+        EXTENSÃO: {length} (cerca de {budget.target_words(platform, length)} palavras)
         
-        # Fazer requisição com timeout
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            json=payload,
-            headers=headers,
-            timeout=45
+        O tema e as palavras-chave vêm na mensagem do usuário.
+        """
+
+
+# Combinações plataforma × tom × extensão, compiladas uma vez (ver create_app)
+PROMPT_CATALOG = prompts.PromptCatalog(prompt_layout, PLATFORM_CONFIGS, TONES, LENGTHS)
+PREFIX_CATALOG = prompts.PromptCatalog(prefix_layout, PLATFORM_CONFIGS, TONES, LENGTHS)
+
+SYSTEM_PROMPT = {"role": "system", "content": SYSTEM_MESSAGE}
+
+# Layout do prompt (ver prompts.py) e marcação de cache para o modelo configurado
+PROMPT_LAYOUT = prompts.layout_mode()
+PREFIX_CACHE_CONTROL = prompts.wants_cache_control(OPENROUTER_MODEL)
+
+# Headers fixos da OpenRouter (montados uma vez)
+OPENROUTER_HEADERS = {
+    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+    "Content-Type": "application/json",
+    "HTTP-Referer": "http://localhost:5000",
+    "X-Title": "InNovaArticlesAI"
+}
+
+
+def build_payload(params, stream=False):
+    """Monta o prompt e o payload da requisição para a OpenRouter"""
+    keywords = params['keywords']
+    
+    # Configurar parâmetros baseados na plataforma
+    platform = params['platform'] if params['platform'] in PLATFORM_CONFIGS else 'LinkedIn'
+    platform_config = PLATFORM_CONFIGS[platform]
+    
+    if PROMPT_LAYOUT == "prefix":
+        # Prefixo idêntico entre requisições da combinação; o que muda vai por último
+        template = PREFIX_CATALOG.get(platform, params['tone'], params['length'])
+        prompt = f"TEMA: {params['topic']}"
+        if keywords:
+            prompt += f"\n\nINCLUIR ESTAS PALAVRAS-CHAVE: {keywords}"
+        messages = [template.system_message(PREFIX_CACHE_CONTROL), {"role": "user", "content": prompt}]
+    else:
+        # Prompt pré-compilado: só tema e palavras-chave mudam por requisição
+        template = PROMPT_CATALOG.get(platform, params['tone'], params['length'])
+        prompt = template.render(
+            topic=params['topic'],
+            keywords_block=f"INCLUIR ESTAS PALAVRAS-CHAVE: {keywords}\n\n" if keywords else ""
         )
+        messages = [SYSTEM_PROMPT, {"role": "user", "content": prompt}]
+    
+    payload = {
+        "model": OPENROUTER_MODEL,
+        "messages": messages,
+        "max_tokens": budget.max_tokens(platform, params['length']),
+        "temperature": platform_config['temperature'],
+        "top_p": 0.9,
+        "frequency_penalty": 0.2,
+        "presence_penalty": 0.1,
+        "stream": stream
+    }
+    if stream:
+        payload["stream_options"] = {"include_usage": True}
+    return payload
+
+
+def openrouter_headers():
+    return OPENROUTER_HEADERS
+
+
+def process_post(params, content):
+    """Texto ajustado às regras da plataforma (ver postprocess.py)"""
+    platform_config = PLATFORM_CONFIGS.get(params['platform'], PLATFORM_CONFIGS['LinkedIn'])
+    return postprocess.process(content, params['platform'], params.get('keywords'), platform_config['hashtags'])
+
+
+def build_response_data(params, content, usage, model=None, post=None):
+    if post is None and postprocess.enabled():
+        post = process_post(params, content)
+    if post:
+        post = dict(post)
+        content = post.pop("article")
+    response_data = {
+        "success": True,
+        "article": content,
+        "metadata": {
+            "platform": params['platform'],
+            "tone": params['tone'],
+            "topic": params['topic'][:50],
+            "length": params['length'],
+            "tokens_used": usage.get("total_tokens", 0),
+            "timestamp": datetime.now().isoformat(),
+            "model": model or OPENROUTER_MODEL,
+            "characters": len(content)
+        }
+    }
+    if post:
+        response_data["post"] = post
+    return response_data
+
+@routes.route('/')
+def home():
+    """Página principal"""
+    # Montada uma vez, com CSS/JS em arquivos versionados (ver assets.py)
+    return assets.index_response()
+
+@routes.route('/health')
+def health_check():
+    """Endpoint de verificação de saúde"""
+    return jsonify(health_payload())
+
+def fetch_completion(payload):
+    """Chamada à OpenRouter; retorna (resultado, corpo_de_erro)"""
+    # Fazer requisição com timeout (ocupando uma vaga do tenant, se houver)
+    with tenants.generation(payload.get("n", 1)):
+        response = resilience.get_upstream().chat_completion(payload, headers=openrouter_headers())
+    
+    # Processar resposta (lida uma vez, direto dos bytes; None se não for JSON)
+    result = fastjson.parse_response(response)
+    
+    if response.status_code != 200:
+        message = streaming.error_message(result)
+        log.error("upstream_error", status=response.status_code, error=message)
+        return None, {"error": f"Erro na API: {message}"}
+    
+    if not result or not result.get("choices"):
+        return None, {"error": "Resposta vazia da API"}
+    
+    # Extrair conteúdo e estatísticas
+    completion = {
+        "content": result["choices"][0]["message"]["content"].strip(),
+        "usage": result.get("usage", {}),
+        # Pode ser um modelo reserva, se houve failover
+        "model": result.get("model") or payload["model"]
+    }
+    # Pedido com "n" (variantes): todas as escolhas
+    if len(result["choices"]) > 1:
+        completion["alternatives"] = [choice["message"]["content"].strip() for choice in result["choices"]]
+    metrics.record_usage(completion["model"], completion["usage"])
+    tenants.record_usage(completion["model"], completion["usage"])
+    return completion, None
+
+
+def record_generation(data, body, status):
+    """Conta a geração em generation_requests_total"""
+    data = data if isinstance(data, dict) else {}
+    model = body.get("metadata", {}).get("model") if isinstance(body, dict) else None
+    metrics.GENERATIONS.labels(
+        platform=metrics.bounded(data.get('platform', 'LinkedIn'), PLATFORM_CONFIGS),
+        tone=metrics.bounded(data.get('tone', 'Profissional'), TONES),
+        model=model or OPENROUTER_MODEL,
+        status=status
+    ).inc()
+
+
+def variants_response(params, candidates):
+    """Corpo de /generate com ``variants``: a melhor candidata em ``article``"""
+    platform_config = PLATFORM_CONFIGS.get(params['platform'], PLATFORM_CONFIGS['LinkedIn'])
+    # Nota dada ao texto que o usuário vai receber, já ajustado
+    posts = {}
+    if postprocess.enabled():
+        for candidate in candidates:
+            post = process_post(params, candidate["content"])
+            posts[post["article"]] = post
+            candidate["content"] = post["article"]
+    ranked = variants.rank(candidates, params, platform_config['hashtags'])
+    best = ranked[0]
+    response_data = build_response_data(params, best["article"], variants.total_usage(candidates), best["model"],
+                                        post=posts.get(best["article"], {}))
+    response_data["metadata"]["score"] = best["score"]
+    response_data["metadata"]["variants"] = len(ranked)
+    response_data["variants"] = ranked
+    return response_data
+
+
+def semantic_partition(params):
+    """Só são comparados temas gerados com as mesmas instruções"""
+    return (params['platform'], params['tone'], params['length'], OPENROUTER_MODEL)
+
+
+def semantic_response(params, match):
+    """Corpo de /generate com um texto de tema parecido, devolvido como rascunho"""
+    value, similarity, topic = match
+    response_data = build_response_data(params, value["content"], value["usage"], value.get("model"))
+    response_data["metadata"]["cached"] = True
+    response_data["metadata"]["semantic"] = {"similarity": similarity, "topic": topic}
+    return response_data
+
+
+def run_generation(data):
+    """Executa uma geração completa; retorna (corpo_da_resposta, status_http)"""
+    try:
+        # Validar entrada
+        with metrics.stage("validation"):
+            params, error = parse_generation_request(data)
+            if not error:
+                count, error = variants.requested(data)
+        if error:
+            return {"error": error}, 400
         
-        # Processar resposta
-        if response.status_code != 200:
-            error_data = response.json()
-            logger.error(f"OpenRouter error: {error_data}")
-            return jsonify({
-                "error": f"Erro na API: {error_data.get('error', {}).get('message', 'Erro desconhecido')}"
-            }), 500
+        if not OPENROUTER_API_KEY:
+            return {"error": "API não configurada. Configure OPENROUTER_API_KEY no arquivo .env"}, 500
+        
+        with metrics.stage("prompt_build"):
+            payload = build_payload(params)
+            # Previsto antes da chamada; vai no metadata de toda resposta
+            projected = budget.projection(payload, count)
+        
+        # Várias candidatas em paralelo, sem cache nem agrupamento: cada uma é um texto novo
+        if count > 1:
+            candidates, error_body = variants.fetch(payload, count, fetch_completion)
+            if not candidates:
+                return error_body, 500
+            log.event("variants_generated", platform=params['platform'], requested=count,
+                      received=len(candidates))
+            response_data = variants_response(params, candidates)
+            response_data["metadata"].update(projected)
+            return response_data, 200
         
-        result = response.json()
+        key = cache.cache_key(payload)
+        bypass = cache.wants_bypass(data)
         
-        if "choices" not in result or not result["choices"]:
-            return jsonify({"error": "Resposta vazia da API"}), 500
+        # Cache de respostas (opt-in): payload idêntico devolve o mesmo resultado
+        response_cache = cache.get_cache()
+        if response_cache and not bypass:
+            cached = response_cache.get(key)
+            if cached is not None:
+                log.event("cache_hit", platform=params['platform'])
+                response_data = build_response_data(params, cached["content"], cached["usage"], cached.get("model"))
+                response_data["metadata"].update(projected, cached=True)
+                return response_data, 200
         
-        # Extrair conteúdo
-        content = result["choices"][0]["message"]["content"].strip()
+        # Cache semântico (opt-in): tema parecido, mesmas instruções -> rascunho instantâneo
+        import semantic  # opcional (SEMANTIC_CACHE): só carregado no primeiro uso
+        semantic_cache = semantic.get_cache()
+        if semantic_cache and not bypass:
+            match = semantic_cache.lookup(semantic_partition(params), semantic.query_text(params))
+            if match is not None:
+                log.event("semantic_hit", platform=params['platform'], similarity=match[1])
+                response_data = semantic_response(params, match)
+                response_data["metadata"].update(projected)
+                return response_data, 200
         
-        # Coletar estatísticas
-        usage = result.get("usage", {})
+        # Requisições idênticas simultâneas compartilham uma única chamada
+        (completion, error_body), coalesced = coalesce.run(
+            None if bypass else tenants.scoped(key), lambda: fetch_completion(payload))
+        if error_body:
+            return error_body, 500
+        
+        if response_cache and not coalesced:
+            response_cache.set(key, completion)
+        if semantic_cache and not coalesced:
+            semantic_cache.add(semantic_partition(params), semantic.query_text(params), completion)
         
         # Preparar resposta
-        response_data = {
-            "success": True,
-            "article": content,
-            "metadata": {
-                "platform": platform,
-                "tone": tone,
-                "topic": topic[:50],
-                "length": length,
-                "tokens_used": usage.get("total_tokens", 0),
-                "timestamp": datetime.now().isoformat(),
-                "model": OPENROUTER_MODEL,
-                "characters": len(content)
-            }
-        }
+        response_data = build_response_data(params, completion["content"], completion["usage"], completion["model"])
+        response_data["metadata"].update(projected)
+        if coalesced:
+            response_data["metadata"]["coalesced"] = True
         
-        # Log de sucesso
-        logger.info(f"Conteúdo gerado com sucesso! Tokens usados: {usage.get('total_tokens', 0)}")
+        log.event("generated", platform=params['platform'], tone=params['tone'], model=completion["model"],
+                  tokens=completion["usage"].get("total_tokens", 0), coalesced=coalesced)
         
-        return jsonify(response_data)
+        return response_data, 200
         
+    except tenants.Rejected as e:
+        return tenants.rejected_body(e), e.status
+    
+    except limits.Overloaded as e:
+        log.warning("upstream_overloaded", retry_after=e.retry_after)
+        return limits.overloaded_body(e), 503
+    
     except requests.exceptions.Timeout:
-        logger.error("Timeout na requisição para OpenRouter")
+        log.error("upstream_timeout")
+        return {"error": "A API demorou muito para responder. Tente novamente."}, 504
+    
+    except requests.exceptions.ConnectionError:
+        log.error("upstream_connection_error")
+        return {"error": "Erro de conexão. Verifique sua internet."}, 503
+    
+    except Exception as e:
+        log.error("unexpected_error", exc_info=True, error=str(e))
+        return {"error": f"Erro interno do servidor: {str(e)}"}, 500
+
+def run_recorded(spec, sid):
+    """Geração de um item de lote ou job, registrada em métricas e histórico"""
+    body, status = run_generation(spec)
+    record_generation(spec, body, status)
+    history.record(sid, spec, body, status)
+    return body, status
+
+
+# Jobs (POST /jobs) usam a mesma geração, executada pelos workers
+jobs.configure(run_recorded, parse_generation_request, PLATFORM_CONFIGS.keys())
+# Aquecimento do cache com os templates (python warmup.py app-simply lê WARMUP)
+WARMUP = (parse_generation_request, build_payload, fetch_completion, TEMPLATES)
+
+@routes.route('/generate', methods=['POST'])
+def generate_content():
+    """Endpoint principal para geração de conteúdo"""
+    data = request.get_json(silent=True)
+    body, status = run_generation(data)
+    record_generation(data, body, status)
+    history.record(history.session_id(), data, body, status)
+    with metrics.stage("serialization"):
+        response = jsonify(body)
+    return response, status
+
+@routes.route('/generate/stream', methods=['POST'])
+def generate_content_stream():
+    """Geração com entrega progressiva dos tokens via Server-Sent Events"""
+    try:
+        data = request.get_json(silent=True)
+        with metrics.stage("validation"):
+            params, error = parse_generation_request(data)
+        if error:
+            return jsonify({"error": error}), 400
+        
+        if not OPENROUTER_API_KEY:
+            return jsonify({"error": "API não configurada. Configure OPENROUTER_API_KEY no arquivo .env"}), 500
+        
+        with metrics.stage("prompt_build"):
+            payload = build_payload(params, stream=True)
+            # Calculada antes da chamada; vai no evento done
+            projected = budget.projection(payload)
+        
+        # Capturado antes do stream: o cookie sai junto com os headers
+        sid = history.session_id()
+        
+        response_cache = cache.get_cache()
+        cache_key = cache.cache_key(payload) if response_cache else None
+        import semantic  # opcional (SEMANTIC_CACHE): só carregado no primeiro uso
+        semantic_cache = semantic.get_cache()
+        response_data = None
+        if not cache.wants_bypass(data):
+            cached = response_cache.get(cache_key) if response_cache else None
+            if cached is not None:
+                log.event("cache_hit", platform=params['platform'], stream=True)
+                response_data = build_response_data(params, cached["content"], cached["usage"], cached.get("model"))
+                response_data["metadata"]["cached"] = True
+            elif semantic_cache:
+                match = semantic_cache.lookup(semantic_partition(params), semantic.query_text(params))
+                if match is not None:
+                    log.event("semantic_hit", platform=params['platform'], similarity=match[1], stream=True)
+                    response_data = semantic_response(params, match)
+        if response_data is not None:
+            response_data["metadata"].update(projected)
+            record_generation(data, response_data, 200)
+            history.record(sid, data, response_data, 200)
+            events = [streaming.sse({"content": response_data["article"]}),
+                      streaming.sse(response_data, event="done")]
+            return Response(events, mimetype='text/event-stream', headers={"Cache-Control": "no-cache"})
+        
+        # A vaga do tenant fica reservada até o fim do stream
+        tenants.hold_generation()
+        response = resilience.get_upstream().chat_completion(payload, headers=openrouter_headers(), stream=True)
+        
+        # Erros antes do primeiro byte mantêm o contrato JSON de /generate
+        if response.status_code != 200:
+            message = streaming.upstream_error_message(response)
+            response.close()
+            log.error("upstream_error", status=response.status_code, error=message)
+            record_generation(data, None, 500)
+            return jsonify({"error": f"Erro na API: {message}"}), 500
+    
+    except tenants.Rejected as e:
+        return tenants.rejected_response(e)
+    
+    except limits.Overloaded as e:
+        log.warning("upstream_overloaded", retry_after=e.retry_after)
+        return jsonify(limits.overloaded_body(e)), 503
+    
+    except requests.exceptions.Timeout:
+        log.error("upstream_timeout")
         return jsonify({"error": "A API demorou muito para responder. Tente novamente."}), 504
     
     except requests.exceptions.ConnectionError:
-        logger.error("Erro de conexão com OpenRouter")
+        log.error("upstream_connection_error")
         return jsonify({"error": "Erro de conexão. Verifique sua internet."}), 503
     
     except Exception as e:
-        logger.error(f"Erro inesperado: {str(e)}", exc_info=True)
+        log.error("unexpected_error", exc_info=True, error=str(e))
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
+    
+    def events():
+        parts = []
+        usage = {}
+        model = payload["model"]
+        try:
+            for chunk in streaming.iter_completion_chunks(response):
+                usage = chunk.get("usage") or usage
+                model = chunk.get("model") or model
+                delta = streaming.chunk_delta(chunk)
+                if delta:
+                    parts.append(delta)
+                    yield streaming.sse({"content": delta})
+        except requests.exceptions.RequestException as e:
+            log.warning("stream_interrupted", error=str(e))
+            record_generation(data, None, 502)
+            yield streaming.sse({"error": "Conexão com a API interrompida. Tente novamente."}, event="error")
+            return
+        finally:
+            response.close()
+        
+        content = "".join(parts).strip()
+        if not content:
+            record_generation(data, None, 500)
+            yield streaming.sse({"error": "Resposta vazia da API"}, event="error")
+            return
+        
+        completion = {"content": content, "usage": usage, "model": model}
+        if response_cache:
+            response_cache.set(cache_key, completion)
+        if semantic_cache:
+            semantic_cache.add(semantic_partition(params), semantic.query_text(params), completion)
+        
+        metrics.record_usage(model, usage)
+        tenants.record_usage(model, usage)
+        log.event("generated", platform=params['platform'], tone=params['tone'], model=model,
+                  tokens=usage.get("total_tokens", 0), stream=True)
+        response_data = build_response_data(params, content, usage, model)
+        response_data["metadata"].update(projected)
+        record_generation(data, response_data, 200)
+        history.record(sid, data, response_data, 200)
+        yield streaming.sse(response_data, event="done")
+    
+    return Response(tenants.streaming(stream_with_context(events())), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-@app.route('/templates', methods=['GET'])
+@routes.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    """Várias gerações em paralelo, devolvidas em NDJSON conforme terminam"""
+    data = request.get_json(silent=True)
+    specs, error = batch.expand_specs(data, PLATFORM_CONFIGS.keys())
+    if error:
+        return jsonify({"error": error}), 400
+    
+    if not OPENROUTER_API_KEY:
+        return jsonify({"error": "API não configurada. Configure OPENROUTER_API_KEY no arquivo .env"}), 500
+    
+    parallelism = batch.parallelism_for(data, len(specs))
+    log.event("batch_received", items=len(specs), parallelism=parallelism)
+    
+    sid = history.session_id()
+    
+    lines = batch.ndjson_stream(specs, lambda spec: run_recorded(spec, sid), parallelism)
+    return Response(tenants.streaming(lines), mimetype='application/x-ndjson', headers={"X-Accel-Buffering": "no"})
+
+@routes.route('/generate/estimate', methods=['POST'])
+def estimate_generation():
+    """Tokens e custo previstos para um corpo de /generate, sem chamar a OpenRouter"""
+    params, error = parse_generation_request(request.get_json(silent=True))
+    if error:
+        return jsonify({"error": error}), 400
+    return jsonify(budget.estimate(build_payload(params)))
+
+@routes.route('/templates', methods=['GET'])
 def get_templates():
     """Retorna templates predefinidos"""
-    templates = [
-        {
-            "id": "linkedin_leadership",
-            "name": "Liderança no LinkedIn",
-            "platform": "LinkedIn",
-            "tone": "Profissional",
-            "length": "medio",
-            "description": "Post para posicionar líderes e especialistas",
-            "example_topic": "Como desenvolver uma cultura de inovação na sua equipe"
-        },
-        {
-            "id": "instagram_promo",
-            "name": "Promoção no Instagram",
-            "platform": "Instagram",
-            "tone": "Descontraído",
-            "length": "curto",
-            "description": "Anúncio de produto/serviço com alto engajamento",
-            "example_topic": "Lançamento do novo curso de Marketing Digital"
-        },
-        {
-            "id": "facebook_community",
-            "name": "Engajamento no Facebook",
-            "platform": "Facebook",
-            "tone": "Conversacional",
-            "length": "longo",
-            "description": "Post para gerar discussão e interação",
-            "example_topic": "Quais são os maiores desafios do home office hoje?"
-        },
-        {
-            "id": "twitter_thread",
-            "name": "Thread Educativa",
-            "platform": "Twitter/X",
-            "tone": "Técnico",
-            "length": "medio",
-            "description": "Thread para ensinar um conceito complexo",
-            "example_topic": "5 conceitos de IA que todo profissional deveria conhecer"
-        }
-    ]
-    return jsonify({"templates": templates})
+    # ETag calculado uma vez: o corpo só muda com um deploy
+    return compression.conditional(Response(TEMPLATES_BODY, mimetype='application/json'), TEMPLATES_ETAG)
 
-@app.route('/stats', methods=['GET'])
+@routes.route('/stats', methods=['GET'])
 def get_stats():
     """Retorna estatísticas do sistema"""
-    return jsonify({
-        "status": "operational",
-        "version": "1.0.0",
-        "supported_platforms": list(PLATFORM_CONFIGS.keys()),
-        "supported_tones": list(TONES.keys()),
-        "model": OPENROUTER_MODEL,
-        "api_configured": bool(OPENROUTER_API_KEY)
-    })
+    return compression.conditional(jsonify(stats_payload()))
 
-@app.errorhandler(404)
+@routes.app_errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Endpoint não encontrado"}), 404
 
-@app.errorhandler(405)
+@routes.app_errorhandler(405)
 def method_not_allowed(error):
     return jsonify({"error": "Método não permitido"}), 405
 
-@app.errorhandler(500)
+@routes.app_errorhandler(500)
 def internal_error(error):
     return jsonify({"error": "Erro interno do servidor"}), 500
 
+def create_app(config=None):
+    """Cria a aplicação Flask; ``config`` sobrepõe app.config"""
+    logging.basicConfig(level=logging.INFO)
+    if not OPENROUTER_API_KEY:
+        logger.warning("⚠️  OPENROUTER_API_KEY não configurada no .env")
+        logger.warning("   Obtenha uma chave gratuita em: https://openrouter.ai")
+        logger.warning("   Adicione ao .env: OPENROUTER_API_KEY=sua_chave_aqui")
+    
+    # Todas as combinações de prompt na partida: nenhuma requisição compila template
+    if prompts.precompile():
+        (PREFIX_CATALOG if PROMPT_LAYOUT == "prefix" else PROMPT_CATALOG).compile_all()
+    
+    app = Flask(__name__)
+    bootstrap.init_app(app, config)
+    CORS(app)  # Habilitar CORS para segurança
+    app.register_blueprint(routes)
+    return app
+
+# Instância usada por gunicorn/Vercel ("app-simply:app") e pelo asgi_app
+app = create_app()
+
 if __name__ == '__main__':
     # Mensagem inicial
     print("\n" + "="*60)
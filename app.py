@@ -1,25 +1,41 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Blueprint, Flask, request, jsonify, Response, stream_with_context
 import requests
 import os
 import json
-from dotenv import load_dotenv
 from datetime import datetime
-import traceback
+
+import assets
+import batch
+import bootstrap
+import budget
+import cache
+import coalesce
+import compression
+import eventlog
+import fastjson
+import history
+import jobs
+import limits
+import metrics
+import postprocess
+import prompts
+import resilience
+import streaming
+import tenants
+import upstream
+import variants
 
 # Carregar variáveis de ambiente - APENAS UMA VEZ
-load_dotenv()
+bootstrap.load_env()
+
+# Rotas da aplicação; create_app() as registra numa aplicação nova
+routes = Blueprint("generation", __name__)
 
-app = Flask(__name__)
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-key-change-in-production")
+log = eventlog.get_logger("app")
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 MODEL = os.getenv("OPENROUTER_MODEL", "openai/gpt-4o")
 
-# Verificar se a chave está carregada
-if not OPENROUTER_API_KEY:
-    print("AVISO: OPENROUTER_API_KEY não encontrada no .env")
-    print("Por favor, crie um arquivo .env com sua chave OpenRouter")
-
 # Cache simples para prompts
 PLATFORM_PROMPTS = {
     "LinkedIn": (
@@ -57,62 +73,53 @@ TONE_GUIDELINES = {
     "Descontraído": "Linguagem coloquial, primeira pessoa, tom pessoal."
 }
 
-@app.route('/')
+@routes.route('/')
 def index():
-    return render_template('index.html')
+    # Montada uma vez, com CSS/JS em arquivos versionados (ver assets.py)
+    return assets.index_response()
 
-@app.route('/generate', methods=['POST'])
-def generate():
-    try:
-        # Log da requisição recebida
-        print(f"Recebida requisição para /generate")
-        
-        data = request.json
-        print(f"Dados recebidos: {data}")
-        
-        # Validação
-        if not data:
-            return jsonify({"error": "Nenhum dado recebido"}), 400
-        
-        if 'topic' not in data:
-            return jsonify({"error": "Tema é obrigatório"}), 400
-        
-        topic = data.get('topic', '').strip()
-        if not topic:
-            return jsonify({"error": "Tema não pode ser vazio"}), 400
-        
-        if len(topic) > 150:
-            return jsonify({"error": "Tema muito longo (máximo 150 caracteres)"}), 400
-        
-        # Verificar se a API key está configurada
-        if not OPENROUTER_API_KEY:
-            return jsonify({"error": "Chave API não configurada. Por favor, configure OPENROUTER_API_KEY no arquivo .env"}), 500
-        
-        platform = data.get('platform', 'LinkedIn')
-        tone = data.get('tone', 'Profissional')
-        length = data.get('length', 'medio')
-        keywords = data.get('keywords', '')
-        style = data.get('style', 'padrão')
-        
-        # Mapear extensão para tokens
-        length_tokens = {
-            'curto': 300,
-            'medio': 500,
-            'longo': 800
-        }
-        
-        # Construir prompt avançado
-        prompt = f"""
+# Extensões aceitas (palavras e max_tokens por plataforma ficam em budget.py)
+LENGTHS = tuple(budget.LENGTH_WORDS)
+
+SYSTEM_MESSAGE = "Você é um redator especialista em marketing digital e copywriting. Crie conteúdo original, persuasivo e adaptado à plataforma."
+
+
+def parse_generation_request(data):
+    """Valida o corpo de /generate; retorna (params, mensagem_de_erro)"""
+    if not data:
+        return None, "Nenhum dado recebido"
+    
+    if 'topic' not in data:
+        return None, "Tema é obrigatório"
+    
+    topic = data.get('topic', '').strip()
+    if not topic:
+        return None, "Tema não pode ser vazio"
+    
+    if len(topic) > 150:
+        return None, "Tema muito longo (máximo 150 caracteres)"
+    
+    return {
+        "topic": topic,
+        "platform": data.get('platform', 'LinkedIn'),
+        "tone": data.get('tone', 'Profissional'),
+        "length": data.get('length', 'medio'),
+        "keywords": data.get('keywords', ''),
+        "style": data.get('style', 'padrão')
+    }, None
+
+
+def prompt_layout(platform, tone, length):
+    """Texto do prompt com {topic}, {keywords_block} e {style} como campos variáveis"""
+    return f"""
         {PLATFORM_PROMPTS.get(platform, PLATFORM_PROMPTS['LinkedIn'])}
         
         TONALIDADE: {tone}. {TONE_GUIDELINES.get(tone, '')}
         
-        TEMA PRINCIPAL: {topic}
+        TEMA PRINCIPAL: {{topic}}
         
-        {'PALAVRAS-CHAVE/HASHTAGS A INCLUIR: ' + keywords if keywords else ''}
-        
-        ESTILO DE ESCRITA: {style}
-        EXTENSÃO: {length} ({length_tokens[length]} palavras aproximadamente)
+        {{keywords_block}}ESTILO DE ESCRITA: {{style}}
+        EXTENSÃO: {length} ({budget.target_words(platform, length)} palavras aproximadamente)
         
         FORMATO DE SAÍDA:
         1. Título (em negrito com **)
@@ -126,133 +133,557 @@ def generate():
         - NÃO seja genérico, seja específico com exemplos
         - Adapte completamente ao tom {tone}
         """
+
+
+def prefix_layout(platform, tone, length):
+    """Mensagem de sistema do layout "prefix": só texto estático, do mais comum ao mais específico"""
+    return f"""
+        {SYSTEM_MESSAGE}
+        
+        FORMATO DE SAÍDA:
+        1. Título (em negrito com **)
+        2. Corpo do texto com parágrafos claros
+        3. Hashtags relevantes no final
+        4. Call-to-action final
+        
+        IMPORTANTE:
+        - NÃO use markdown além de negrito (**texto**)
+        - NÃO inclua títulos como "Artigo:" ou "Post:"
+        - NÃO seja genérico, seja específico com exemplos
+        - Adapte completamente ao tom indicado
+        
+        {PLATFORM_PROMPTS.get(platform, PLATFORM_PROMPTS['LinkedIn'])}
+        
+        TONALIDADE: {tone}. {TONE_GUIDELINES.get(tone, '')}
+        
+        EXTENSÃO: {length} ({budget.target_words(platform, length)} palavras aproximadamente)
         
-        print(f"Prompt construído para {platform}, tom {tone}, extensão {length}")
-        
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "http://localhost:5000",
-            "X-Title": "InNovaArticlesAI"
-        }
-        
-        body = {
-            "model": MODEL,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "Você é um redator especialista em marketing digital e copywriting. Crie conteúdo original, persuasivo e adaptado à plataforma."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": length_tokens[length] * 1.5,
-            "temperature": 0.7 if tone == "Engraçado" else 0.5,
-            "top_p": 0.9,
-            "frequency_penalty": 0.3,
-            "presence_penalty": 0.1
-        }
-        
-        print(f"Enviando requisição para OpenRouter API...")
-        
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            json=body,
-            headers=headers,
-            timeout=45
+        Tema, palavras-chave e estilo vêm na mensagem do usuário.
+        """
+
+
+# Combinações plataforma × tom × extensão, compiladas uma vez (ver create_app)
+PROMPT_CATALOG = prompts.PromptCatalog(prompt_layout, PLATFORM_PROMPTS, TONE_GUIDELINES, LENGTHS)
+PREFIX_CATALOG = prompts.PromptCatalog(prefix_layout, PLATFORM_PROMPTS, TONE_GUIDELINES, LENGTHS)
+
+SYSTEM_PROMPT = {"role": "system", "content": SYSTEM_MESSAGE}
+
+# Layout do prompt (ver prompts.py) e marcação de cache para o modelo configurado
+PROMPT_LAYOUT = prompts.layout_mode()
+PREFIX_CACHE_CONTROL = prompts.wants_cache_control(MODEL)
+
+# Headers fixos da OpenRouter (montados uma vez)
+OPENROUTER_HEADERS = {
+    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+    "Content-Type": "application/json",
+    "HTTP-Referer": "http://localhost:5000",
+    "X-Title": "InNovaArticlesAI"
+}
+
+
+def build_request_body(params, stream=False):
+    """Monta o prompt e o corpo da requisição para a OpenRouter"""
+    platform = params['platform']
+    tone = params['tone']
+    length = params['length']
+    keywords = params['keywords']
+    
+    # Plataformas desconhecidas usam o prompt do LinkedIn
+    if platform not in PLATFORM_PROMPTS:
+        platform = 'LinkedIn'
+    if PROMPT_LAYOUT == "prefix":
+        # Prefixo idêntico entre requisições da combinação; o que muda vai por último
+        template = PREFIX_CATALOG.get(platform, tone, length)
+        prompt = f"TEMA PRINCIPAL: {params['topic']}\n\n"
+        if keywords:
+            prompt += f"PALAVRAS-CHAVE/HASHTAGS A INCLUIR: {keywords}\n\n"
+        prompt += f"ESTILO DE ESCRITA: {params['style']}"
+        system_prompt = template.system_message(PREFIX_CACHE_CONTROL)
+    else:
+        template = PROMPT_CATALOG.get(platform, tone, length)
+        prompt = template.render(
+            topic=params['topic'],
+            keywords_block=f"PALAVRAS-CHAVE/HASHTAGS A INCLUIR: {keywords}\n\n" if keywords else "",
+            style=params['style']
         )
+        system_prompt = SYSTEM_PROMPT
+    
+    log.event("prompt_built", platform=platform, tone=tone, length=length)
+    
+    body = {
+        "model": MODEL,
+        "messages": [
+            system_prompt,
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": budget.max_tokens(platform, length),
+        "temperature": 0.7 if tone == "Engraçado" else 0.5,
+        "top_p": 0.9,
+        "frequency_penalty": 0.3,
+        "presence_penalty": 0.1
+    }
+    if stream:
+        body["stream"] = True
+        body["stream_options"] = {"include_usage": True}
+    return body
+
+
+def openrouter_headers():
+    return OPENROUTER_HEADERS
+
+
+def build_metadata(params, tokens_used):
+    return {
+        "platform": params['platform'],
+        "tone": params['tone'],
+        "length": params['length'],
+        "estimated_tokens": tokens_used,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def generation_body(params, article, metadata):
+    """Corpo de /generate, com o texto ajustado às regras da plataforma (ver postprocess.py)"""
+    result = {"article": article, "metadata": metadata}
+    if postprocess.enabled():
+        post = postprocess.process(article, params['platform'], params['keywords'])
+        result["article"] = post.pop("article")
+        result["post"] = post
+    return result
+
+
+def semantic_partition(params):
+    """Só são comparados temas gerados com as mesmas instruções"""
+    return (params['platform'], params['tone'], params['length'], params['style'], MODEL)
+
+
+def semantic_body(params, match):
+    """Corpo de /generate com um texto de tema parecido, devolvido como rascunho"""
+    value, similarity, topic = match
+    metadata = build_metadata(params, value["usage"].get("total_tokens", 0))
+    metadata["cached"] = True
+    metadata["semantic"] = {"similarity": similarity, "topic": topic}
+    return generation_body(params, value["article"], metadata)
+
+
+def fetch_completion(body):
+    """Chamada à OpenRouter; retorna (resultado, corpo_de_erro)"""
+    with tenants.generation(body.get("n", 1)):
+        response = resilience.get_upstream().chat_completion(body, headers=openrouter_headers())
+    
+    # Lido uma vez, direto dos bytes; None se o corpo não for JSON
+    result = fastjson.parse_response(response)
+    
+    if response.status_code != 200:
+        message = streaming.error_message(result)
+        log.error("upstream_error", status=response.status_code, error=message)
+        return None, {"error": f"Erro na API OpenRouter: {message}"}
+    
+    if not result or not result.get("choices"):
+        return None, {"error": "Resposta vazia da API"}
+    
+    metrics.record_usage(body["model"], result.get("usage"))
+    tenants.record_usage(body["model"], result.get("usage"))
+    completion = {
+        "article": result["choices"][0]["message"]["content"].strip(),
+        "usage": result.get("usage", {}),
+        # Pode ser um modelo reserva, se houve failover
+        "model": result.get("model") or body["model"]
+    }
+    # Pedido com "n" (variantes): todas as escolhas
+    if len(result["choices"]) > 1:
+        completion["alternatives"] = [choice["message"]["content"].strip() for choice in result["choices"]]
+    return completion, None
+
+
+def fetch_candidate(body):
+    """fetch_completion no formato de variants.py (texto em ``content``)"""
+    completion, error_body = fetch_completion(body)
+    if completion is None:
+        return None, error_body
+    return dict(completion, content=completion["article"]), None
+
+
+def variants_body(params, candidates):
+    """Corpo de /generate com ``variants``: a melhor candidata em ``article``"""
+    # Nota dada ao texto que o usuário vai receber, já ajustado
+    posts = {}
+    if postprocess.enabled():
+        for candidate in candidates:
+            post = postprocess.process(candidate["content"], params['platform'], params['keywords'])
+            candidate["content"] = post.pop("article")
+            posts[candidate["content"]] = post
+    hashtag_range = postprocess.HASHTAG_RANGES.get(params['platform'], postprocess.DEFAULT_HASHTAG_RANGE)
+    ranked = variants.rank(candidates, params, hashtag_range)
+    best = ranked[0]
+    metadata = build_metadata(params, variants.total_usage(candidates).get("total_tokens", 0))
+    metadata["score"] = best["score"]
+    metadata["variants"] = len(ranked)
+    result = {"article": best["article"], "metadata": metadata, "variants": ranked}
+    if best["article"] in posts:
+        result["post"] = posts[best["article"]]
+    return result
+
+
+def record_generation(data, status):
+    """Conta a geração em generation_requests_total"""
+    data = data if isinstance(data, dict) else {}
+    metrics.GENERATIONS.labels(
+        platform=metrics.bounded(data.get('platform', 'LinkedIn'), PLATFORM_PROMPTS),
+        tone=metrics.bounded(data.get('tone', 'Profissional'), TONE_GUIDELINES),
+        model=MODEL,
+        status=status
+    ).inc()
+
+
+def run_generation(data):
+    """Executa uma geração completa; retorna (corpo_da_resposta, status_http)"""
+    try:
+        # Validação
+        with metrics.stage("validation"):
+            params, error = parse_generation_request(data)
+            if not error:
+                count, error = variants.requested(data)
+        if error:
+            return {"error": error}, 400
+        
+        # Verificar se a API key está configurada
+        if not OPENROUTER_API_KEY:
+            return {"error": "Chave API não configurada. Por favor, configure OPENROUTER_API_KEY no arquivo .env"}, 500
+        
+        with metrics.stage("prompt_build"):
+            body = build_request_body(params)
+            # Previsto antes da chamada; vai no metadata de toda resposta
+            projected = budget.projection(body, count)
+        
+        # Várias candidatas em paralelo, sem cache nem agrupamento: cada uma é um texto novo
+        if count > 1:
+            candidates, error_body = variants.fetch(body, count, fetch_candidate)
+            if not candidates:
+                return error_body, 500
+            log.event("variants_generated", platform=params['platform'], requested=count,
+                      received=len(candidates))
+            result = variants_body(params, candidates)
+            result["metadata"].update(projected)
+            return result, 200
+        
+        key = cache.cache_key(body)
+        bypass = cache.wants_bypass(data)
+        
+        # Cache de respostas (opt-in): mesmo prompt/modelo/parâmetros -> mesmo resultado
+        response_cache = cache.get_cache()
+        if response_cache and not bypass:
+            cached = response_cache.get(key)
+            if cached is not None:
+                log.event("cache_hit", platform=params['platform'])
+                metadata = build_metadata(params, cached["usage"].get("total_tokens", 0))
+                metadata.update(projected, cached=True)
+                return generation_body(params, cached["article"], metadata), 200
+        
+        # Cache semântico (opt-in): tema parecido, mesmas instruções -> rascunho instantâneo
+        import semantic  # opcional (SEMANTIC_CACHE): só carregado no primeiro uso
+        semantic_cache = semantic.get_cache()
+        if semantic_cache and not bypass:
+            match = semantic_cache.lookup(semantic_partition(params), semantic.query_text(params))
+            if match is not None:
+                log.event("semantic_hit", platform=params['platform'], similarity=match[1])
+                result = semantic_body(params, match)
+                result["metadata"].update(projected)
+                return result, 200
+        
+        # Requisições idênticas simultâneas compartilham uma única chamada
+        (completion, error_body), coalesced = coalesce.run(
+            None if bypass else tenants.scoped(key), lambda: fetch_completion(body))
+        if error_body:
+            return error_body, 500
+        
+        if response_cache and not coalesced:
+            response_cache.set(key, completion)
+        if semantic_cache and not coalesced:
+            semantic_cache.add(semantic_partition(params), semantic.query_text(params), completion)
+        
+        metadata = build_metadata(params, completion["usage"].get("total_tokens", 0))
+        metadata.update(projected)
+        if coalesced:
+            log.event("coalesced", platform=params['platform'])
+            metadata["coalesced"] = True
+        
+        return generation_body(params, completion["article"], metadata), 200
+        
+    except tenants.Rejected as e:
+        return tenants.rejected_body(e), e.status
+    except limits.Overloaded as e:
+        log.warning("upstream_overloaded", retry_after=e.retry_after)
+        return limits.overloaded_body(e), 503
+    except requests.exceptions.Timeout:
+        log.error("upstream_timeout")
+        return {"error": "Timeout - API demorou muito para responder"}, 504
+    except requests.exceptions.ConnectionError:
+        log.error("upstream_connection_error")
+        return {"error": "Erro de conexão - verifique sua internet"}, 503
+    except Exception as e:
+        log.error("unexpected_error", exc_info=True, error=str(e))
+        return {"error": f"Erro interno: {str(e)}"}, 500
+
+def run_recorded(spec, sid):
+    """Geração de um item de lote ou job, registrada em métricas e histórico"""
+    body, status = run_generation(spec)
+    record_generation(spec, status)
+    history.record(sid, spec, body, status)
+    return body, status
+
+
+# Jobs (POST /jobs) usam a mesma geração, executada pelos workers
+jobs.configure(run_recorded, parse_generation_request, PLATFORM_PROMPTS.keys())
+
+@routes.route('/generate', methods=['POST'])
+def generate():
+    data = request.get_json(silent=True)
+    
+    body, status = run_generation(data)
+    record_generation(data, status)
+    
+    # Histórico no servidor (gravação em lote, fora do caminho da requisição)
+    history.record(history.session_id(), data, body, status)
+    
+    with metrics.stage("serialization"):
+        response = jsonify(body)
+    return response, status
+
+@routes.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    """Mesma geração de /generate, entregue token a token via SSE"""
+    try:
+        data = request.get_json(silent=True)
+        
+        with metrics.stage("validation"):
+            params, error = parse_generation_request(data)
+        if error:
+            return jsonify({"error": error}), 400
+        
+        if not OPENROUTER_API_KEY:
+            return jsonify({"error": "Chave API não configurada. Por favor, configure OPENROUTER_API_KEY no arquivo .env"}), 500
+        
+        with metrics.stage("prompt_build"):
+            body = build_request_body(params, stream=True)
+            # Calculada antes da chamada; vai no evento done
+            projected = budget.projection(body)
+        
+        # Capturado antes do stream: o cookie sai junto com os headers
+        sid = history.session_id()
         
-        print(f"Status code da resposta: {response.status_code}")
+        response_cache = cache.get_cache()
+        cache_key = cache.cache_key(body) if response_cache else None
+        import semantic  # opcional (SEMANTIC_CACHE): só carregado no primeiro uso
+        semantic_cache = semantic.get_cache()
+        result = None
+        if not cache.wants_bypass(data):
+            cached = response_cache.get(cache_key) if response_cache else None
+            if cached is not None:
+                log.event("cache_hit", platform=params['platform'], stream=True)
+                metadata = build_metadata(params, cached["usage"].get("total_tokens", 0))
+                metadata["cached"] = True
+                result = generation_body(params, cached["article"], metadata)
+            elif semantic_cache:
+                match = semantic_cache.lookup(semantic_partition(params), semantic.query_text(params))
+                if match is not None:
+                    log.event("semantic_hit", platform=params['platform'], similarity=match[1], stream=True)
+                    result = semantic_body(params, match)
+        if result is not None:
+            result["metadata"].update(projected)
+            record_generation(data, 200)
+            history.record(sid, data, result, 200)
+            events = [streaming.sse({"content": result["article"]}),
+                      streaming.sse(result, event="done")]
+            return Response(events, mimetype='text/event-stream', headers={"Cache-Control": "no-cache"})
         
+        # A vaga do tenant fica reservada até o fim do stream
+        tenants.hold_generation()
+        response = resilience.get_upstream().chat_completion(body, headers=openrouter_headers(), stream=True)
+        
+        # Erros antes do primeiro byte ainda seguem o contrato JSON de /generate
         if response.status_code != 200:
-            error_data = response.json()
-            print(f"Erro da API: {error_data}")
-            return jsonify({
-                "error": f"Erro na API OpenRouter: {error_data.get('error', {}).get('message', 'Erro desconhecido')}"
-            }), 500
-        
-        result = response.json()
-        
-        if "choices" not in result or len(result["choices"]) == 0:
-            return jsonify({"error": "Resposta vazia da API"}), 500
-        
-        article = result["choices"][0]["message"]["content"].strip()
-        
-        # Registro de uso (simples)
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "platform": platform,
-            "tone": tone,
-            "topic": topic[:50],
-            "length": length,
-            "tokens_used": result.get("usage", {}).get("total_tokens", 0)
-        }
-        
-        # Salvar no histórico da sessão
-        if 'history' not in session:
-            session['history'] = []
-        
-        session['history'] = session['history'][-9:] + [log_entry]  # Mantém últimos 10
-        
-        return jsonify({
-            "article": article,
-            "metadata": {
-                "platform": platform,
-                "tone": tone,
-                "length": length,
-                "estimated_tokens": result.get("usage", {}).get("total_tokens", 0),
-                "timestamp": datetime.now().isoformat()
-            }
-        })
+            message = streaming.upstream_error_message(response)
+            response.close()
+            log.error("upstream_error", status=response.status_code, error=message)
+            record_generation(data, 500)
+            return jsonify({"error": f"Erro na API OpenRouter: {message}"}), 500
         
+    except tenants.Rejected as e:
+        return tenants.rejected_response(e)
+    except limits.Overloaded as e:
+        log.warning("upstream_overloaded", retry_after=e.retry_after)
+        return jsonify(limits.overloaded_body(e)), 503
     except requests.exceptions.Timeout:
-        print("Timeout na requisição para OpenRouter")
+        log.error("upstream_timeout")
         return jsonify({"error": "Timeout - API demorou muito para responder"}), 504
     except requests.exceptions.ConnectionError:
-        print("Erro de conexão com OpenRouter")
+        log.error("upstream_connection_error")
         return jsonify({"error": "Erro de conexão - verifique sua internet"}), 503
     except Exception as e:
-        print(f"Erro inesperado: {str(e)}")
-        print(traceback.format_exc())  # Isso mostrará o traceback completo
+        log.error("unexpected_error", exc_info=True, error=str(e))
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+    
+    def events():
+        parts = []
+        usage = {}
+        try:
+            for chunk in streaming.iter_completion_chunks(response):
+                usage = chunk.get("usage") or usage
+                delta = streaming.chunk_delta(chunk)
+                if delta:
+                    parts.append(delta)
+                    yield streaming.sse({"content": delta})
+        except requests.exceptions.RequestException as e:
+            log.warning("stream_interrupted", error=str(e))
+            record_generation(data, 502)
+            yield streaming.sse({"error": "Conexão com a API interrompida"}, event="error")
+            return
+        finally:
+            response.close()
+        
+        article = "".join(parts).strip()
+        if not article:
+            record_generation(data, 500)
+            yield streaming.sse({"error": "Resposta vazia da API"}, event="error")
+            return
+        
+        metrics.record_usage(body["model"], usage)
+        tenants.record_usage(body["model"], usage)
+        record_generation(data, 200)
+        completion = {"article": article, "usage": usage}
+        if response_cache:
+            response_cache.set(cache_key, completion)
+        if semantic_cache:
+            semantic_cache.add(semantic_partition(params), semantic.query_text(params), completion)
+        
+        result = generation_body(params, article, build_metadata(params, usage.get("total_tokens", 0)))
+        result["metadata"].update(projected)
+        history.record(sid, data, result, 200)
+        yield streaming.sse(result, event="done")
+    
+    return Response(tenants.streaming(stream_with_context(events())), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-@app.route('/history', methods=['GET'])
-def get_history():
-    """Retorna histórico da sessão atual"""
-    try:
-        return jsonify({"history": session.get('history', [])})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+@routes.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    """Várias gerações em paralelo, devolvidas em NDJSON conforme terminam"""
+    data = request.get_json(silent=True)
+    specs, error = batch.expand_specs(data, PLATFORM_PROMPTS.keys())
+    if error:
+        return jsonify({"error": error}), 400
+    
+    if not OPENROUTER_API_KEY:
+        return jsonify({"error": "Chave API não configurada. Por favor, configure OPENROUTER_API_KEY no arquivo .env"}), 500
+    
+    parallelism = batch.parallelism_for(data, len(specs))
+    log.event("batch_received", items=len(specs), parallelism=parallelism)
+    
+    sid = history.session_id()
+    
+    lines = batch.ndjson_stream(specs, lambda spec: run_recorded(spec, sid), parallelism)
+    return Response(tenants.streaming(lines), mimetype='application/x-ndjson', headers={"X-Accel-Buffering": "no"})
+
+@routes.route('/generate/estimate', methods=['POST'])
+def estimate_generation():
+    """Tokens e custo previstos para um corpo de /generate, sem chamar a OpenRouter"""
+    params, error = parse_generation_request(request.get_json(silent=True))
+    if error:
+        return jsonify({"error": error}), 400
+    return jsonify(budget.estimate(build_request_body(params)))
+
+# Templates predefinidos (usados por /templates)
+TEMPLATES = [
+    {
+        "id": "linkedin_pro",
+        "name": "Post LinkedIn Pro",
+        "platform": "LinkedIn",
+        "tone": "Profissional",
+        "length": "medio",
+        "description": "Post estratégico para líderes e empresas"
+    },
+    {
+        "id": "instagram_engage",
+        "name": "Instagram Engajador",
+        "platform": "Instagram",
+        "tone": "Descontraído",
+        "length": "curto",
+        "description": "Post visual com alta taxa de engajamento"
+    },
+    {
+        "id": "thread_twitter",
+        "name": "Thread Viral Twitter",
+        "platform": "Twitter/X",
+        "tone": "Persuasivo",
+        "length": "longo",
+        "description": "Thread educativa que viraliza"
+    }
+]
+
+# Aquecimento do cache com os templates (python warmup.py app lê WARMUP)
+WARMUP = (parse_generation_request, build_request_body, fetch_completion, TEMPLATES)
+
+# Corpo de /templates e parte fixa de /stats, montados uma vez
+TEMPLATES_BODY = fastjson.dumps({"templates": TEMPLATES}) + b"\n"
+TEMPLATES_ETAG = compression.weak_etag(TEMPLATES_BODY)
+STATS_STATIC = {
+    "status": "operational",
+    "supported_platforms": list(PLATFORM_PROMPTS.keys()),
+    "supported_tones": list(TONE_GUIDELINES.keys()),
+    "model": MODEL,
+    "api_configured": bool(OPENROUTER_API_KEY)
+}
 
-@app.route('/templates', methods=['GET'])
+@routes.route('/templates', methods=['GET'])
 def get_templates():
     """Retorna templates predefinidos"""
-    templates = [
-        {
-            "id": "linkedin_pro",
-            "name": "Post LinkedIn Pro",
-            "platform": "LinkedIn",
-            "tone": "Profissional",
-            "length": "medio",
-            "description": "Post estratégico para líderes e empresas"
-        },
-        {
-            "id": "instagram_engage",
-            "name": "Instagram Engajador",
-            "platform": "Instagram",
-            "tone": "Descontraído",
-            "length": "curto",
-            "description": "Post visual com alta taxa de engajamento"
-        },
-        {
-            "id": "thread_twitter",
-            "name": "Thread Viral Twitter",
-            "platform": "Twitter/X",
-            "tone": "Persuasivo",
-            "length": "longo",
-            "description": "Thread educativa que viraliza"
-        }
-    ]
-    return jsonify({"templates": templates})
+    # ETag calculado uma vez: o corpo só muda com um deploy
+    return compression.conditional(Response(TEMPLATES_BODY, mimetype='application/json'), TEMPLATES_ETAG)
+
+@routes.route('/health', methods=['GET'])
+def health_check():
+    """Verificação de saúde com o estado dos limitadores"""
+    return jsonify({
+        "status": "healthy",
+        "api_configured": bool(OPENROUTER_API_KEY),
+        "model": MODEL,
+        "limits": limits.stats(upstream.get_client().limiter)
+    })
+
+@routes.route('/stats', methods=['GET'])
+def get_stats():
+    """Retorna estatísticas do sistema"""
+    import semantic
+
+    return compression.conditional(jsonify(dict(
+        STATS_STATIC,
+        cache=cache.stats(),
+        semantic_cache=semantic.stats(),
+        coalescing=coalesce.stats(),
+        jobs=jobs.stats(),
+        resilience=resilience.stats(),
+        prompt_templates=(PREFIX_CATALOG if PROMPT_LAYOUT == "prefix" else PROMPT_CATALOG).stats(),
+        prompt_cache=dict(metrics.prompt_cache_stats(), layout=PROMPT_LAYOUT)
+    )))
+
+def create_app(config=None):
+    """Cria a aplicação Flask; ``config`` sobrepõe app.config"""
+    # Verificar se a chave está carregada
+    if not OPENROUTER_API_KEY:
+        print("AVISO: OPENROUTER_API_KEY não encontrada no .env")
+        print("Por favor, crie um arquivo .env com sua chave OpenRouter")
+    
+    # Todas as combinações de prompt na partida: nenhuma requisição compila template
+    if prompts.precompile():
+        (PREFIX_CATALOG if PROMPT_LAYOUT == "prefix" else PROMPT_CATALOG).compile_all()
+    
+    app = Flask(__name__)
+    bootstrap.init_app(app, config)
+    app.register_blueprint(routes)
+    return app
+
+# Instância usada por gunicorn/Vercel ("app:app")
+app = create_app()
 
 if __name__ == '__main__':
     # Verificar se a API key está configurada
@@ -0,0 +1,355 @@
+"""Caminho de execução assíncrono (ASGI) para a API de geração.
+
+Serve /generate, /generate/estimate, /health, /templates, /stats e /metrics
+com o mesmo contrato JSON de app-simply.py (validação, prompt e formato de
+resposta são reaproveitados de lá), mas a chamada à OpenRouter é feita com
+um cliente HTTP não-bloqueante. Uma geração aguardando o provedor ocupa
+apenas uma corrotina, não uma thread do servidor.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import importlib
+import math
+import time
+
+import budget
+import cache
+import coalesce
+import compression
+import eventlog
+import fastjson
+import limits
+import metrics
+import resilience
+import streaming
+import tenants
+import upstream
+import variants
+
+core = importlib.import_module("app-simply")
+log = eventlog.get_logger("asgi")
+
+_client = None
+_resilient = None
+_flights = coalesce.AsyncSingleFlight()
+
+
+def get_async_client():
+    global _client
+    if _client is None:
+        _client = upstream.AsyncUpstreamClient()
+    return _client
+
+
+def get_async_upstream():
+    """Retentativas, hedging e failover sobre o cliente assíncrono"""
+    global _resilient
+    if _resilient is None:
+        _resilient = resilience.AsyncResilientUpstream(get_async_client())
+    return _resilient
+
+
+async def read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def send_json(send, status, data, headers=()):
+    with metrics.stage("serialization"):
+        body = fastjson.dumps(data)
+    await send_body(send, status, body, b"application/json", headers)
+
+
+async def send_body(send, status, body, content_type, headers=(), gzip_ok=False):
+    headers = list(headers)
+    if gzip_ok and compression.compressible(content_type.split(b";")[0].decode("ascii"), len(body)):
+        body = compression.gzip_body(body)
+        headers += [(b"content-encoding", b"gzip"), (b"vary", b"Accept-Encoding")]
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type),
+            (b"content-length", str(len(body)).encode("ascii")),
+            (b"access-control-allow-origin", b"*"),
+            *headers
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def health(scope, receive):
+    data = core.health_payload()
+    data["limits"] = limits.stats(get_async_client().limiter)
+    return 200, data
+
+
+async def templates(scope, receive):
+    return 200, core.TEMPLATES_BODY
+
+
+async def stats(scope, receive):
+    data = core.stats_payload()
+    data["coalescing"] = dict(_flights.stats(), enabled=coalesce.enabled())
+    data["resilience"] = get_async_upstream().stats()
+    return 200, data
+
+
+async def metrics_endpoint(scope, receive):
+    return 200, metrics.render()
+
+
+async def fetch_completion(payload):
+    """Chamada à OpenRouter; retorna (resultado, corpo_de_erro)"""
+    async with tenants.async_generation(payload.get("n", 1)):
+        response = await get_async_upstream().chat_completion(payload, headers=core.openrouter_headers())
+
+    result = fastjson.parse_response(response)
+
+    if response.status_code != 200:
+        message = streaming.error_message(result)
+        log.error("upstream_error", status=response.status_code, error=message)
+        return None, {"error": f"Erro na API: {message}"}
+
+    if not result or not result.get("choices"):
+        return None, {"error": "Resposta vazia da API"}
+
+    completion = {
+        "content": result["choices"][0]["message"]["content"].strip(),
+        "usage": result.get("usage", {}),
+        "model": result.get("model") or payload["model"]
+    }
+    if len(result["choices"]) > 1:
+        completion["alternatives"] = [choice["message"]["content"].strip() for choice in result["choices"]]
+    metrics.record_usage(completion["model"], completion["usage"])
+    tenants.record_usage(completion["model"], completion["usage"])
+    return completion, None
+
+
+async def generate(scope, receive):
+    """Endpoint principal para geração de conteúdo"""
+    raw = await read_body(receive)
+    try:
+        data = fastjson.loads(raw) if raw else None
+    except ValueError:
+        data = None
+    status, body = await run_generation(data)
+    core.record_generation(data, body, status)
+    return status, body
+
+
+async def estimate(scope, receive):
+    """Tokens e custo previstos para um corpo de /generate, sem chamar a OpenRouter"""
+    raw = await read_body(receive)
+    try:
+        data = fastjson.loads(raw) if raw else None
+    except ValueError:
+        data = None
+    params, error = core.parse_generation_request(data)
+    if error:
+        return 400, {"error": error}
+    return 200, budget.estimate(core.build_payload(params))
+
+
+async def run_generation(data):
+    """Executa uma geração completa; retorna (status_http, corpo_da_resposta)"""
+    try:
+        with metrics.stage("validation"):
+            params, error = core.parse_generation_request(data)
+            if not error:
+                count, error = variants.requested(data)
+        if error:
+            return 400, {"error": error}
+
+        if not core.OPENROUTER_API_KEY:
+            return 500, {"error": "API não configurada. Configure OPENROUTER_API_KEY no arquivo .env"}
+
+        with metrics.stage("prompt_build"):
+            payload = core.build_payload(params)
+            projected = budget.projection(payload, count)
+
+        if count > 1:
+            if variants.use_n():
+                outcomes = [await fetch_completion(dict(payload, n=count))]
+            else:
+                outcomes = await asyncio.gather(*(fetch_completion(payload) for _ in range(count)),
+                                                return_exceptions=True)
+            candidates, error_body = variants.collect(outcomes)
+            if not candidates:
+                return 500, error_body
+            response_data = core.variants_response(params, candidates)
+            response_data["metadata"].update(projected)
+            return 200, response_data
+        key = cache.cache_key(payload)
+        bypass = cache.wants_bypass(data)
+
+        response_cache = cache.get_cache()
+        if response_cache and not bypass:
+            cached = response_cache.get(key)
+            if cached is not None:
+                response_data = core.build_response_data(params, cached["content"], cached["usage"], cached.get("model"))
+                response_data["metadata"].update(projected, cached=True)
+                return 200, response_data
+
+        import semantic  # opcional (SEMANTIC_CACHE): só carregado no primeiro uso
+        semantic_cache = semantic.get_cache()
+        if semantic_cache and not bypass:
+            match = semantic_cache.lookup(core.semantic_partition(params), semantic.query_text(params))
+            if match is not None:
+                response_data = core.semantic_response(params, match)
+                response_data["metadata"].update(projected)
+                return 200, response_data
+
+        # Requisições idênticas simultâneas aguardam a mesma corrotina
+        if bypass or not coalesce.enabled():
+            (completion, error_body), coalesced = await fetch_completion(payload), False
+        else:
+            (completion, error_body), coalesced = await _flights.do(tenants.scoped(key),
+                                                                    lambda: fetch_completion(payload))
+        if error_body:
+            return 500, error_body
+
+        if response_cache and not coalesced:
+            response_cache.set(key, completion)
+        if semantic_cache and not coalesced:
+            semantic_cache.add(core.semantic_partition(params), semantic.query_text(params), completion)
+        response_data = core.build_response_data(params, completion["content"], completion["usage"], completion["model"])
+        response_data["metadata"].update(projected)
+        if coalesced:
+            response_data["metadata"]["coalesced"] = True
+        return 200, response_data
+
+    except tenants.Rejected as e:
+        return e.status, tenants.rejected_body(e)
+
+    except limits.Overloaded as e:
+        log.warning("upstream_overloaded", retry_after=e.retry_after)
+        return 503, limits.overloaded_body(e)
+
+    # TimeoutException herda de TransportError, por isso vem primeiro
+    except upstream.httpx.TimeoutException:
+        log.error("upstream_timeout")
+        return 504, {"error": "A API demorou muito para responder. Tente novamente."}
+
+    except upstream.httpx.TransportError:
+        log.error("upstream_connection_error")
+        return 503, {"error": "Erro de conexão. Verifique sua internet."}
+
+    except Exception as e:
+        log.error("unexpected_error", exc_info=True, error=str(e))
+        return 500, {"error": f"Erro interno do servidor: {str(e)}"}
+
+
+# Respondem com ETag fraco e 304 para quem já tem a versão atual
+CONDITIONAL = (templates, stats)
+
+ROUTES = {
+    "/generate": ("POST", generate),
+    "/generate/estimate": ("POST", estimate),
+    "/health": ("GET", health),
+    "/templates": ("GET", templates),
+    "/stats": ("GET", stats),
+    "/metrics": ("GET", metrics_endpoint)
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _client is not None:
+                await _client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"].rstrip("/") or "/"
+    route = ROUTES.get(path)
+    endpoint = path if route else "unmatched"
+    started = time.perf_counter()
+    metrics.HTTP_IN_FLIGHT.labels(endpoint=endpoint).inc()
+    try:
+        status = await dispatch(scope, receive, send, route)
+    finally:
+        metrics.HTTP_IN_FLIGHT.labels(endpoint=endpoint).dec()
+        metrics.HTTP_DURATION.labels(endpoint=endpoint).observe(time.perf_counter() - started)
+    metrics.HTTP_REQUESTS.labels(endpoint=endpoint, method=scope["method"], status=status).inc()
+
+
+async def dispatch(scope, receive, send, route):
+    """Atende a requisição; retorna o status HTTP enviado"""
+    if route is None:
+        await send_json(send, 404, {"error": "Endpoint não encontrado"})
+        return 404
+
+    method, handler = route
+    if scope["method"] != method:
+        await send_json(send, 405, {"error": "Método não permitido"})
+        return 405
+
+    raw = dict(scope.get("headers", []))
+    tenant = None
+    if limits.is_generation_request(scope["method"], scope["path"]):
+        headers = {"X-API-Key": raw.get(b"x-api-key", b"").decode("latin-1"),
+                   "Authorization": raw.get(b"authorization", b"").decode("latin-1")}
+        if tenants.enabled():
+            try:
+                tenant = tenants.get_registry().admit(limits.api_key(headers))
+            except tenants.Rejected as e:
+                extra = [] if e.retry_after is None else [
+                    (b"retry-after", str(max(1, math.ceil(e.retry_after))).encode("ascii"))]
+                await send_json(send, e.status, tenants.rejected_body(e), headers=extra)
+                return e.status
+        client = scope.get("client") or ("", 0)
+        allowed, retry_after = limits.get_rate_limiter().allow(limits.client_key(client[0], tenant))
+        if not allowed:
+            await send_json(send, 429, limits.rate_limited_body(retry_after),
+                            headers=[(b"retry-after", str(math.ceil(retry_after)).encode("ascii"))])
+            return 429
+
+    if tenant is None:
+        status, data = await handler(scope, receive)
+    else:
+        # Gerações e tokens da requisição vão para a conta do tenant (vaga por chamada)
+        token = tenants.activate(tenant)
+        try:
+            status, data = await handler(scope, receive)
+        finally:
+            tenants.deactivate(token)
+    if isinstance(data, bytes):
+        # Corpo JSON já serializado (ex.: /templates)
+        body, content_type = data, b"application/json"
+    elif isinstance(data, str):
+        body, content_type = data.encode("utf-8"), metrics.CONTENT_TYPE.encode("ascii")
+    else:
+        with metrics.stage("serialization"):
+            body = fastjson.dumps(data)
+        content_type = b"application/json"
+
+    extra = []
+    if handler in CONDITIONAL and status == 200:
+        etag = compression.weak_etag(body)
+        extra = [(b"etag", f'W/"{etag}"'.encode("ascii")), (b"cache-control", b"no-cache")]
+        if compression.etag_matches(raw.get(b"if-none-match", b"").decode("latin-1"), etag):
+            await send({"type": "http.response.start", "status": 304,
+                        "headers": [(b"access-control-allow-origin", b"*"), *extra]})
+            await send({"type": "http.response.body", "body": b""})
+            return 304
+    await send_body(send, status, body, content_type, extra,
+                    gzip_ok=compression.accepts_gzip(raw.get(b"accept-encoding", b"").decode("latin-1")))
+    return status
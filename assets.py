@@ -0,0 +1,191 @@
+"""Arquivos estáticos da página principal (templates/index.html).
+
+O CSS e o JS embutidos na página são extraídos, minificados e servidos em
+/assets/index.<hash>.css|js com cache imutável de um ano: o nome muda quando
+o conteúdo muda. A página fica só com o HTML e as referências aos arquivos.
+Tudo é montado uma vez por aplicação, na primeira visita (o Jinja não roda a
+cada requisição), já com as versões gzip e, com o pacote brotli instalado
+(opcional), br. Em modo debug a página é remontada a cada visita.
+
+/ e /assets respondem com ETag e aceitam GET condicional (304).
+
+Para servir os arquivos por um CDN ou nginx, gere-os em disco:
+
+    python assets.py --out static/build
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+
+from flask import Blueprint, Response, abort, current_app, render_template, request
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele, só gzip
+    brotli = None
+
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# A página muda a cada deploy: sempre revalidada (barato, com ETag)
+PAGE_CACHE_CONTROL = "no-cache"
+# Abaixo disso a compressão não compensa
+MIN_COMPRESS_SIZE = 1024
+
+# Só blocos embutidos (<script src=...> tem atributos e fica como está)
+STYLE_BLOCK = re.compile(r"<style>(.*?)</style>", re.S)
+SCRIPT_BLOCK = re.compile(r"<script>(.*?)</script>", re.S)
+
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_CSS_SPACE = re.compile(r"\s+")
+_CSS_PUNCTUATION = re.compile(r"\s*([{};,])\s*")
+
+_build_lock = threading.Lock()
+
+
+def minify_css(css):
+    """Remove comentários e espaços supérfluos"""
+    css = _CSS_COMMENT.sub("", css)
+    css = _CSS_SPACE.sub(" ", css)
+    css = _CSS_PUNCTUATION.sub(r"\1", css)
+    # Só depois dos dois-pontos: antes deles o espaço separa seletores (a :hover)
+    css = css.replace(": ", ":").replace(";}", "}")
+    return css.strip()
+
+
+def minify_lines(text):
+    """Tira a indentação, linhas em branco e comentários de linha inteira (//)"""
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("//"):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def minify_html(html):
+    """Tira a indentação e as linhas em branco (se não houver <pre> ou <textarea>)"""
+    if "<pre" in html or "<textarea" in html:
+        return html
+    return "\n".join(line.strip() for line in html.splitlines() if line.strip())
+
+
+class Asset:
+    """Conteúdo pronto para servir: ETag e versões pré-comprimidas"""
+
+    def __init__(self, name, body, mimetype):
+        self.name = name
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:20]
+        self.encoded = {}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            if brotli is not None:
+                self.encoded["br"] = brotli.compress(body, quality=11)
+            self.encoded["gzip"] = gzip.compress(body, 9, mtime=0)
+
+    def pick(self, accept_encodings):
+        """(codificação, corpo) preferido pelo cliente; codificação None = sem compressão"""
+        for encoding, body in self.encoded.items():
+            if accept_encodings.quality(encoding) > 0:
+                return encoding, body
+        return None, self.body
+
+    def response(self, cache_control):
+        encoding, body = self.pick(request.accept_encodings)
+        # Cada codificação é uma representação diferente: ETag próprio
+        etag = f"{self.etag}-{encoding}" if encoding else self.etag
+        headers = {"ETag": f'"{etag}"', "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+        return Response(body, mimetype=self.mimetype, headers=headers)
+
+
+class Bundle:
+    """Página sem CSS/JS embutidos e os arquivos extraídos dela"""
+
+    def __init__(self, html, prefix="/assets/"):
+        self.assets = {}
+
+        def extract(extension, mimetype, minify, reference):
+            def replace(match):
+                body = minify(match.group(1)).encode("utf-8")
+                name = f"index.{hashlib.sha256(body).hexdigest()[:12]}.{extension}"
+                self.assets[name] = Asset(name, body, mimetype)
+                return reference.format(url=prefix + name)
+            return replace
+
+        html = STYLE_BLOCK.sub(extract("css", "text/css", minify_css,
+                                       '<link rel="stylesheet" href="{url}">'), html)
+        html = SCRIPT_BLOCK.sub(extract("js", "text/javascript", minify_lines,
+                                        '<script src="{url}"></script>'), html)
+        self.index = Asset("index.html", minify_html(html).encode("utf-8"), "text/html")
+
+    def manifest(self):
+        return {"index.html": self.index.etag, "assets": sorted(self.assets)}
+
+
+def get_bundle():
+    """Bundle da aplicação atual, montado na primeira visita"""
+    if current_app.debug:
+        return Bundle(render_template("index.html"))
+    bundle = current_app.extensions.get("assets")
+    if bundle is None:
+        with _build_lock:
+            bundle = current_app.extensions.get("assets")
+            if bundle is None:
+                bundle = current_app.extensions["assets"] = Bundle(render_template("index.html"))
+    return bundle
+
+
+def index_response():
+    """Resposta de / (página principal)"""
+    return get_bundle().index.response(PAGE_CACHE_CONTROL)
+
+
+blueprint = Blueprint("assets", __name__)
+
+
+@blueprint.route("/assets/<name>")
+def serve_asset(name):
+    asset = get_bundle().assets.get(name)
+    if asset is None:
+        abort(404)
+    return asset.response(ASSET_CACHE_CONTROL)
+
+
+def write_bundle(bundle, out_dir):
+    """Grava a página, os arquivos e as versões comprimidas em ``out_dir``"""
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for asset in [bundle.index, *bundle.assets.values()]:
+        files = {asset.name: asset.body}
+        files.update({f"{asset.name}.{'gz' if encoding == 'gzip' else encoding}": body
+                      for encoding, body in asset.encoded.items()})
+        for filename, body in files.items():
+            with open(os.path.join(out_dir, filename), "wb") as f:
+                f.write(body)
+            written.append((filename, len(body)))
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(bundle.manifest(), f, indent=2)
+        f.write("\n")
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from jinja2 import Environment, FileSystemLoader
+
+    parser = argparse.ArgumentParser(description="Gera os arquivos estáticos de templates/index.html")
+    parser.add_argument("--out", default=os.path.join("static", "build"), help="diretório de saída")
+    parser.add_argument("--templates", default="templates")
+    parser.add_argument("--prefix", default="/assets/", help="URL base dos arquivos na página")
+    args = parser.parse_args()
+
+    html = Environment(loader=FileSystemLoader(args.templates)).get_template("index.html").render()
+    for filename, size in write_bundle(Bundle(html, prefix=args.prefix), args.out):
+        print(f"{size:8d}  {os.path.join(args.out, filename)}")
@@ -0,0 +1,115 @@
+"""Geração em lote: várias especificações numa única requisição.
+
+As chamadas à OpenRouter rodam em paralelo (com limite configurável) e os
+resultados são devolvidos como NDJSON à medida que ficam prontos, então o
+tempo total de um lote fica próximo ao da chamada mais lenta, e não à soma
+de todas.
+
+Formatos aceitos em POST /generate/batch:
+
+    {"items": [{"topic": "...", "platform": "LinkedIn"}, ...], "parallelism": 4}
+
+    {"topic": "...", "platforms": ["LinkedIn", "Instagram"], "tone": "Técnico"}
+
+Campos fora de ``items`` valem como padrão para todos os itens. Use
+``"platforms": "all"`` para gerar para todas as plataformas suportadas.
+"""
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import fastjson
+
+# Campos de controle do lote que não são repassados para cada item
+BATCH_FIELDS = ("items", "platforms", "parallelism")
+
+
+def max_items():
+    return int(os.getenv("BATCH_MAX_ITEMS", "50"))
+
+
+def max_parallelism():
+    return int(os.getenv("BATCH_MAX_PARALLELISM", "20"))
+
+
+def expand_specs(data, supported_platforms):
+    """Lista de especificações do lote; retorna (specs, mensagem_de_erro)"""
+    if not isinstance(data, dict):
+        return None, "Nenhum dado recebido"
+
+    defaults = {k: v for k, v in data.items() if k not in BATCH_FIELDS}
+
+    if "items" in data:
+        items = data["items"]
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return None, "'items' deve ser uma lista de objetos"
+        specs = [dict(defaults, **item) for item in items]
+    elif "platforms" in data:
+        platforms = data["platforms"]
+        if platforms == "all":
+            platforms = list(supported_platforms)
+        if not isinstance(platforms, list):
+            return None, "'platforms' deve ser uma lista ou \"all\""
+        specs = [dict(defaults, platform=platform) for platform in platforms]
+    else:
+        return None, "Informe 'items' ou 'topic' + 'platforms'"
+
+    if not specs:
+        return None, "O lote está vazio"
+    if len(specs) > max_items():
+        return None, f"Lote muito grande (máximo {max_items()} itens)"
+    return specs, None
+
+
+def parallelism_for(data, total):
+    """Paralelismo pedido, limitado por BATCH_MAX_PARALLELISM e pelo tamanho do lote"""
+    try:
+        requested = int(data.get("parallelism", max_parallelism()))
+    except (TypeError, ValueError):
+        requested = max_parallelism()
+    return max(1, min(requested, max_parallelism(), total))
+
+
+def run_batch(specs, run_one, parallelism):
+    """Executa ``run_one(spec) -> (corpo, status)`` em paralelo.
+
+    Gera ``(indice, corpo, status)`` na ordem em que as gerações terminam.
+    """
+    pool = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="batch")
+    try:
+        # Cada item roda com o contexto da requisição (ex.: o tenant de tenants.py)
+        futures = {pool.submit(contextvars.copy_context().run, run_one, spec): index
+                   for index, spec in enumerate(specs)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                body, status = future.result()
+            except Exception as e:
+                body, status = {"error": f"Erro interno: {str(e)}"}, 500
+            yield index, body, status
+    finally:
+        # Cliente desconectou ou lote terminou: não inicia itens pendentes
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def ndjson_stream(specs, run_one, parallelism):
+    """Linhas NDJSON: um objeto por item concluído e um resumo no final"""
+    started = time.perf_counter()
+    succeeded = 0
+    for index, body, status in run_batch(specs, run_one, parallelism):
+        line = {"index": index, "status": status}
+        if status == 200:
+            succeeded += 1
+            line["result"] = body
+        else:
+            line["error"] = body.get("error", "Erro desconhecido")
+        yield fastjson.dumps(line) + b"\n"
+
+    yield fastjson.dumps({
+        "done": True,
+        "total": len(specs),
+        "succeeded": succeeded,
+        "failed": len(specs) - succeeded,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000)
+    }) + b"\n"
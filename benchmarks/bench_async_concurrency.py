@@ -0,0 +1,128 @@
+"""Escalabilidade de concorrência: caminho ASGI (asyncio) x Flask em threads.
+
+Dispara N gerações simultâneas contra o stub da OpenRouter (com latência
+fixa) e mede o tempo total. No caminho assíncrono o tempo deve ficar perto
+da latência do provedor para qualquer N; no caminho com threads ele cresce
+em degraus de N / threads.
+
+    python benchmarks/bench_async_concurrency.py --latency 0.5 --levels 10,100,1000 --threads 16
+
+Por padrão o stub roda no mesmo processo e disputa CPU com a aplicação;
+para números mais limpos suba-o separadamente e passe --upstream:
+
+    python benchmarks/stub_upstream.py --port 8089 --latency 0.5 &
+    python benchmarks/bench_async_concurrency.py --upstream http://127.0.0.1:8089/api/v1
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import common  # noqa: F401  (ajusta sys.path)
+from common import summarize
+from stub_upstream import start_stub
+
+BODY = {"platform": "LinkedIn", "tone": "Profissional", "topic": "IA no marketing digital"}
+
+
+async def call_asgi(app, method, path, body):
+    """Executa uma requisição HTTP diretamente na aplicação ASGI"""
+    payload = json.dumps(body).encode("utf-8")
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "query_string": b""}
+    sent = False
+    status = None
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run_async(app, n):
+    latencies = []
+
+    async def one():
+        start = time.perf_counter()
+        status = await call_asgi(app, "POST", "/generate", BODY)
+        latencies.append(time.perf_counter() - start)
+        return status
+
+    wall = time.perf_counter()
+    statuses = await asyncio.gather(*(one() for _ in range(n)))
+    return time.perf_counter() - wall, latencies, statuses
+
+
+def run_threads(flask_app, n, threads):
+    latencies = []
+
+    def one(_):
+        client = flask_app.test_client()
+        start = time.perf_counter()
+        status = client.post("/generate", json=BODY).status_code
+        latencies.append(time.perf_counter() - start)
+        return status
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(one, range(n)))
+    return time.perf_counter() - wall, latencies, statuses
+
+
+def report(label, n, wall, latencies, statuses):
+    ok = sum(1 for s in statuses if s == 200)
+    stats = summarize(latencies)
+    print(f"{label:<12} N={n:<6} tempo={wall:7.2f}s throughput={n / wall:8.1f} req/s "
+          f"p50={stats['p50_ms']:.0f}ms p99={stats['p99_ms']:.0f}ms ok={ok}/{n}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de concorrência ASGI x threads")
+    parser.add_argument("--latency", type=float, default=0.5, help="latência do stub (s)")
+    parser.add_argument("--levels", default="10,100,500,1000", help="níveis de concorrência")
+    parser.add_argument("--threads", type=int, default=16, help="threads do caminho síncrono")
+    parser.add_argument("--skip-threads", action="store_true", help="mede só o caminho ASGI")
+    parser.add_argument("--upstream", help="URL base de um stub já em execução")
+    args = parser.parse_args()
+
+    server = None if args.upstream else start_stub(latency=args.latency)
+    os.environ["OPENROUTER_BASE_URL"] = args.upstream or server.base_url
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+    # Mede a capacidade do servidor: sem limite por cliente, sem agrupar as
+    # requisições idênticas e com o limitador de saída já aberto
+    os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+    os.environ.setdefault("GENERATION_COALESCING", "0")
+    os.environ.setdefault("UPSTREAM_CONCURRENCY_INITIAL", "1000")
+    os.environ.setdefault("ASYNC_UPSTREAM_CONCURRENCY_INITIAL", "1000")
+    os.environ.setdefault("LOG_SAMPLE_RATE", "0")
+    levels = [int(level) for level in args.levels.split(",")]
+
+    asgi_app = importlib.import_module("asgi_app")
+    flask_module = importlib.import_module("app-simply")
+    flask_module.logger.disabled = True
+
+    async def main():
+        for n in levels:
+            report("asgi", n, *(await run_async(asgi_app.app, n)))
+        await asgi_app.get_async_client().aclose()
+
+    asyncio.run(main())
+
+    if not args.skip_threads:
+        for n in levels:
+            report(f"threads={args.threads}", n, *run_threads(flask_module.app, n, args.threads))
+
+    if server is not None:
+        server.shutdown()
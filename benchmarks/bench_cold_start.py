@@ -0,0 +1,79 @@
+"""Partida a frio: tempo de import da aplicação e da primeira requisição.
+
+Cada amostra é um processo Python novo (como uma instância serverless
+recém-criada) que importa o módulo da aplicação e atende, pelo test client
+do Flask, uma primeira requisição a /generate/estimate (que monta um prompt
+e compila o template usado). Com --top, mostra os módulos mais caros do
+import (python -X importtime).
+
+    python benchmarks/bench_cold_start.py --apps app,app-simply --runs 10 --top 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import common  # noqa: F401  (ajusta sys.path)
+
+PROBE = """
+import importlib, json, sys, time
+started = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+imported = time.perf_counter()
+client = module.app.test_client()
+response = client.post("/generate/estimate", json={"topic": "IA no marketing digital", "length": "longo"})
+assert response.status_code == 200, response.status_code
+first = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_request_ms": (first - imported) * 1000,
+                  "modules": len(sys.modules)}))
+"""
+
+
+def probe_env():
+    env = dict(os.environ, LOG_SAMPLE_RATE="0", PYTHONDONTWRITEBYTECODE="0")
+    env.setdefault("OPENROUTER_API_KEY", "benchmark")
+    return env
+
+
+def run_probe(name, python_args=()):
+    """Um processo novo; retorna (medidas, stderr)"""
+    started = subprocess.run([sys.executable, *python_args, "-c", PROBE, name], cwd=common.ROOT,
+                             env=probe_env(), capture_output=True, text=True, check=True)
+    return json.loads(started.stdout.strip().splitlines()[-1]), started.stderr
+
+
+def top_imports(name, count):
+    """Módulos de nível superior com maior tempo acumulado de import"""
+    _, stderr = run_probe(name, ("-X", "importtime"))
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, package = line[len("import time:"):].split("|")
+        if not package.startswith(" ") or package.startswith("  "):
+            continue
+        rows.append((int(cumulative) / 1000, package.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da partida a frio")
+    parser.add_argument("--apps", default="app,app-simply")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=0, help="mostra os N imports mais caros")
+    args = parser.parse_args()
+
+    # Uma passada descartada: gera os .pyc, como num deploy já empacotado
+    for name in args.apps.split(","):
+        run_probe(name)
+
+    for name in args.apps.split(","):
+        samples = [run_probe(name)[0] for _ in range(args.runs)]
+        import_ms = statistics.median(sample["import_ms"] for sample in samples)
+        first_ms = statistics.median(sample["first_request_ms"] for sample in samples)
+        print(f"{name:<12} import={import_ms:6.1f}ms primeira_requisição={first_ms:6.1f}ms "
+              f"total={import_ms + first_ms:6.1f}ms módulos={samples[0]['modules']}")
+        for cumulative, package in top_imports(name, args.top):
+            print(f"    {cumulative:7.1f}ms {package}")
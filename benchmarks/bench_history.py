@@ -0,0 +1,73 @@
+"""Benchmark do histórico no servidor com muitas linhas.
+
+Popula um banco SQLite temporário com N gerações distribuídas entre várias
+sessões e mede a listagem paginada (com e sem filtros e busca de texto) e a
+vazão das inserções em lote.
+
+    python benchmarks/bench_history.py --rows 300000 --sessions 1000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import common
+import history
+
+PLATFORMS = ("LinkedIn", "Instagram", "Facebook", "Twitter/X")
+TONES = ("Profissional", "Engraçado", "Técnico", "Persuasivo", "Inspiracional", "Descontraído")
+WORDS = ("inovação liderança equipe dados marketing produto cliente cultura remoto "
+         "carreira vendas estratégia tecnologia conteúdo engajamento crescimento").split()
+
+
+def populate(store, rows, sessions):
+    rng = random.Random(42)
+    started = time.perf_counter()
+    for i in range(rows):
+        topic = " ".join(rng.sample(WORDS, 4))
+        store.add(
+            f"session-{i % sessions}",
+            platform=rng.choice(PLATFORMS),
+            tone=rng.choice(TONES),
+            length="medio",
+            topic=topic,
+            article=f"**{topic.title()}**\n\n" + " ".join(rng.choices(WORDS, k=120)),
+            tokens_used=320
+        )
+    store.flush()
+    return time.perf_counter() - started
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return common.summarize(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do histórico (SQLite)")
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = history.HistoryStore(os.path.join(tmp, "history.db"))
+        elapsed = populate(store, args.rows, args.sessions)
+        print(f"Inserção em lote: {args.rows} linhas em {elapsed:.1f}s ({args.rows / elapsed:,.0f} linhas/s)")
+
+        sid = "session-7"
+        _, cursor = store.list(sid, limit=20)
+        cases = {
+            "primeira página": lambda: store.list(sid, limit=20),
+            "página seguinte (cursor)": lambda: store.list(sid, cursor=cursor, limit=20),
+            "filtro plataforma+tom": lambda: store.list(sid, platform="LinkedIn", tone="Técnico", limit=20),
+            "busca de texto (FTS)": lambda: store.list(sid, query="inovação cliente", limit=20),
+            "item completo": lambda: store.get(sid, int(cursor))
+        }
+        for label, fn in cases.items():
+            print(f"{label:<26} {timed(fn, args.repeat)}")
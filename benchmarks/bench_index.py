@@ -0,0 +1,50 @@
+"""Micro-benchmark da página principal (/).
+
+Compara a renderização original (render_template a cada visita, CSS e JS
+embutidos, sem compressão) com a página montada por assets.py: primeira
+visita com gzip (página + CSS + JS) e visitas seguintes, em que o navegador
+revalida a página com If-None-Match (304) e usa os arquivos do cache.
+
+    python benchmarks/bench_index.py --iterations 2000
+"""
+import argparse
+import importlib
+import logging
+import re
+import timeit
+
+from flask import render_template
+
+import common  # noqa: F401  (ajusta sys.path)
+
+logging.disable(logging.CRITICAL)
+core = importlib.import_module("app-simply")
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def report(label, fn, iterations, size):
+    seconds = timeit.timeit(fn, number=iterations)
+    print(f"{label:<28} {seconds / iterations * 1e6:8.1f} µs/req {size:8d} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da página principal")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Rota com o comportamento original, para comparação
+    app = core.create_app()
+    app.add_url_rule("/legacy", "legacy", lambda: render_template("index.html"))
+    client = app.test_client()
+
+    page = client.get("/", headers=GZIP)
+    assets = re.findall(r'/assets/[^"]+', client.get("/").get_data(as_text=True))
+    first_visit = len(page.data) + sum(len(client.get(url, headers=GZIP).data) for url in assets)
+    revalidate = dict(GZIP, **{"If-None-Match": page.headers["ETag"]})
+
+    report("render_template (original)", lambda: client.get("/legacy", headers=GZIP).data, args.iterations,
+           len(client.get("/legacy").data))
+    report("/ gzip, primeira visita", lambda: client.get("/", headers=GZIP).data, args.iterations, first_visit)
+    report("/ revalidação (304)", lambda: client.get("/", headers=revalidate).data, args.iterations,
+           len(client.get("/", headers=revalidate).data))
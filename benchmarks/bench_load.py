@@ -0,0 +1,269 @@
+"""Carga de ponta a ponta: app.py e app-simply.py contra o stub da OpenRouter.
+
+Cada aplicação sobe num servidor HTTP real (werkzeug, com threads) e recebe
+``--requests`` requisições por cenário e nível de concorrência. O stub roda
+em outro processo, com a latência, os erros e o tamanho de resposta pedidos
+(ver stub_upstream.py), para não disputar CPU nem memória com a aplicação.
+
+Para cada combinação são medidos throughput, latência (p50/p90/p99), taxa
+de erro e, numa passada sequencial com tracemalloc, o pico de memória
+alocada por requisição. O tempo até o primeiro byte entra no cenário stream.
+
+    python benchmarks/bench_load.py --apps app,app-simply --scenarios generate,stream \\
+        --concurrency 8,32 --requests 400 --latency 0.2 --distribution lognormal --error-rate 0.02
+
+Linha de base: grave uma vez e compare depois de cada mudança (sai com
+status 1 se alguma métrica piorar além de --tolerance):
+
+    python benchmarks/bench_load.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_load.py --baseline benchmarks/baseline.json
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+import common  # noqa: F401  (ajusta sys.path)
+from common import percentile, summarize
+from stub_upstream import add_stub_arguments
+
+BODY = {"platform": "LinkedIn", "tone": "Profissional", "topic": "IA no marketing digital", "length": "medio"}
+
+SCENARIOS = {
+    "generate": "/generate",
+    "stream": "/generate/stream"
+}
+
+# Métricas comparadas com a linha de base: (nome, maior_é_melhor)
+COMPARED = (("throughput_rps", True), ("p50_ms", False), ("p99_ms", False), ("mem_kib_per_request", False))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub_process(args):
+    """Sobe o stub em outro processo; retorna (processo, url_base)"""
+    port = free_port()
+    command = [sys.executable, os.path.join(common.ROOT, "benchmarks", "stub_upstream.py"),
+               "--port", str(port), "--latency", str(args.latency), "--distribution", args.distribution,
+               "--jitter", str(args.jitter), "--error-rate", str(args.error_rate),
+               "--error-status", args.error_status, "--seed", str(args.seed)]
+    if args.completion_tokens:
+        command += ["--completion-tokens", str(args.completion_tokens)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, f"http://127.0.0.1:{port}/api/v1"
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("stub não respondeu")
+
+
+def serve(flask_app):
+    """Servidor HTTP com threads para a aplicação; retorna (servidor, url_base)"""
+    server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def one_request(session, url, stream):
+    """Retorna (status, latência, tempo_até_primeiro_byte)"""
+    start = time.perf_counter()
+    try:
+        response = session.post(url, json=BODY, stream=stream, timeout=120)
+        first_byte = None
+        chunks = []
+        for chunk in response.iter_content(chunk_size=None):
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            chunks.append(chunk)
+        status = response.status_code
+        # Falha no meio do stream chega como "event: error" com status 200
+        if stream and status == 200 and b"event: error" in b"".join(chunks):
+            status = "stream_error"
+    except requests.exceptions.RequestException:
+        status, first_byte = "exception", None
+    return status, time.perf_counter() - start, first_byte
+
+
+def run_load(base_url, scenario, concurrency, total):
+    url = base_url + SCENARIOS[scenario]
+    stream = scenario == "stream"
+    local = threading.local()
+
+    def worker(_):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        return one_request(session, url, stream)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Aquecimento: conexões abertas e caches de import antes de medir
+        list(pool.map(worker, range(concurrency)))
+        wall = time.perf_counter()
+        samples = list(pool.map(worker, range(total)))
+        wall = time.perf_counter() - wall
+
+    latencies = [latency for _, latency, _ in samples]
+    statuses = {}
+    for status, _, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    result = dict(
+        summarize(latencies),
+        requests=total,
+        throughput_rps=round(total / wall, 1),
+        p90_ms=round(percentile(latencies, 90) * 1000, 2),
+        error_rate=round(1 - statuses.get("200", 0) / total, 4),
+        statuses=statuses
+    )
+    if stream:
+        first_bytes = [first for _, _, first in samples if first is not None]
+        result["ttfb_p50_ms"] = round(percentile(first_bytes, 50) * 1000, 2)
+    return result
+
+
+def measure_memory(flask_app, scenario, samples):
+    """Mediana do pico de memória alocada (tracemalloc) por requisição, em KiB"""
+    client = flask_app.test_client()
+    path = SCENARIOS[scenario]
+    client.post(path, json=BODY).get_data()
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            client.post(path, json=BODY).get_data()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return round(statistics.median(peaks) / 1024, 1)
+
+
+def compare(results, baseline, tolerance):
+    """Imprime as diferenças para a linha de base; retorna as regressões"""
+    regressions = []
+    print(f"\nComparação com a linha de base (tolerância {tolerance:.0%}):")
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"  {key:<32} sem linha de base")
+            continue
+        parts = []
+        for metric, higher_is_better in COMPARED:
+            if metric not in result or not base.get(metric):
+                continue
+            change = result[metric] / base[metric] - 1
+            worse = -change if higher_is_better else change
+            flag = " !" if worse > tolerance else ""
+            if flag:
+                regressions.append(f"{key} {metric}")
+            parts.append(f"{metric}={result[metric]} ({change:+.1%}){flag}")
+        if result["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{key} error_rate")
+            parts.append(f"error_rate={result['error_rate']} (base {base['error_rate']}) !")
+        print(f"  {key:<32} " + " ".join(parts))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga das aplicações Flask")
+    parser.add_argument("--apps", default="app,app-simply", help="módulos das aplicações")
+    parser.add_argument("--scenarios", default="generate,stream", help=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="8,32", help="níveis de concorrência")
+    parser.add_argument("--requests", type=int, default=300, help="requisições por nível")
+    parser.add_argument("--memory-samples", type=int, default=30, help="requisições da passada de memória")
+    parser.add_argument("--upstream", help="URL base de um stub já em execução")
+    parser.add_argument("--baseline", help="JSON com a linha de base para comparar")
+    parser.add_argument("--save-baseline", help="grava os resultados como linha de base")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="piora aceita antes de acusar regressão")
+    parser.add_argument("--json", action="store_true", help="imprime os resultados em JSON")
+    add_stub_arguments(parser)
+    parser.set_defaults(latency=0.1)
+    args = parser.parse_args()
+
+    stub = None
+    if args.upstream:
+        base_url = args.upstream
+    else:
+        stub, base_url = start_stub_process(args)
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    workdir = tempfile.mkdtemp(prefix="bench-load-")
+    os.environ["OPENROUTER_BASE_URL"] = base_url
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+    # Mede a aplicação, não as proteções: sem limite por cliente, sem agrupar
+    # requisições idênticas, limitador de saída aberto e logs de eventos desligados
+    os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+    os.environ.setdefault("GENERATION_COALESCING", "0")
+    os.environ.setdefault("UPSTREAM_CONCURRENCY_INITIAL", str(max(levels)))
+    os.environ.setdefault("UPSTREAM_POOL_MAXSIZE", str(max(levels)))
+    os.environ.setdefault("LOG_SAMPLE_RATE", "0")
+    os.environ.setdefault("HISTORY_DB_PATH", os.path.join(workdir, "history.db"))
+    os.environ.setdefault("JOBS_DB_PATH", os.path.join(workdir, "jobs.db"))
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    results = {}
+    try:
+        for name in args.apps.split(","):
+            module = importlib.import_module(name)
+            logging.getLogger(name).setLevel(logging.WARNING)
+            server, app_url = serve(module.app)
+            for scenario in args.scenarios.split(","):
+                memory = measure_memory(module.app, scenario, args.memory_samples)
+                for concurrency in levels:
+                    result = run_load(app_url, scenario, concurrency, args.requests)
+                    result["mem_kib_per_request"] = memory
+                    key = f"{name}/{scenario}/c{concurrency}"
+                    results[key] = result
+                    extra = f" ttfb_p50={result['ttfb_p50_ms']:.0f}ms" if "ttfb_p50_ms" in result else ""
+                    print(f"{key:<32} {result['throughput_rps']:8.1f} req/s p50={result['p50_ms']:.0f}ms "
+                          f"p90={result['p90_ms']:.0f}ms p99={result['p99_ms']:.0f}ms "
+                          f"erros={result['error_rate']:.1%} mem={memory}KiB/req{extra}")
+            server.shutdown()
+    finally:
+        if stub is not None:
+            stub.terminate()
+
+    config = {key: getattr(args, key) for key in ("requests", "concurrency", "latency", "distribution",
+                                                  "jitter", "error_rate", "error_status",
+                                                  "completion_tokens", "seed")}
+    if args.json:
+        print(json.dumps({"config": config, "results": results}, indent=2))
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"config": config, "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nLinha de base gravada em {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("AVISO: configuração diferente da linha de base; a comparação é aproximada")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões): " + ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Micro-benchmark da montagem de prompt por requisição.
+
+Compara a f-string original (reconstruída a cada chamada, com a indentação
+do código-fonte) com o template pré-compilado de prompts.py, em tempo de
+montagem e em tamanho do prompt enviado.
+
+    python benchmarks/bench_prompt_assembly.py --iterations 100000
+"""
+import argparse
+import importlib
+import logging
+import timeit
+
+import common  # noqa: F401  (ajusta sys.path)
+import prompts
+
+logging.disable(logging.CRITICAL)
+core = importlib.import_module("app-simply")
+
+PARAMS = {
+    "platform": "LinkedIn",
+    "tone": "Profissional",
+    "topic": "Como desenvolver uma cultura de inovação na sua equipe",
+    "length": "medio",
+    "keywords": "#inovação #liderança"
+}
+
+
+def legacy_prompt(params):
+    """Prompt como era montado antes dos templates compilados"""
+    tone = params['tone']
+    keywords = params['keywords']
+    platform_config = core.PLATFORM_CONFIGS.get(params['platform'], core.PLATFORM_CONFIGS['LinkedIn'])
+    return f"""
+        {platform_config['prompt']}
+        
+        TOM: {tone} - {core.TONES.get(tone, core.TONES['Profissional'])}
+        
+        TEMA: {params['topic']}
+        
+        {"INCLUIR ESTAS PALAVRAS-CHAVE: " + keywords if keywords else ""}
+        
+        EXTENSÃO: {params['length']} (ajuste o comprimento conforme)
+        
+        REGRAS IMPORTANTES:
+        1. NÃO use markdown complexo, apenas **negrito** para ênfase
+        2. NÃO adicione títulos como "Post:" ou "Artigo:"
+        3. SEJA específico e evite generalidades
+        4. ADAPTE completamente ao tom {tone}
+        5. Use parágrafos curtos para melhor legibilidade
+        
+        ESTRUTURA DO CONTEÚDO:
+        - Introdução impactante
+        - Desenvolvimento com valor
+        - Conclusão com CTA claro
+        - Hashtags relevantes no final
+        """
+
+
+def compiled_prompt(params):
+    return core.build_payload(params)["messages"][1]["content"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da montagem de prompt")
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    legacy = legacy_prompt(PARAMS)
+    compiled = compiled_prompt(PARAMS)
+    print(f"Tamanho do prompt: original={len(legacy)} chars (~{prompts.estimate_tokens(legacy)} tokens) | "
+          f"compilado={len(compiled)} chars (~{prompts.estimate_tokens(compiled)} tokens)")
+
+    for label, fn in (("f-string original", lambda: legacy_prompt(PARAMS)),
+                      ("template compilado", lambda: core.PROMPT_CATALOG.get(
+                          "LinkedIn", "Profissional", "medio").render(
+                              topic=PARAMS["topic"],
+                              keywords_block=f"INCLUIR ESTAS PALAVRAS-CHAVE: {PARAMS['keywords']}\n\n")),
+                      ("payload completo", lambda: core.build_payload(PARAMS))):
+        seconds = timeit.timeit(fn, number=args.iterations)
+        print(f"{label:<20} {seconds / args.iterations * 1e6:7.3f} µs/req")
+
+    print(f"Templates compilados: {core.PROMPT_CATALOG.stats()}")
@@ -0,0 +1,90 @@
+"""Micro-benchmark da serialização JSON no caminho de geração.
+
+Compara a stdlib (``response.json()``, provider padrão do Flask e
+``json.dumps`` por linha) com fastjson.py em três pontos, com um artigo
+"longo" (~``--completion-tokens`` tokens, acentuado):
+
+- leitura do corpo da OpenRouter;
+- resposta de /generate (jsonify);
+- saída NDJSON de um lote de ``--batch-size`` itens.
+
+    python benchmarks/bench_serialization.py --iterations 2000 --completion-tokens 2000
+"""
+import argparse
+import importlib
+import json
+import logging
+import timeit
+
+import requests
+from flask.json.provider import DefaultJSONProvider
+
+import common  # noqa: F401  (ajusta sys.path)
+import fastjson
+from stub_upstream import completion_body, fake_article
+
+logging.disable(logging.CRITICAL)
+core = importlib.import_module("app-simply")
+
+PARAMS = {
+    "platform": "LinkedIn",
+    "tone": "Profissional",
+    "topic": "Como desenvolver uma cultura de inovação na sua equipe",
+    "length": "longo",
+    "keywords": "#inovação #liderança"
+}
+
+
+def upstream_response(completion_tokens):
+    """requests.Response com o corpo de uma resposta da OpenRouter"""
+    usage = {"prompt_tokens": 250, "completion_tokens": completion_tokens,
+             "total_tokens": 250 + completion_tokens}
+    body = completion_body(core.OPENROUTER_MODEL, fake_article(completion_tokens), usage)
+    response = requests.models.Response()
+    response.status_code = 200
+    response.encoding = "utf-8"
+    response._content = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    return response
+
+
+def stdlib_ndjson(items):
+    return "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items).encode("utf-8")
+
+
+def fast_ndjson(items):
+    return b"".join(fastjson.dumps(item) + b"\n" for item in items)
+
+
+def report(label, fn, iterations):
+    seconds = timeit.timeit(fn, number=iterations)
+    print(f"  {label:<12} {seconds / iterations * 1e6:9.1f} µs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da serialização JSON")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--completion-tokens", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    response = upstream_response(args.completion_tokens)
+    result = fastjson.parse_response(response)
+    data = core.build_response_data(PARAMS, result["choices"][0]["message"]["content"], result["usage"])
+    items = [dict(data, index=i) for i in range(args.batch_size)]
+    stdlib_provider = DefaultJSONProvider(core.app)
+    fast_provider = fastjson.JSONProvider(core.app)
+
+    print(f"Backend: {fastjson.BACKEND} | corpo da OpenRouter: {len(response.content)} bytes")
+
+    print("Leitura do corpo da OpenRouter:")
+    report("stdlib", response.json, args.iterations)
+    report("fastjson", lambda: fastjson.parse_response(response), args.iterations)
+
+    print("Resposta de /generate:")
+    with core.app.app_context():
+        report("stdlib", lambda: stdlib_provider.response(data).get_data(), args.iterations)
+        report("fastjson", lambda: fast_provider.response(data).get_data(), args.iterations)
+
+    print(f"NDJSON de um lote com {args.batch_size} itens:")
+    report("stdlib", lambda: stdlib_ndjson(items), max(1, args.iterations // 10))
+    report("fastjson", lambda: fast_ndjson(items), max(1, args.iterations // 10))
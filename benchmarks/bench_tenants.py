@@ -0,0 +1,51 @@
+"""Micro-benchmark do custo de tenants.py no caminho de /generate.
+
+Mede, com ``--tenants`` tenants cadastrados (num SQLite temporário):
+
+- autenticação e conferência das cotas (o que roda a cada requisição);
+- reserva e liberação da vaga de uma geração (a cada chamada à OpenRouter);
+- lançamento do ``usage`` de uma chamada (janela, totais e fila do registro);
+- /usage de um tenant com o histórico de percentis cheio.
+
+    python benchmarks/bench_tenants.py --tenants 1000 --iterations 50000
+"""
+import argparse
+import os
+import tempfile
+import timeit
+
+import common  # noqa: F401  (ajusta sys.path)
+import tenants
+
+USAGE = {"prompt_tokens": 250, "completion_tokens": 600, "total_tokens": 850}
+
+
+def report(label, fn, iterations):
+    seconds = timeit.timeit(fn, number=iterations)
+    print(f"{label:<32} {seconds / iterations * 1e6:8.2f} µs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark das cotas por tenant")
+    parser.add_argument("--tenants", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Sem cotas: mede o custo da verificação sem esgotá-la no meio do laço
+        registry = tenants.TenantRegistry(os.path.join(tmp, "tenants.db"), max_requests=0, max_tokens=0,
+                                          max_concurrent=0)
+        keys = [registry.create(f"tenant {i}")[1] for i in range(args.tenants)]
+        key = keys[len(keys) // 2]
+        tenant = registry.admit(key)
+
+        def generation():
+            registry.acquire(tenant)
+            registry.release(tenant)
+
+        print(f"{args.tenants} tenants")
+        report("admit (por requisição)", lambda: registry.admit(key), args.iterations)
+        report("acquire + release (por geração)", generation, args.iterations)
+        report("charge (usage de uma chamada)", lambda: registry.charge(tenant, "modelo", USAGE), args.iterations)
+        report("/usage de um tenant", lambda: registry.usage(tenant), max(1, args.iterations // 100))
+        registry.flush()
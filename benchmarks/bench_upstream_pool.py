@@ -0,0 +1,67 @@
+"""Compara requests.post() avulso com o pool keep-alive de upstream.py.
+
+    python benchmarks/bench_upstream_pool.py --requests 500 --concurrency 8
+
+Os números locais não incluem DNS nem handshake TLS (o stub fala HTTP puro),
+então a diferença real contra openrouter.ai tende a ser bem maior.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import common  # noqa: F401  (ajusta sys.path)
+import requests
+
+import upstream
+from common import summarize
+from stub_upstream import start_stub
+
+PAYLOAD = {"model": "stub/model", "messages": [{"role": "user", "content": "olá"}]}
+
+
+def run(label, call, server, total, concurrency):
+    server.reset_counters()
+    latencies = []
+
+    def one(_):
+        start = time.perf_counter()
+        response = call()
+        response.raise_for_status()
+        response.json()
+        latencies.append(time.perf_counter() - start)
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - wall
+
+    reuse = 1 - server.connections / server.requests if server.requests else 0.0
+    stats = summarize(latencies)
+    print(f"{label:<22} conexões={server.connections:<5} reuso={reuse:6.1%} "
+          f"p50={stats['p50_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms "
+          f"throughput={total / wall:.0f} req/s")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do pool de conexões")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="latência do stub (s)")
+    args = parser.parse_args()
+
+    server = start_stub(latency=args.latency)
+    url = f"{server.base_url}/chat/completions"
+    client = upstream.UpstreamClient(base_url=server.base_url, pool_maxsize=args.concurrency)
+
+    fresh = run("requests.post avulso",
+                lambda: requests.post(url, json=PAYLOAD, timeout=10),
+                server, args.requests, args.concurrency)
+    pooled = run("UpstreamClient (pool)",
+                 lambda: client.chat_completion(PAYLOAD),
+                 server, args.requests, args.concurrency)
+
+    print(f"\nGanho p50: {fresh['p50_ms'] - pooled['p50_ms']:.2f}ms | "
+          f"ganho p99: {fresh['p99_ms'] - pooled['p99_ms']:.2f}ms")
+    print(f"Estatísticas do pool: {client.stats()}")
+    server.shutdown()
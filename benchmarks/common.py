@@ -0,0 +1,28 @@
+"""Utilitários compartilhados pelos scripts de benchmark"""
+import os
+import sys
+
+# Permite importar os módulos da raiz do projeto (upstream, app...)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def percentile(samples, pct):
+    """Percentil por interpolação linear (samples não precisa estar ordenado)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(samples):
+    """p50/p99/média em milissegundos"""
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 2) if samples else 0.0
+    }
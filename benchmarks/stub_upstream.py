@@ -0,0 +1,281 @@
+"""Servidor local que imita /api/v1/chat/completions da OpenRouter.
+
+Uso direto:
+    python benchmarks/stub_upstream.py --port 8089 --latency 0.05
+
+Latência, erros e tamanho da resposta são configuráveis e sorteados por um
+gerador com semente fixa (--seed), então a mesma sequência de requisições
+recebe sempre as mesmas respostas:
+
+    python benchmarks/stub_upstream.py --latency 0.8 --distribution lognormal --jitter 0.5 \
+        --error-rate 0.02 --error-status 429,503 --completion-tokens 600
+
+Depois aponte as aplicações para ele:
+    OPENROUTER_BASE_URL=http://127.0.0.1:8089/api/v1 python app.py
+
+Implementado sobre asyncio (HTTP/1.1 com keep-alive), de modo que milhares
+de requisições podem ficar "aguardando o modelo" ao mesmo tempo sem uma
+thread por conexão.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import threading
+
+FAKE_ARTICLE = (
+    "**Um título de teste**\n\n"
+    "Este é um artigo gerado pelo servidor falso da OpenRouter. "
+    "Ele serve apenas para medir o comportamento do servidor Flask.\n\n"
+    "#teste #benchmark"
+)
+FAKE_USAGE = {"prompt_tokens": 200, "completion_tokens": 120, "total_tokens": 320}
+
+DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class StubServer:
+    """Servidor falso.
+
+    ``latency`` é a média por resposta, sorteada conforme ``distribution``:
+    fixed, uniform (± ``jitter`` segundos), exponential ou lognormal (desvio
+    ``jitter`` do log, padrão 0.5). Uma fração ``error_rate`` das requisições
+    recebe um dos ``error_statuses``. Com ``completion_tokens``, o artigo e o
+    ``usage`` têm esse tamanho; sem ele, valem FAKE_ARTICLE e FAKE_USAGE.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, distribution="fixed", jitter=0.0,
+                 error_rate=0.0, error_statuses=(500,), completion_tokens=None, seed=0):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"distribuição desconhecida: {distribution}")
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.distribution = distribution
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.completion_tokens = completion_tokens
+        self.article = fake_article(completion_tokens)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._loop = None
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/api/v1"
+
+    def reset_counters(self):
+        with self.lock:
+            self.connections = 0
+            self.requests = 0
+            self.errors = 0
+
+    def next_response(self):
+        """Sorteia (latência, status_de_erro_ou_None) da próxima resposta"""
+        with self.lock:
+            rng = self._random
+            if not self.latency or self.distribution == "fixed":
+                delay = self.latency
+            elif self.distribution == "uniform":
+                delay = max(0.0, rng.uniform(self.latency - self.jitter, self.latency + self.jitter))
+            elif self.distribution == "exponential":
+                delay = rng.expovariate(1 / self.latency)
+            else:
+                sigma = self.jitter or 0.5
+                delay = rng.lognormvariate(math.log(self.latency) - sigma ** 2 / 2, sigma)
+            error = None
+            if self.error_rate and rng.random() < self.error_rate:
+                error = rng.choice(self.error_statuses)
+                self.errors += 1
+        return delay, error
+
+    def usage_for(self, body):
+        """usage coerente com o pedido: prompt ~4 caracteres por token"""
+        if self.completion_tokens is None:
+            return FAKE_USAGE
+        prompt = sum(len(str(message.get("content", ""))) for message in body.get("messages", []))
+        prompt_tokens = max(1, prompt // 4)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": self.completion_tokens,
+                "total_tokens": prompt_tokens + self.completion_tokens}
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port,
+                                                  backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def shutdown(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+    async def handle_connection(self, reader, writer):
+        with self.lock:
+            self.connections += 1
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                with self.lock:
+                    self.requests += 1
+                keep_alive = await self.respond(request, writer)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        lines = head.decode("latin-1").split("\r\n")
+        method, path, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        raw = await reader.readexactly(length) if length else b""
+        try:
+            body = json.loads(raw or b"{}")
+        except ValueError:
+            body = {}
+        return {"method": method, "path": path, "headers": headers, "body": body}
+
+    async def respond(self, request, writer):
+        """Escreve a resposta; retorna se a conexão deve continuar aberta"""
+        body = request["body"]
+        latency, error = self.next_response()
+        if error:
+            # Erros chegam antes do primeiro byte, como na OpenRouter
+            await asyncio.sleep(min(latency, 0.05))
+            await self.send_json(writer, error, {"error": {"code": error, "message": "Erro simulado"}},
+                                 headers="Retry-After: 1\r\n" if error == 429 else "")
+        elif body.get("stream"):
+            await self.send_stream(writer, latency, self.usage_for(body))
+        else:
+            if latency:
+                await asyncio.sleep(latency)
+            await self.send_json(writer, 200, completion_body(body.get("model", "stub/model"), self.article,
+                                                               self.usage_for(body)))
+        return request["headers"].get("connection", "").lower() != "close"
+
+    async def send_json(self, writer, status, data, headers=""):
+        payload = json.dumps(data).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            "Content-Type: application/json\r\n"
+            f"{headers}Content-Length: {len(payload)}\r\n\r\n".encode("ascii") + payload
+        )
+        await writer.drain()
+
+    async def send_stream(self, writer, latency, usage):
+        """Resposta SSE em chunked encoding, uma palavra por evento"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Transfer-Encoding: chunked\r\n\r\n")
+        words = self.article.split(" ")
+        delay = latency / len(words) if latency else 0
+        write_chunk(writer, ": OPENROUTER PROCESSING\n\n")
+        for i, word in enumerate(words):
+            if delay:
+                await asyncio.sleep(delay)
+            chunk = {"choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]}
+            write_chunk(writer, f"data: {json.dumps(chunk)}\n\n")
+            await writer.drain()
+        write_chunk(writer, f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n")
+        write_chunk(writer, "data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+def fake_article(completion_tokens=None):
+    """FAKE_ARTICLE ou um texto de ~``completion_tokens`` tokens (~4 caracteres cada)"""
+    if completion_tokens is None:
+        return FAKE_ARTICLE
+    sentence = "Este parágrafo simula o texto gerado pelo modelo para o benchmark. "
+    repeats = max(1, math.ceil(completion_tokens * 4 / len(sentence)))
+    return "**Um título de teste**\n\n" + (sentence * repeats).strip() + "\n\n#teste #benchmark"
+
+
+def completion_body(model, article=FAKE_ARTICLE, usage=FAKE_USAGE):
+    return {
+        "id": "gen-stub",
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": article}}],
+        "usage": usage
+    }
+
+
+def write_chunk(writer, text):
+    data = text.encode("utf-8")
+    writer.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+
+def start_stub(host="127.0.0.1", port=0, latency=0.0, **options):
+    """Sobe o servidor falso num event loop em thread própria e o retorna"""
+    server = StubServer(host, port, latency=latency, **options)
+    ready = threading.Event()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return server
+
+
+def add_stub_arguments(parser):
+    """Opções do stub, compartilhadas com os benchmarks que o sobem"""
+    parser.add_argument("--latency", type=float, default=0.0, help="latência média por resposta (s)")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="uniform: ± segundos; lognormal: desvio do log (padrão 0.5)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de respostas com erro")
+    parser.add_argument("--error-status", default="500", help="status de erro sorteados (ex.: 429,503)")
+    parser.add_argument("--completion-tokens", type=int, help="tamanho do artigo gerado, em tokens")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def stub_options(args):
+    return {
+        "latency": args.latency,
+        "distribution": args.distribution,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "error_statuses": [int(status) for status in args.error_status.split(",")],
+        "completion_tokens": args.completion_tokens,
+        "seed": args.seed
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    async def main():
+        server = StubServer(args.host, args.port, **stub_options(args))
+        await server.start()
+        print(f"Stub OpenRouter em {server.base_url}")
+        await server._server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
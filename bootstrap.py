@@ -0,0 +1,74 @@
+"""Inicialização comum das aplicações Flask (create_app de app.py e app-simply.py).
+
+Nada pesado acontece na criação da aplicação: o cliente HTTP da OpenRouter,
+caches, filas de jobs, histórico e templates de prompt são criados no
+primeiro uso. Recursos opcionais (cache semântico, warmup, asyncio) não
+são importados na partida; jobs e tenants entram só pelos blueprints, que
+são leves. O grosso do import fica com Flask e requests, o que conta na
+partida a frio de ambientes serverless (Vercel), onde ela entra direto na
+latência da primeira requisição (benchmarks/bench_cold_start.py).
+"""
+import logging
+import os
+
+from dotenv import load_dotenv
+
+import assets
+import compression
+import fastjson
+import history
+import jobs
+import limits
+import metrics
+import tenants
+
+logger = logging.getLogger(__name__)
+
+DEV_SECRET_KEY = "dev-secret-key-change-in-production"
+
+_env_loaded = False
+
+
+def load_env():
+    """Carrega o .env uma única vez por processo (variáveis já definidas prevalecem)"""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+
+
+def secret_key(debug=False):
+    """Chave das sessões: FLASK_SECRET_KEY, a mesma em todas as instâncias.
+
+    Uma chave aleatória por processo faria cada instância rejeitar o cookie
+    de sessão assinado pelas outras, e uma derivada da OPENROUTER_API_KEY
+    ligaria as sessões a um segredo de outro serviço. Sem FLASK_SECRET_KEY
+    vale a chave de desenvolvimento, que é pública: fora do modo debug isso
+    é registrado como erro.
+    """
+    key = os.getenv("FLASK_SECRET_KEY")
+    if key:
+        return key
+    if debug:
+        logger.warning("FLASK_SECRET_KEY não configurada; usando a chave de desenvolvimento")
+    else:
+        logger.error("FLASK_SECRET_KEY não configurada: as sessões estão assinadas com a chave de "
+                     "desenvolvimento. Defina FLASK_SECRET_KEY em produção")
+    return DEV_SECRET_KEY
+
+
+def init_app(app, config=None):
+    """Configuração comum: chave secreta, JSON rápido e blueprints compartilhados.
+
+    ``config`` sobrepõe app.config (ex.: ``{"TESTING": True}``).
+    """
+    if config:
+        app.config.update(config)
+    if not app.config.get("SECRET_KEY"):
+        app.config["SECRET_KEY"] = secret_key(app.debug or app.testing)
+    app.json = fastjson.JSONProvider(app)
+    # tenants antes de limits: a chave é validada antes de ocupar o rate limiter
+    for blueprint in (metrics.blueprint, assets.blueprint, history.blueprint, jobs.blueprint, tenants.blueprint,
+                      limits.blueprint, compression.blueprint):
+        app.register_blueprint(blueprint)
+    return app
@@ -0,0 +1,173 @@
+"""Orçamento de tokens: tamanho do prompt, max_tokens e custo previsto.
+
+Os tokens do prompt são contados localmente: com tiktoken instalado (e o
+arquivo do vocabulário já em cache, TIKTOKEN_CACHE_DIR), a contagem é exata
+para os modelos da OpenAI; sem ele, um estimador calibrado para português
+(~1,5 token por palavra).
+
+A extensão pedida (curto/medio/longo) vira um número de palavras, limitado
+pelo que cabe na plataforma (legenda de 2200 caracteres no Instagram, 3
+tweets de 280 no Twitter/X, 3000 no LinkedIn), e daí um ``max_tokens`` com
+folga para o modelo concluir o texto sem ser cortado.
+
+Configuração:
+    TOKEN_BUDGET_HEADROOM=1.3   folga do max_tokens sobre o tamanho alvo
+    OPENROUTER_PRICES           preços em USD por 1M de tokens, sobrepondo a
+                                tabela: "modelo=entrada/saída,modelo=..."
+"""
+import math
+import os
+import re
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # opcional: sem ele a contagem é estimada
+    tiktoken = None
+
+# Extensão pedida, em palavras
+LENGTH_WORDS = {
+    "curto": 300,
+    "medio": 500,
+    "longo": 800
+}
+DEFAULT_LENGTH = "medio"
+
+# Limites de caracteres de cada plataforma (Facebook: sem limite prático)
+PLATFORM_MAX_CHARS = {
+    "LinkedIn": 3000,
+    "Instagram": 2200,
+    "Twitter/X": 280 * 3
+}
+
+# Calibração para português: palavra média + espaço/pontuação
+CHARS_PER_WORD = 6
+TOKENS_PER_WORD = 1.5
+
+# Sobrecarga do formato de chat: por mensagem e para o início da resposta
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+# USD por 1M de tokens (entrada, saída)
+MODEL_PRICES = {
+    "openai/gpt-4o": (2.50, 10.00),
+    "openai/gpt-4o-mini": (0.15, 0.60)
+}
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def headroom():
+    return float(os.getenv("TOKEN_BUDGET_HEADROOM", "1.3"))
+
+
+@lru_cache(maxsize=16)
+def _encoding(model):
+    """Codificação do tiktoken para o modelo, ou None se indisponível"""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model.split("/")[-1])
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Vocabulário fora do cache e sem rede: fica com a estimativa
+        return None
+
+
+def estimate_tokens(text):
+    """Estimativa sem tokenizador: palavras longas valem mais de um token"""
+    tokens = 0
+    for piece in _PIECES.findall(text):
+        if piece[0].isalnum() or piece[0] == "_":
+            tokens += 1 + (len(piece) - 1) // 5
+        else:
+            # Emojis e símbolos fora do ASCII costumam ocupar 2+ tokens
+            tokens += max(1, len(piece.encode("utf-8")) // 2)
+    return tokens
+
+
+def count_tokens(text, model="openai/gpt-4o"):
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def message_text(content):
+    """Texto de uma mensagem: string ou lista de partes (ex.: com cache_control)"""
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") for part in content)
+
+
+def count_message_tokens(messages, model="openai/gpt-4o"):
+    """Tokens de entrada de uma lista de mensagens de chat"""
+    return TOKENS_PER_REPLY + sum(
+        TOKENS_PER_MESSAGE + count_tokens(message_text(message["content"]), model) for message in messages)
+
+
+def target_words(platform, length):
+    """Palavras pedidas ao modelo, dentro do limite da plataforma"""
+    words = LENGTH_WORDS.get(length, LENGTH_WORDS[DEFAULT_LENGTH])
+    max_chars = PLATFORM_MAX_CHARS.get(platform)
+    if max_chars:
+        words = min(words, max_chars // CHARS_PER_WORD)
+    return words
+
+
+def max_tokens(platform, length):
+    """Orçamento de saída (inteiro) para a plataforma e extensão"""
+    return math.ceil(target_words(platform, length) * TOKENS_PER_WORD * headroom())
+
+
+@lru_cache(maxsize=1)
+def _price_overrides(spec):
+    prices = {}
+    for entry in filter(None, (item.strip() for item in spec.split(","))):
+        model, _, value = entry.partition("=")
+        prompt_price, _, completion_price = value.partition("/")
+        prices[model.strip()] = (float(prompt_price), float(completion_price or prompt_price))
+    return prices
+
+
+def prices_for(model):
+    """(entrada, saída) em USD por 1M de tokens, ou None se desconhecido"""
+    overrides = _price_overrides(os.getenv("OPENROUTER_PRICES", ""))
+    return overrides.get(model) or MODEL_PRICES.get(model)
+
+
+def estimate(body):
+    """Tamanho e custo previstos de um corpo de /chat/completions, antes da chamada"""
+    model = body["model"]
+    prompt_tokens = count_message_tokens(body["messages"], model)
+    completion_budget = body["max_tokens"]
+    expected_completion = math.ceil(completion_budget / headroom())
+    result = {
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "max_tokens": completion_budget,
+        "expected_completion_tokens": expected_completion,
+        "tokenizer": "tiktoken" if _encoding(model) is not None else "estimate",
+        "projected_cost_usd": None,
+        "max_cost_usd": None
+    }
+    prices = prices_for(model)
+    if prices:
+        prompt_price, completion_price = prices
+        result["projected_cost_usd"] = round(
+            (prompt_tokens * prompt_price + expected_completion * completion_price) / 1e6, 6)
+        result["max_cost_usd"] = round(
+            (prompt_tokens * prompt_price + completion_budget * completion_price) / 1e6, 6)
+    return result
+
+
+def projection(body, calls=1):
+    """Tokens do prompt e custo previsto de ``calls`` chamadas, para o metadata de /generate"""
+    result = estimate(body)
+    cost = result["projected_cost_usd"]
+    return {
+        "prompt_tokens": result["prompt_tokens"],
+        "projected_cost_usd": round(cost * calls, 6) if cost is not None else None
+    }
@@ -0,0 +1,171 @@
+"""Cache de respostas endereçado por conteúdo.
+
+A chave é o hash do prompt final, do modelo e dos parâmetros de amostragem
+enviados à OpenRouter, então duas requisições que geram exatamente o mesmo
+payload compartilham o resultado. Há um nível em memória (LRU com limite de
+tamanho e TTL) e um nível opcional em disco (SQLite) que sobrevive a
+reinícios.
+
+Uma entrada pode guardar várias versões do texto (``{"variants": [...]}``,
+gravadas pelo aquecimento de warmup.py); a cada acerto sai a próxima, em
+rodízio.
+
+Configuração (variáveis de ambiente):
+    GENERATION_CACHE=1              habilita o cache (desligado por padrão)
+    GENERATION_CACHE_SIZE=512       entradas no nível em memória
+    GENERATION_CACHE_TTL=3600       validade de cada entrada, em segundos
+    GENERATION_CACHE_PATH=cache.db  arquivo SQLite do nível em disco (opcional)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+# Campos do payload que não alteram o texto gerado
+IGNORED_PAYLOAD_FIELDS = ("stream", "stream_options")
+
+
+def cache_key(payload):
+    """Hash estável do payload enviado à OpenRouter"""
+    relevant = {k: v for k, v in payload.items() if k not in IGNORED_PAYLOAD_FIELDS}
+    canonical = json.dumps(relevant, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def wants_bypass(data):
+    """True se a requisição pediu ``"cache": "bypass"``"""
+    return isinstance(data, dict) and str(data.get("cache", "")).lower() == "bypass"
+
+
+class ResponseCache:
+    """LRU em memória com TTL e nível opcional em disco"""
+
+    def __init__(self, max_entries=512, ttl=3600, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+        self._db = None
+        self.counters = {"hits": 0, "misses": 0, "disk_hits": 0, "sets": 0, "evictions": 0,
+                         "warm_hits": 0, "tokens_saved": 0}
+        self._rotation = itertools.count()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return self._served(value)
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._store(key, value, row[1])
+                    self.counters["hits"] += 1
+                    self.counters["disk_hits"] += 1
+                    return self._served(value)
+
+            self.counters["misses"] += 1
+            return None
+
+    def _served(self, value):
+        """Versão devolvida neste acerto (rodízio entre as aquecidas) e o que ela poupou"""
+        if isinstance(value, dict) and value.get("variants"):
+            value = value["variants"][next(self._rotation) % len(value["variants"])]
+            self.counters["warm_hits"] += 1
+        usage = value.get("usage") if isinstance(value, dict) else None
+        self.counters["tokens_saved"] += (usage or {}).get("total_tokens", 0)
+        return value
+
+    def remaining(self, key):
+        """Segundos até a entrada expirar (0 se não existe), sem contar como acesso"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            expires_at = entry[0] if entry is not None else 0
+            if self._db is not None:
+                row = self._db.execute("SELECT expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    expires_at = max(expires_at, row[0])
+            return max(0.0, expires_at - now)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._store(key, value, expires_at)
+            self.counters["sets"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), expires_at)
+                )
+                self._db.commit()
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(
+                self.counters,
+                size=len(self._entries),
+                max_entries=self.max_entries,
+                ttl=self.ttl,
+                disk=self._db is not None,
+                hit_rate=round(self.counters["hits"] / lookups, 4) if lookups else 0.0
+            )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_configured = False
+
+
+def get_cache():
+    """Cache do processo, ou None se GENERATION_CACHE não estiver ativo"""
+    global _cache, _configured
+    if not _configured:
+        with _cache_lock:
+            if not _configured:
+                if os.getenv("GENERATION_CACHE", "0") not in ("0", "false", "False", ""):
+                    _cache = ResponseCache(
+                        max_entries=int(os.getenv("GENERATION_CACHE_SIZE", "512")),
+                        ttl=float(os.getenv("GENERATION_CACHE_TTL", "3600")),
+                        path=os.getenv("GENERATION_CACHE_PATH") or None
+                    )
+                _configured = True
+    return _cache
+
+
+def stats():
+    """Contadores para /stats"""
+    current = get_cache()
+    if current is None:
+        return {"enabled": False}
+    return dict(current.stats(), enabled=True)
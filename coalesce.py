@@ -0,0 +1,124 @@
+"""Agrupamento de chamadas idênticas em andamento (single-flight).
+
+Quando várias requisições concorrentes geram exatamente o mesmo payload
+(mesma chave de cache.cache_key), apenas a primeira chama a OpenRouter; as
+demais esperam por ela e recebem o mesmo resultado (ou a mesma exceção).
+Diferente do cache, nada é guardado depois que a chamada termina.
+
+Configuração:
+    GENERATION_COALESCING=1     liga/desliga o agrupamento (ligado por padrão)
+"""
+import os
+import threading
+
+
+def enabled():
+    return os.getenv("GENERATION_COALESCING", "1") not in ("0", "false", "False", "")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Counters:
+    def __init__(self):
+        self.counters = {"requests": 0, "upstream_calls": 0, "collapsed": 0}
+
+    def _count(self, leader):
+        self.counters["requests"] += 1
+        self.counters["upstream_calls" if leader else "collapsed"] += 1
+
+    def stats(self):
+        requests = self.counters["requests"]
+        return dict(
+            self.counters,
+            in_flight=len(self._calls),
+            collapsed_rate=round(self.counters["collapsed"] / requests, 4) if requests else 0.0
+        )
+
+
+class SingleFlight(_Counters):
+    """Versão para threads (Flask)"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Executa ``fn()`` uma vez por chave em andamento; retorna (resultado, compartilhado)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class AsyncSingleFlight(_Counters):
+    """Versão para asyncio (ASGI); usar sempre no mesmo event loop"""
+
+    def __init__(self):
+        super().__init__()
+        self._calls = {}
+
+    async def do(self, key, fn):
+        """Aguarda ``fn()`` uma vez por chave em andamento; retorna (resultado, compartilhado)"""
+        import asyncio  # só o modo ASGI usa; fora da partida das apps Flask
+        future = self._calls.get(key)
+        leader = future is None
+        self._count(leader)
+        if not leader:
+            # shield: um seguidor cancelado não cancela a chamada dos outros
+            return await asyncio.shield(future), True
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # marca como lida se ninguém estiver esperando
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._calls[key]
+        return result, False
+
+
+_group = SingleFlight()
+
+
+def run(key, fn):
+    """Agrupa ``fn()`` pela chave, se o agrupamento estiver ativo"""
+    if key is None or not enabled():
+        return fn(), False
+    return _group.do(key, fn)
+
+
+def stats():
+    """Contadores para /stats"""
+    return dict(_group.stats(), enabled=enabled())
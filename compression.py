@@ -0,0 +1,122 @@
+"""Respostas menores na rede: gzip nas respostas JSON/HTML e GET condicional.
+
+Em conexões móveis os bytes do corpo pesam na latência. Toda resposta JSON,
+NDJSON ou HTML acima de COMPRESSION_MIN_SIZE vai comprimida com gzip para
+quem manda ``Accept-Encoding: gzip``. Respostas que já têm Content-Encoding
+(os arquivos de assets.py, pré-comprimidos) passam direto. Em NDJSON com
+stream (/generate/batch, /history/export) cada trecho é comprimido e
+enviado na hora (flush a cada trecho), sem juntar o corpo inteiro na
+memória. SSE (/generate/stream) fica sem compressão: os eventos são
+pequenos e o flush a cada token custaria mais do que economiza.
+
+``conditional`` dá a /templates e /stats um ETag fraco e responde 304 a
+quem já tem a versão atual. O ETag é fraco para valer tanto para a versão
+comprimida quanto para a original.
+
+Configuração:
+    COMPRESSION=1               0 desliga a compressão
+    COMPRESSION_MIN_SIZE=1024   bytes mínimos do corpo para comprimir
+    COMPRESSION_LEVEL=6         nível do gzip (1 a 9)
+"""
+import gzip
+import hashlib
+import os
+import zlib
+
+from flask import Blueprint, request
+from werkzeug.http import parse_accept_header, parse_etags
+
+import metrics
+
+COMPRESSIBLE = ("application/json", "application/x-ndjson", "text/html")
+STREAMABLE = ("application/x-ndjson",)
+
+
+def enabled():
+    return os.getenv("COMPRESSION", "1") != "0"
+
+
+def min_size():
+    return int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+
+def level():
+    return int(os.getenv("COMPRESSION_LEVEL", "6"))
+
+
+def compressible(mimetype, size):
+    return enabled() and mimetype in COMPRESSIBLE and size >= min_size()
+
+
+def gzip_body(body):
+    metrics.RESPONSE_BYTES.labels(stage="original").inc(len(body))
+    compressed = gzip.compress(body, level(), mtime=0)
+    metrics.RESPONSE_BYTES.labels(stage="compressed").inc(len(compressed))
+    return compressed
+
+
+def gzip_stream(chunks):
+    """Comprime um corpo em stream, trecho a trecho, sem segurar os trechos já enviados"""
+    compressor = zlib.compressobj(level(), zlib.DEFLATED, 31)  # 31: formato gzip
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if chunk:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    finally:
+        # O servidor fecha este gerador; o corpo original (ex.: tenants.streaming) precisa saber
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def accepts_gzip(accept_encoding):
+    """True se o header Accept-Encoding aceita gzip (para o caminho ASGI)"""
+    return parse_accept_header(accept_encoding or "").quality("gzip") > 0
+
+
+def etag_matches(if_none_match, etag):
+    """True se o If-None-Match inclui ``etag`` (comparação fraca)"""
+    return bool(if_none_match) and parse_etags(if_none_match).contains_weak(etag)
+
+
+def weak_etag(body):
+    return hashlib.sha256(body).hexdigest()[:20]
+
+
+def conditional(response, etag=None):
+    """ETag fraco (do corpo, se ``etag`` não vier) e 304 se o cliente já tem esta versão"""
+    response.set_etag(etag or weak_etag(response.get_data()), weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+blueprint = Blueprint("compression", __name__)
+
+
+@blueprint.after_app_request
+def compress_response(response):
+    if (not enabled() or response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers or response.direct_passthrough
+            or response.mimetype not in COMPRESSIBLE or request.accept_encodings.quality("gzip") <= 0):
+        return response
+
+    if response.is_streamed:
+        if response.mimetype not in STREAMABLE:
+            return response
+        response.response = gzip_stream(response.response)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if not compressible(response.mimetype, len(body)):
+            return response
+        response.set_data(gzip_body(body))
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # ETag forte identifica os bytes: a versão comprimida tem o seu
+            response.set_etag(f"{etag}-gzip")
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
@@ -0,0 +1,82 @@
+import importlib
+import json
+
+import pytest
+
+import history
+import limits
+import resilience
+
+# test_api.py é um script manual (faz POST em localhost:5000 ao ser importado)
+collect_ignore = ["test_api.py"]
+
+
+class FakeResponse:
+    """Resposta da OpenRouter: corpo JSON ou linhas SSE"""
+
+    def __init__(self, status_code=200, body=None, lines=()):
+        self.status_code = status_code
+        self.headers = {}
+        self.content = json.dumps(body).encode() if body is not None else b""
+        self.lines = list(lines)
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+    def close(self):
+        pass
+
+
+class FakeUpstream:
+    """Faz o papel de resilience.get_upstream(), sem rede"""
+
+    def __init__(self):
+        self.texts = ["Post sobre IA no marketing. #IA #marketing #dados"]
+        self.model = None
+        self.status_code = 200
+        self.calls = []
+
+    def chat_completion(self, body, headers=None, stream=False):
+        # Textos em rodízio, um por chamada (ou por escolha, com "n")
+        first = len(self.calls)
+        self.calls.append(body)
+        text = self.texts[first % len(self.texts)]
+        usage = {"prompt_tokens": 50, "completion_tokens": 20, "total_tokens": 70}
+        if self.status_code != 200:
+            return FakeResponse(self.status_code, {"error": {"message": "recusado"}})
+        if stream:
+            chunks = [{"choices": [{"delta": {"content": text[:10]}}]},
+                      {"choices": [{"delta": {"content": text[10:]}}], "usage": usage}]
+            return FakeResponse(lines=[b"data: " + json.dumps(chunk).encode() for chunk in chunks] +
+                                [b"data: [DONE]"])
+        choices = [{"message": {"content": self.texts[(first + i) % len(self.texts)]}}
+                   for i in range(body.get("n", 1))]
+        return FakeResponse(body={"choices": choices, "usage": usage, "model": self.model or body["model"]})
+
+    def stats(self):
+        return {"calls": len(self.calls)}
+
+
+@pytest.fixture
+def fake_upstream(monkeypatch):
+    fake = FakeUpstream()
+    monkeypatch.setattr(resilience, "get_upstream", lambda: fake)
+    return fake
+
+
+@pytest.fixture(params=["app", "app-simply"])
+def app_module(request, monkeypatch, tmp_path):
+    """Os dois apps Flask, com bancos temporários e sem limite de taxa"""
+    monkeypatch.setenv("HISTORY_DB_PATH", str(tmp_path / "history.db"))
+    monkeypatch.setenv("JOBS_DB_PATH", str(tmp_path / "jobs.db"))
+    monkeypatch.setenv("RATE_LIMIT_PER_MINUTE", "0")
+    monkeypatch.setattr(limits, "_rate_limiter", None)
+    monkeypatch.setattr(history, "_store", None)
+    module = importlib.import_module(request.param)
+    monkeypatch.setattr(module, "OPENROUTER_API_KEY", "chave-de-teste")
+    return module
+
+
+@pytest.fixture
+def client(app_module, fake_upstream):
+    return app_module.create_app({"TESTING": True}).test_client()
@@ -0,0 +1,85 @@
+"""Logs estruturados, amostrados e fora do caminho da requisição.
+
+Cada evento vira uma linha JSON (``{"ts", "level", "logger", "event", ...}``)
+entregue a uma fila; uma thread de fundo (QueueListener) faz a escrita em
+stderr. Eventos informativos do caminho quente são amostrados; avisos e
+erros são sempre registrados.
+
+Configuração:
+    LOG_SAMPLE_RATE=0.1     fração dos eventos informativos registrada
+    LOG_LEVEL=INFO
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage()
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_queue = queue.SimpleQueue()
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def _queue_handler():
+    """Handler compartilhado; a thread de escrita sobe no primeiro uso"""
+    global _handler
+    if _handler is None:
+        with _handler_lock:
+            if _handler is None:
+                output = logging.StreamHandler(sys.stderr)
+                output.setFormatter(logging.Formatter("%(message)s"))
+                listener = logging.handlers.QueueListener(_queue, output)
+                listener.start()
+                atexit.register(listener.stop)
+                handler = logging.handlers.QueueHandler(_queue)
+                # A linha JSON é montada antes de entrar na fila
+                handler.setFormatter(JsonFormatter())
+                _handler = handler
+    return _handler
+
+
+class EventLogger:
+    def __init__(self, name, sample_rate=None):
+        if sample_rate is None:
+            sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+        self.sample_rate = sample_rate
+        self._logger = logging.getLogger(f"events.{name}")
+        self._logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        self._logger.propagate = False
+        if not self._logger.handlers:
+            self._logger.addHandler(_queue_handler())
+
+    def event(self, name, **fields):
+        """Evento informativo, amostrado por LOG_SAMPLE_RATE"""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        self._logger.info(name, extra={"fields": fields})
+
+    def warning(self, name, **fields):
+        self._logger.warning(name, extra={"fields": fields})
+
+    def error(self, name, exc_info=False, **fields):
+        self._logger.error(name, exc_info=exc_info, extra={"fields": fields})
+
+
+def get_logger(name):
+    return EventLogger(name)
@@ -0,0 +1,63 @@
+"""Serialização JSON rápida: orjson quando instalado, json da stdlib como reserva.
+
+orjson é opcional (``pip install orjson``). Ele lê bytes e escreve bytes
+UTF-8 direto, sem a volta por ``str``: o corpo da OpenRouter é lido de
+``response.content`` sem decodificar, e as respostas (jsonify, SSE, NDJSON)
+saem já em bytes. A saída equivale a ``json.dumps(..., ensure_ascii=False)``
+compacto.
+
+Nas aplicações Flask, ``app.json = fastjson.JSONProvider(app)`` faz
+``jsonify`` e ``request.get_json`` passarem por aqui.
+"""
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # opcional: sem ele vale a stdlib
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj):
+        """Objeto -> bytes UTF-8"""
+        return orjson.dumps(obj, default=str, option=_OPTIONS)
+
+    loads = orjson.loads
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+
+    def dumps(obj):
+        """Objeto -> bytes UTF-8"""
+        return _encoder.encode(obj).encode("utf-8")
+
+    loads = json.loads
+
+
+def parse_response(response):
+    """Corpo JSON de uma resposta HTTP (requests ou httpx), lido uma única vez.
+
+    Retorna None se o corpo não for JSON (ex.: página de erro de um proxy).
+    """
+    try:
+        return loads(response.content)
+    except ValueError:
+        return None
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Provider do Flask sobre dumps/loads deste módulo"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj) + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,336 @@
+"""Histórico de gerações no servidor (SQLite em modo WAL).
+
+Substitui a lista de histórico que ficava no cookie da sessão: o cookie
+passa a carregar só um identificador fixo (``sid``) e os artigos ficam numa
+tabela indexada por sessão, data, plataforma e tom, com busca de texto
+completo (FTS5) sobre tema e corpo do artigo.
+
+As inserções são feitas em lote por uma thread de escrita (write-behind),
+fora do caminho da requisição.
+
+Configuração:
+    HISTORY_DB_PATH=history.db      arquivo SQLite
+    HISTORY_FLUSH_INTERVAL=0.2      segundos entre gravações em lote
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import Blueprint, Response, jsonify, request, session
+
+import fastjson
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    platform TEXT NOT NULL,
+    tone TEXT NOT NULL,
+    length TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    article TEXT NOT NULL,
+    tokens_used INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_generations_session ON generations (session_id, id);
+CREATE INDEX IF NOT EXISTS idx_generations_created ON generations (created_at);
+CREATE INDEX IF NOT EXISTS idx_generations_platform ON generations (session_id, platform, id);
+CREATE INDEX IF NOT EXISTS idx_generations_tone ON generations (session_id, tone, id);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS generations_fts
+    USING fts5(topic, article, content='generations', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS generations_fts_insert AFTER INSERT ON generations BEGIN
+    INSERT INTO generations_fts (rowid, topic, article) VALUES (new.id, new.topic, new.article);
+END;
+CREATE TRIGGER IF NOT EXISTS generations_fts_delete AFTER DELETE ON generations BEGIN
+    INSERT INTO generations_fts (generations_fts, rowid, topic, article)
+        VALUES ('delete', old.id, old.topic, old.article);
+END;
+"""
+
+LIST_COLUMNS = ("g.id, g.created_at, g.platform, g.tone, g.length, g.topic, "
+                "g.tokens_used, substr(g.article, 1, 100)")
+
+MAX_PAGE_SIZE = 100
+
+
+class HistoryStore:
+    def __init__(self, path, flush_interval=0.2, batch_size=500, queue_size=10000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._queue = queue.Queue(maxsize=queue_size)
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        try:
+            conn.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite compilado sem FTS5: a busca cai para LIKE
+            logger.warning("FTS5 indisponível; busca do histórico usará LIKE")
+            self.fts = False
+        conn.commit()
+
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Escrita ---------------------------------------------------------------
+
+    def add(self, session_id, platform, tone, length, topic, article, tokens_used=0, created_at=None):
+        """Enfileira uma geração para gravação em lote"""
+        row = (session_id, created_at or time.time(), platform, tone, length, topic, article, tokens_used)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            # Fila cheia: grava direto para não perder o registro
+            self._insert([row])
+
+    def _insert(self, rows):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO generations (session_id, created_at, platform, tone, length, topic, article, tokens_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def _write_loop(self):
+        while True:
+            rows = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(rows) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    rows.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._insert(rows)
+            except sqlite3.Error as e:
+                logger.error(f"Falha ao gravar histórico ({len(rows)} registros): {e}")
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Bloqueia até a fila de gravação esvaziar"""
+        self._queue.join()
+
+    # Leitura ---------------------------------------------------------------
+
+    def _filters(self, session_id, cursor=None, platform=None, tone=None, query=None):
+        """(tabelas, condições, argumentos) da consulta ao histórico da sessão"""
+        conditions = ["g.session_id = ?"]
+        args = [session_id]
+        if cursor:
+            conditions.append("g.id < ?")
+            args.append(int(cursor))
+        if platform:
+            conditions.append("g.platform = ?")
+            args.append(platform)
+        if tone:
+            conditions.append("g.tone = ?")
+            args.append(tone)
+
+        source = "generations g"
+        if query and self.fts:
+            source += " JOIN generations_fts f ON f.rowid = g.id"
+            conditions.append("generations_fts MATCH ?")
+            args.append(fts_query(query))
+        elif query:
+            conditions.append("(g.topic LIKE ? OR g.article LIKE ?)")
+            args.extend([f"%{query}%", f"%{query}%"])
+        return source, " AND ".join(conditions), args
+
+    def list(self, session_id, cursor=None, limit=20, platform=None, tone=None, query=None):
+        """Página do histórico (mais recentes primeiro); retorna (itens, próximo_cursor)"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        source, where, args = self._filters(session_id, cursor, platform, tone, query)
+        sql = f"SELECT {LIST_COLUMNS} FROM {source} WHERE {where} ORDER BY g.id DESC LIMIT ?"
+        rows = self._connect().execute(sql, args + [limit + 1]).fetchall()
+
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        return [row_to_item(row) for row in rows[:limit]], next_cursor
+
+    def iter_items(self, session_id, platform=None, tone=None, query=None, batch_size=200):
+        """Todo o histórico da sessão, com os artigos inteiros, em lotes de ``batch_size``.
+
+        Usa uma conexão própria, fechada no fim: o gerador é consumido
+        enquanto a resposta é enviada, e a memória fica limitada a um lote.
+        """
+        source, where, args = self._filters(session_id, None, platform, tone, query)
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            rows = conn.execute(f"SELECT {LIST_COLUMNS}, g.article FROM {source} WHERE {where} ORDER BY g.id DESC",
+                                args)
+            while True:
+                batch = rows.fetchmany(batch_size)
+                if not batch:
+                    break
+                items = []
+                for row in batch:
+                    item = row_to_item(row[:-1])
+                    item["article"] = row[-1]
+                    items.append(item)
+                yield items
+        finally:
+            conn.close()
+
+    def get(self, session_id, item_id):
+        row = self._connect().execute(
+            f"SELECT {LIST_COLUMNS}, g.article FROM generations g WHERE g.session_id = ? AND g.id = ?",
+            (session_id, item_id)
+        ).fetchone()
+        if row is None:
+            return None
+        item = row_to_item(row[:-1])
+        item["article"] = row[-1]
+        return item
+
+    def delete(self, session_id, item_id=None):
+        """Remove um item (ou todo o histórico da sessão); retorna quantos saíram"""
+        conn = self._connect()
+        with conn:
+            if item_id is None:
+                cursor = conn.execute("DELETE FROM generations WHERE session_id = ?", (session_id,))
+            else:
+                cursor = conn.execute("DELETE FROM generations WHERE session_id = ? AND id = ?",
+                                      (session_id, item_id))
+        return cursor.rowcount
+
+
+def fts_query(text):
+    """Cada palavra vira um termo entre aspas (sem operadores FTS do usuário)"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+
+def row_to_item(row):
+    item_id, created_at, platform, tone, length, topic, tokens_used, preview = row
+    return {
+        "id": item_id,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(created_at)),
+        "platform": platform,
+        "tone": tone,
+        "length": length,
+        "topic": topic,
+        "tokens_used": tokens_used,
+        "preview": preview
+    }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = HistoryStore(
+                    os.getenv("HISTORY_DB_PATH", "history.db"),
+                    flush_interval=float(os.getenv("HISTORY_FLUSH_INTERVAL", "0.2"))
+                )
+    return _store
+
+
+def session_id():
+    """Identificador da sessão atual (criado na primeira visita; tamanho fixo no cookie)"""
+    if "sid" not in session:
+        session["sid"] = uuid.uuid4().hex
+        session.permanent = True
+    return session["sid"]
+
+
+def record(sid, spec, body, status):
+    """Registra no histórico uma geração concluída com sucesso"""
+    if status != 200:
+        return
+    metadata = body.get("metadata", {})
+    get_store().add(
+        sid,
+        platform=metadata.get("platform", spec.get("platform", "")),
+        tone=metadata.get("tone", spec.get("tone", "")),
+        length=metadata.get("length", spec.get("length", "")),
+        topic=str(spec.get("topic", "")).strip()[:150],
+        article=body.get("article", ""),
+        tokens_used=metadata.get("tokens_used", metadata.get("estimated_tokens", 0))
+    )
+
+
+blueprint = Blueprint("history", __name__)
+
+
+@blueprint.route('/history', methods=['GET'])
+def list_history():
+    """Histórico paginado da sessão: ?cursor=&limit=&platform=&tone=&q="""
+    try:
+        items, next_cursor = get_store().list(
+            session_id(),
+            cursor=request.args.get("cursor"),
+            limit=request.args.get("limit", 20),
+            platform=request.args.get("platform"),
+            tone=request.args.get("tone"),
+            query=request.args.get("q")
+        )
+        return jsonify({"history": items, "next_cursor": next_cursor})
+    except ValueError:
+        return jsonify({"error": "Parâmetros de paginação inválidos"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@blueprint.route('/history/export', methods=['GET'])
+def export_history():
+    """Histórico completo da sessão em NDJSON, em stream: ?platform=&tone=&q="""
+    items = get_store().iter_items(
+        session_id(),
+        platform=request.args.get("platform"),
+        tone=request.args.get("tone"),
+        query=request.args.get("q")
+    )
+    # Um trecho por lote: o corpo nunca fica inteiro na memória
+    lines = (b"".join(fastjson.dumps(item) + b"\n" for item in batch) for batch in items)
+    return Response(lines, mimetype="application/x-ndjson",
+                    headers={"Content-Disposition": 'attachment; filename="historico.ndjson"'})
+
+
+@blueprint.route('/history/<int:item_id>', methods=['GET'])
+def get_history_item(item_id):
+    item = get_store().get(session_id(), item_id)
+    if item is None:
+        return jsonify({"error": "Item não encontrado"}), 404
+    return jsonify(item)
+
+
+@blueprint.route('/history/<int:item_id>', methods=['DELETE'])
+def delete_history_item(item_id):
+    if not get_store().delete(session_id(), item_id):
+        return jsonify({"error": "Item não encontrado"}), 404
+    return jsonify({"deleted": item_id})
+
+
+@blueprint.route('/history', methods=['DELETE'])
+def clear_history():
+    return jsonify({"deleted": get_store().delete(session_id())})
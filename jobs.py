@@ -0,0 +1,505 @@
+"""Fila de jobs para gerações longas e lotes, fora da requisição HTTP.
+
+POST /jobs aceita o corpo de /generate (ou de /generate/batch) e responde
+202 na hora com o id do job; um pool de workers executa a geração com a
+mesma lógica das rotas síncronas. O resultado fica guardado (com expiração)
+para GET /jobs/<id> e, se o pedido trouxer ``callback_url``, é enviado por
+POST para essa URL ao terminar.
+
+Jobs e resultados ficam num SQLite (JOBS_DB_PATH). A entrega aos workers
+passa por um broker plugável, com ``put(job_id)`` e ``get(timeout)``:
+
+    memory  fila em memória; os workers são threads do próprio servidor
+    sqlite  os workers buscam jobs pendentes na tabela, então podem rodar em
+            outros processos (ver worker.py) e escalar à parte
+
+Configuração:
+    JOBS_DB_PATH=jobs.db
+    JOBS_BROKER=memory          memory ou sqlite
+    JOB_WORKERS=4               workers neste processo (0: só enfileira)
+    JOBS_RESULT_TTL=3600        segundos que um resultado fica disponível
+    JOBS_QUEUE_MAX=1000         jobs pendentes antes de responder 503
+    JOBS_STALE_AFTER=600        job "running" sem dono volta para a fila
+    JOBS_CALLBACK_HOSTS         hosts permitidos em callback_url, separados por
+                                vírgula (vazio: callbacks desligados)
+
+Antes de cada POST de callback o host é resolvido e, se algum endereço for
+de loopback, rede privada, link-local ou reservado, a entrega é recusada:
+nem um host da lista nem um redirecionamento chegam à rede interna.
+"""
+import ipaddress
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+import requests
+from flask import Blueprint, jsonify, request, url_for
+
+import batch
+import history
+import limits
+import tenants
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    request TEXT NOT NULL,
+    callback_url TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    expires_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result_status INTEGER,
+    result TEXT,
+    callback_status TEXT,
+    tenant_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_expires ON jobs (expires_at);
+"""
+
+JOB_COLUMNS = ("id, session_id, kind, status, request, callback_url, created_at, started_at, "
+               "finished_at, expires_at, attempts, result_status, result, callback_status, tenant_id")
+
+CALLBACK_ATTEMPTS = 3
+
+
+class JobStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        try:
+            # Bancos criados antes de tenants.py
+            conn.execute("ALTER TABLE jobs ADD COLUMN tenant_id TEXT")
+        except sqlite3.OperationalError:
+            pass
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, session_id, kind, spec, callback_url=None, tenant_id=None):
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO jobs (id, session_id, kind, status, request, callback_url, created_at, tenant_id) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, session_id, kind, json.dumps(spec, ensure_ascii=False), callback_url, time.time(),
+                 tenant_id)
+            )
+        return job_id
+
+    def claim(self, job_id):
+        """Marca o job como em execução; None se outro worker chegou antes"""
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 "
+                "WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            )
+        if not cursor.rowcount:
+            return None
+        return self.get(job_id)
+
+    def next_queued(self):
+        row = self._connect().execute(
+            "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def finish(self, job_id, status, result_status, result, ttl):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, expires_at = ?, result_status = ?, result = ? "
+                "WHERE id = ?",
+                (status, now, now + ttl, result_status, json.dumps(result, ensure_ascii=False), job_id)
+            )
+
+    def set_callback_status(self, job_id, callback_status):
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE jobs SET callback_status = ? WHERE id = ?", (callback_status, job_id))
+
+    def get(self, job_id):
+        row = self._connect().execute(
+            f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (job_id, time.time())
+        ).fetchone()
+        return dict(zip(JOB_COLUMNS.split(", "), row)) if row else None
+
+    def pending(self):
+        return self._connect().execute(
+            "SELECT count(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def recover(self, stale_after):
+        """Devolve à fila jobs abandonados em execução; retorna os ids pendentes"""
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running' AND started_at < ?",
+                         (time.time() - stale_after,))
+        rows = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at").fetchall()
+        return [row[0] for row in rows]
+
+    def purge(self):
+        """Remove resultados expirados; retorna quantos saíram"""
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute("DELETE FROM jobs WHERE expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+    def counts(self):
+        rows = self._connect().execute("SELECT status, count(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+
+class MemoryBroker:
+    """Fila em memória: entrega só aos workers deste processo"""
+    name = "memory"
+
+    def __init__(self, maxsize=0):
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, job_id):
+        self._queue.put_nowait(job_id)
+
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class SQLiteBroker:
+    """A própria tabela é a fila: qualquer processo com o arquivo consome"""
+    name = "sqlite"
+
+    def __init__(self, store, poll_interval=0.5):
+        self.store = store
+        self.poll_interval = poll_interval
+
+    def put(self, job_id):
+        pass  # a linha com status 'queued' já é a mensagem
+
+    def get(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            job_id = self.store.next_queued()
+            if job_id is not None or time.monotonic() >= deadline:
+                return job_id
+            time.sleep(self.poll_interval)
+
+
+class JobQueue:
+    """Aceita jobs e os executa num pool de threads.
+
+    ``run_one(spec, session_id) -> (corpo, status)`` é a geração síncrona da
+    aplicação; ``validate(spec) -> (params, erro)`` valida o pedido antes de
+    enfileirar, para erros de entrada saírem como 400 na hora.
+    """
+
+    def __init__(self, store, broker, run_one, validate, platforms, ttl=3600, max_pending=1000,
+                 stale_after=600):
+        self.store = store
+        self.broker = broker
+        self.run_one = run_one
+        self.validate = validate
+        self.platforms = list(platforms)
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.stale_after = stale_after
+        self._threads = []
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "callbacks_failed": 0}
+
+    def start(self, workers):
+        with self._lock:
+            if self._threads or workers <= 0:
+                return
+            for job_id in self.store.recover(self.stale_after):
+                self.broker.put(job_id)
+            for i in range(workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    # Entrada ---------------------------------------------------------------
+
+    def submit(self, data, session_id, tenant_id=None):
+        """Valida e enfileira; retorna (id_do_job, mensagem_de_erro)"""
+        if not isinstance(data, dict):
+            return None, "Nenhum dado recebido"
+        data = dict(data)
+        callback_url = data.pop("callback_url", None)
+        if callback_url is not None and not callback_allowed(callback_url):
+            return None, "callback_url inválida ou não permitida"
+
+        if "items" in data or "platforms" in data:
+            kind = "batch"
+            specs, error = batch.expand_specs(data, self.platforms)
+        else:
+            kind = "generation"
+            specs, error = [data], None
+        for spec in specs or []:
+            if error:
+                break
+            error = self.validate(spec)[1]
+        if error:
+            return None, error
+
+        if self.store.pending() >= self.max_pending:
+            raise limits.Overloaded(retry_after=5)
+        job_id = self.store.create(session_id, kind, data, callback_url, tenant_id)
+        self.broker.put(job_id)
+        self.counters["submitted"] += 1
+        return job_id, None
+
+    # Execução --------------------------------------------------------------
+
+    def _work(self):
+        while True:
+            job_id = self.broker.get(timeout=1.0)
+            if job_id is None:
+                self._maybe_purge()
+                continue
+            job = self.store.claim(job_id)
+            if job is not None:
+                self._run(job)
+
+    def _run(self, job):
+        spec = json.loads(job["request"])
+        # Tokens gastos pelo job vão para a conta de quem o criou
+        tenant = tenants.get_registry().get(job["tenant_id"]) if job["tenant_id"] else None
+        token = tenants.activate(tenant)
+        try:
+            if job["kind"] == "batch":
+                result, result_status = self._run_batch(spec, job["session_id"]), 200
+            else:
+                result, result_status = self.run_one(spec, job["session_id"])
+        except Exception as e:
+            logger.error(f"Job {job['id']} falhou: {e}", exc_info=True)
+            result, result_status = {"error": f"Erro interno: {str(e)}"}, 500
+        finally:
+            tenants.deactivate(token)
+
+        status = "done" if result_status == 200 else "failed"
+        self.store.finish(job["id"], status, result_status, result, self.ttl)
+        self.counters["completed" if status == "done" else "failed"] += 1
+
+        if job["callback_url"]:
+            self._deliver(job["id"], job["callback_url"])
+
+    def _run_batch(self, spec, session_id):
+        specs, _ = batch.expand_specs(spec, self.platforms)
+        parallelism = batch.parallelism_for(spec, len(specs))
+        items = [None] * len(specs)
+        for index, body, status in batch.run_batch(specs, lambda item: self.run_one(item, session_id),
+                                                   parallelism):
+            line = {"index": index, "status": status}
+            if status == 200:
+                line["result"] = body
+            else:
+                line["error"] = body.get("error", "Erro desconhecido")
+            items[index] = line
+        succeeded = sum(1 for item in items if item["status"] == 200)
+        return {"items": items, "total": len(items), "succeeded": succeeded, "failed": len(items) - succeeded}
+
+    def _deliver(self, job_id, url):
+        """POST do job concluído para callback_url, com até 3 tentativas"""
+        payload = job_payload(self.store.get(job_id))
+        for attempt in range(CALLBACK_ATTEMPTS):
+            try:
+                # Resolve a cada tentativa: o DNS pode ter mudado desde a anterior
+                if not callback_allowed(url) or not public_host(urlparse(url).hostname):
+                    logger.warning(f"Callback do job {job_id} recusado: {url} não é um destino público permitido")
+                    break
+                response = requests.post(url, json=payload, timeout=10, allow_redirects=False)
+                if response.status_code < 400:
+                    self.store.set_callback_status(job_id, "delivered")
+                    return
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Callback do job {job_id} falhou: {e}")
+            if attempt + 1 < CALLBACK_ATTEMPTS:
+                time.sleep(2 ** attempt)
+        self.store.set_callback_status(job_id, "failed")
+        self.counters["callbacks_failed"] += 1
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        try:
+            self.store.purge()
+        except sqlite3.Error as e:
+            logger.error(f"Falha ao remover jobs expirados: {e}")
+
+    def stats(self):
+        return dict(
+            self.counters,
+            broker=self.broker.name,
+            workers=len(self._threads),
+            jobs=self.store.counts()
+        )
+
+
+def callback_allowed(url):
+    """True se a URL é http(s) e o host está em JOBS_CALLBACK_HOSTS (sem lista, nenhum está)"""
+    parsed = urlparse(str(url))
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return False
+    allowed = [host.strip().lower() for host in os.getenv("JOBS_CALLBACK_HOSTS", "").split(",") if host.strip()]
+    return parsed.hostname in allowed
+
+
+def public_address(address):
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if getattr(ip, "ipv4_mapped", None):
+        ip = ip.ipv4_mapped
+    return not (ip.is_loopback or ip.is_private or ip.is_link_local or ip.is_reserved
+                or ip.is_multicast or ip.is_unspecified)
+
+
+def public_host(hostname):
+    """True se o host resolve e todos os endereços são públicos"""
+    try:
+        infos = socket.getaddrinfo(hostname, None, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        return False
+    return bool(infos) and all(public_address(info[4][0]) for info in infos)
+
+
+def _timestamp(value):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(value)) if value else None
+
+
+def job_payload(job):
+    """Representação pública do job (GET /jobs/<id> e callback)"""
+    data = {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "created_at": _timestamp(job["created_at"]),
+        "started_at": _timestamp(job["started_at"]),
+        "finished_at": _timestamp(job["finished_at"]),
+        "expires_at": _timestamp(job["expires_at"])
+    }
+    if job["result"] is not None:
+        result = json.loads(job["result"])
+        data["result_status"] = job["result_status"]
+        if job["status"] == "done":
+            data["result"] = result
+        else:
+            data["error"] = result.get("error", "Erro desconhecido")
+    if job["callback_url"]:
+        data["callback_status"] = job["callback_status"] or "pending"
+    return data
+
+
+_runner = None
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def configure(run_one, validate, platforms):
+    """Registra a geração da aplicação usada pelos workers"""
+    global _runner
+    _runner = (run_one, validate, platforms)
+
+
+def get_queue():
+    """Fila do processo; os workers sobem no primeiro uso (JOB_WORKERS)"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                if _runner is None:
+                    raise RuntimeError("jobs.configure() não foi chamado pela aplicação")
+                store = JobStore(os.getenv("JOBS_DB_PATH", "jobs.db"))
+                if os.getenv("JOBS_BROKER", "memory") == "sqlite":
+                    broker = SQLiteBroker(store)
+                else:
+                    broker = MemoryBroker()
+                run_one, validate, platforms = _runner
+                job_queue = JobQueue(
+                    store, broker, run_one, validate, platforms,
+                    ttl=float(os.getenv("JOBS_RESULT_TTL", "3600")),
+                    max_pending=int(os.getenv("JOBS_QUEUE_MAX", "1000")),
+                    stale_after=float(os.getenv("JOBS_STALE_AFTER", "600"))
+                )
+                job_queue.start(int(os.getenv("JOB_WORKERS", "4")))
+                _queue = job_queue
+    return _queue
+
+
+def stats():
+    """Estado da fila para /stats (sem subir os workers)"""
+    return _queue.stats() if _queue is not None else {"workers": 0}
+
+
+blueprint = Blueprint("jobs", __name__)
+
+
+@blueprint.route('/jobs', methods=['POST'])
+def create_job():
+    """Enfileira uma geração (ou lote); responde 202 com o id do job"""
+    try:
+        tenant = tenants.current()
+        job_id, error = get_queue().submit(request.get_json(silent=True), history.session_id(),
+                                           tenant.id if tenant else None)
+    except limits.Overloaded as e:
+        response = jsonify(limits.overloaded_body(e))
+        response.status_code = 503
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response
+    if error:
+        return jsonify({"error": error}), 400
+
+    status_url = url_for("jobs.get_job", job_id=job_id)
+    response = jsonify({"id": job_id, "status": "queued", "status_url": status_url})
+    response.status_code = 202
+    response.headers["Location"] = status_url
+    return response
+
+
+@blueprint.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_queue().store.get(job_id)
+    if job is None or not visible(job):
+        return jsonify({"error": "Job não encontrado ou expirado"}), 404
+    return jsonify(job_payload(job))
+
+
+def visible(job):
+    """Com tenants, só a chave dona do job (ou a de administração) o enxerga"""
+    if not tenants.enabled():
+        return True
+    key = limits.api_key(request.headers)
+    if tenants.is_admin(key):
+        return True
+    tenant = tenants.get_registry().lookup(key) if key else None
+    return tenant is not None and tenant.id == job["tenant_id"]
@@ -0,0 +1,330 @@
+"""Controle de carga: limite por cliente na entrada e concorrência adaptativa
+na saída para a OpenRouter.
+
+Entrada: um token bucket por tenant autenticado (TENANTS=1, chave em
+``X-API-Key`` ou ``Authorization: Bearer``) ou, sem ele, pelo IP do cliente
+nas rotas POST /generate* e POST /jobs. Acima do limite a resposta é 429 com ``Retry-After``.
+
+Saída: o número de chamadas simultâneas ao provedor segue um controle AIMD.
+O limite sobe ~1 por ciclo de respostas bem-sucedidas enquanto está saturado e cai
+multiplicativamente quando o provedor responde 429/503, dá timeout ou a
+latência passa de ``tolerance`` vezes a média recente. Outros erros (400,
+401, 500...) não mexem no limite nem na média: não mostram folga do provedor. O excedente espera numa
+fila limitada (tamanho e tempo); quem não consegue vaga recebe
+``Overloaded``, convertido em 503 pelas aplicações.
+
+Configuração:
+    RATE_LIMIT_PER_MINUTE=60        requisições por minuto por cliente (0 desliga)
+    RATE_LIMIT_BURST=20             rajada permitida acima da taxa média
+    UPSTREAM_CONCURRENCY_INITIAL=10 limite inicial de chamadas simultâneas
+    UPSTREAM_CONCURRENCY_MIN=1
+    UPSTREAM_CONCURRENCY_MAX=20     (padrão: UPSTREAM_POOL_MAXSIZE)
+    UPSTREAM_QUEUE_MAX=100          requisições esperando vaga
+    UPSTREAM_QUEUE_TIMEOUT=10       espera máxima por vaga, em segundos
+    UPSTREAM_LATENCY_TOLERANCE=2.0  latência / média que dispara o recuo
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Blueprint, g, jsonify, request
+
+# Respostas do provedor que indicam sobrecarga
+OVERLOAD_STATUS = (429, 503)
+
+
+class Overloaded(Exception):
+    """Sem vaga para chamar o provedor dentro do tempo de espera"""
+
+    def __init__(self, retry_after=1):
+        super().__init__("Limite de concorrência com a OpenRouter atingido")
+        self.retry_after = retry_after
+
+
+# Entrada ---------------------------------------------------------------------
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Consome um token; retorna 0 ou os segundos até haver um disponível"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token bucket por cliente (os clientes menos recentes são descartados)"""
+
+    def __init__(self, per_minute=60, burst=20, max_clients=10000):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"allowed": 0, "limited": 0}
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def allow(self, key):
+        """Retorna (permitido, segundos_para_tentar_de_novo)"""
+        if not self.enabled:
+            return True, 0
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.take()
+            self.counters["limited" if wait else "allowed"] += 1
+        return not wait, wait
+
+    def stats(self):
+        return dict(
+            self.counters,
+            enabled=self.enabled,
+            per_minute=round(self.rate * 60, 2),
+            burst=self.burst,
+            clients=len(self._buckets)
+        )
+
+
+def api_key(headers):
+    """Chave de API enviada em ``X-API-Key`` ou ``Authorization: Bearer`` (ou None)"""
+    key = headers.get("X-API-Key")
+    if not key:
+        auth = headers.get("Authorization", "")
+        if auth.startswith("Bearer "):
+            key = auth[7:].strip()
+    return key or None
+
+
+def client_key(remote_addr, tenant=None):
+    """Identifica o cliente pelo tenant autenticado ou, sem ele, pelo IP
+
+    A chave enviada só conta depois de conferida (tenants.py): chaves
+    inventadas a cada requisição não podem abrir buckets novos nem tirar os
+    clientes reais do LRU.
+    """
+    return f"tenant:{tenant.id}" if tenant is not None else f"ip:{remote_addr}"
+
+
+# Saída -----------------------------------------------------------------------
+
+class AdaptiveLimit:
+    """Estado e regra AIMD do limite de concorrência (sem a espera)"""
+
+    def __init__(self, initial=10, minimum=1, maximum=20, max_queue=100, max_wait=10.0,
+                 tolerance=2.0, backoff=0.7, cooldown=1.0, smoothing=0.05, warmup=10):
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.waiting = 0
+        self.warmup = warmup  # amostras antes de usar a latência como sinal
+        self.latency = None  # média móvel exponencial, em segundos
+        self.samples = 0
+        self._last_decrease = 0.0
+        self.counters = {"acquired": 0, "queued": 0, "rejected": 0, "increases": 0, "decreases": 0}
+
+    def _has_slot(self):
+        return self.in_flight < int(self.limit)
+
+    def _adjust(self, latency, overloaded):
+        """Aplica o resultado de uma chamada ao limite (com a trava já obtida)"""
+        slow = self.samples >= self.warmup and latency > self.latency * self.tolerance
+        if overloaded or slow:
+            now = time.monotonic()
+            # Um recuo por janela (a latência média, até ``cooldown``): várias
+            # falhas da mesma rajada não zeram o limite
+            if now - self._last_decrease >= min(self.cooldown, self.latency or 0):
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self._last_decrease = now
+                self.counters["decreases"] += 1
+        elif (self.in_flight >= int(self.limit) or self.waiting) and self.limit < self.maximum:
+            # Só cresce quando o limite atual estava de fato em uso
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.counters["increases"] += 1
+
+        if not overloaded:
+            self.samples += 1
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += (latency - self.latency) * self.smoothing
+
+    def _reject(self):
+        self.counters["rejected"] += 1
+        return Overloaded(retry_after=max(1, math.ceil(self.latency or 1)))
+
+    def stats(self):
+        return dict(
+            self.counters,
+            limit=int(self.limit),
+            min=self.minimum,
+            max=self.maximum,
+            in_flight=self.in_flight,
+            waiting=self.waiting,
+            avg_latency_ms=round(self.latency * 1000, 1) if self.latency is not None else None
+        )
+
+
+class AdaptiveLimiter(AdaptiveLimit):
+    """Versão para threads (requests)"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            if not self._has_slot():
+                if self.waiting >= self.max_queue:
+                    raise self._reject()
+                self.counters["queued"] += 1
+                self.waiting += 1
+                deadline = time.monotonic() + self.max_wait
+                try:
+                    while not self._has_slot():
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._reject()
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.in_flight += 1
+            self.counters["acquired"] += 1
+
+    def release(self, latency, overloaded=False, counted=True):
+        with self._cond:
+            if counted:
+                self._adjust(latency, overloaded)
+            self.in_flight -= 1
+            free = int(self.limit) - self.in_flight
+            if free > 0:
+                self._cond.notify(free)
+
+
+class AsyncAdaptiveLimiter(AdaptiveLimit):
+    """Versão para asyncio (httpx); usar sempre no mesmo event loop"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._cond = None
+
+    async def acquire(self):
+        import asyncio  # só o modo ASGI usa; fora da partida das apps Flask
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        async with self._cond:
+            if not self._has_slot():
+                if self.waiting >= self.max_queue:
+                    raise self._reject()
+                self.counters["queued"] += 1
+                self.waiting += 1
+                try:
+                    await asyncio.wait_for(self._cond.wait_for(self._has_slot), self.max_wait)
+                except asyncio.TimeoutError:
+                    raise self._reject()
+                finally:
+                    self.waiting -= 1
+            self.in_flight += 1
+            self.counters["acquired"] += 1
+
+    async def release(self, latency, overloaded=False, counted=True):
+        async with self._cond:
+            if counted:
+                self._adjust(latency, overloaded)
+            self.in_flight -= 1
+            free = int(self.limit) - self.in_flight
+            if free > 0:
+                self._cond.notify(free)
+
+
+def upstream_limit_settings(maximum, initial, max_queue, prefix="UPSTREAM"):
+    """Parâmetros do limitador de saída a partir das variáveis de ambiente"""
+    return {
+        "initial": int(os.getenv(f"{prefix}_CONCURRENCY_INITIAL", str(initial))),
+        "minimum": int(os.getenv(f"{prefix}_CONCURRENCY_MIN", "1")),
+        "maximum": int(os.getenv(f"{prefix}_CONCURRENCY_MAX", str(maximum))),
+        "max_queue": int(os.getenv(f"{prefix}_QUEUE_MAX", str(max_queue))),
+        "max_wait": float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", "10")),
+        "tolerance": float(os.getenv(f"{prefix}_LATENCY_TOLERANCE", "2.0"))
+    }
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter(
+                    per_minute=float(os.getenv("RATE_LIMIT_PER_MINUTE", "60")),
+                    burst=int(os.getenv("RATE_LIMIT_BURST", "20"))
+                )
+    return _rate_limiter
+
+
+def stats(upstream_limiter):
+    """Estado dos limitadores para /health"""
+    return {
+        "rate_limit": get_rate_limiter().stats(),
+        "upstream_concurrency": upstream_limiter.stats()
+    }
+
+
+def is_generation_request(method, path):
+    return method == "POST" and (path.startswith("/generate") or path == "/jobs")
+
+
+def rate_limited_body(retry_after):
+    return {"error": "Muitas requisições. Tente novamente em instantes.",
+            "retry_after": math.ceil(retry_after)}
+
+
+def overloaded_body(error):
+    return {"error": "Serviço sobrecarregado no momento. Tente novamente em instantes.",
+            "retry_after": error.retry_after}
+
+
+blueprint = Blueprint("limits", __name__)
+
+
+@blueprint.before_app_request
+def limit_generation_requests():
+    """Aplica o token bucket do cliente às rotas de geração"""
+    if not is_generation_request(request.method, request.path):
+        return None
+    # tenants.authenticate_tenant roda antes (blueprint registrado antes deste)
+    allowed, retry_after = get_rate_limiter().allow(client_key(request.remote_addr, g.get("tenant")))
+    if allowed:
+        return None
+    response = jsonify(rate_limited_body(retry_after))
+    response.status_code = 429
+    response.headers["Retry-After"] = str(math.ceil(retry_after))
+    return response
@@ -0,0 +1,301 @@
+"""Métricas no formato texto do Prometheus, sem dependências externas.
+
+Expostas em GET /metrics pelas aplicações. Principais séries:
+
+    generation_stage_seconds{stage}          latência por etapa do pipeline
+        validation, prompt_build, upstream_connect, upstream_ttfb,
+        upstream_total, serialization
+    generation_requests_total{platform,tone,model,status}
+    generation_tokens_total{model,kind}      tokens de result["usage"]
+        prompt, completion, total, cached (lidos do cache de prefixo)
+    upstream_requests_total{model,status}
+    http_requests_total{endpoint,method,status}
+    http_request_duration_seconds{endpoint}
+    http_requests_in_flight{endpoint}
+    upstream_requests_in_flight / _waiting / upstream_concurrency_limit{client}
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Blueprint, Response, g, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, key, child):
+        yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(child.value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set_function(self, function, **labels):
+        """Valor lido de ``function()`` no momento da coleta"""
+        self._functions[tuple(sorted(labels.items()))] = (labels, function)
+
+    def render(self):
+        for labels, function in list(self._functions.values()):
+            self.labels(**labels).set(function())
+        return super().render()
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _render_child(self, key, child):
+        with child._lock:
+            counts = list(child.counts)
+            total, count = child.sum, child.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            le = f'le="{_format_number(bound)}"'
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+        labels = _format_labels(self.labelnames, key)
+        yield f"{self.name}_sum{labels} {_format_number(total)}"
+        yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "generation_stage_seconds", "Latência de cada etapa do pipeline de geração", ("stage",)))
+GENERATIONS = REGISTRY.register(Counter(
+    "generation_requests_total", "Gerações por plataforma, tom, modelo e status HTTP",
+    ("platform", "tone", "model", "status")))
+TOKENS = REGISTRY.register(Counter(
+    "generation_tokens_total", "Tokens informados pela OpenRouter (usage)", ("model", "kind")))
+UPSTREAM_REQUESTS = REGISTRY.register(Counter(
+    "upstream_requests_total", "Chamadas HTTP à OpenRouter por modelo e status", ("model", "status")))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "Requisições HTTP atendidas", ("endpoint", "method", "status")))
+HTTP_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Duração das requisições HTTP (inclui o corpo em stream)", ("endpoint",)))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Requisições HTTP em andamento", ("endpoint",)))
+UPSTREAM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "upstream_requests_in_flight", "Chamadas à OpenRouter em andamento", ("client",)))
+UPSTREAM_WAITING = REGISTRY.register(Gauge(
+    "upstream_requests_waiting", "Chamadas esperando vaga no limitador", ("client",)))
+UPSTREAM_LIMIT = REGISTRY.register(Gauge(
+    "upstream_concurrency_limit", "Limite adaptativo de chamadas simultâneas", ("client",)))
+RESPONSE_BYTES = REGISTRY.register(Counter(
+    "http_response_compressed_bytes_total", "Corpos comprimidos com gzip: bytes antes e depois", ("stage",)))
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+
+@contextmanager
+def stage(name):
+    """Mede o bloco como uma etapa de generation_stage_seconds"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+# Cache de prefixo do provedor, para /stats (ver prompts.py)
+_prompt_cache = {"calls": 0, "calls_with_cached_tokens": 0, "prompt_tokens": 0, "cached_tokens": 0}
+_prompt_cache_lock = threading.Lock()
+
+
+def cached_tokens(usage):
+    """Tokens de entrada lidos do cache do provedor (prompt_tokens_details.cached_tokens)"""
+    details = usage.get("prompt_tokens_details") if usage else None
+    return (details or {}).get("cached_tokens") or 0
+
+
+def record_usage(model, usage):
+    """Soma os tokens de ``result["usage"]``"""
+    for kind in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        value = usage.get(kind) if usage else None
+        if value:
+            TOKENS.labels(model=model, kind=kind[:-len("_tokens")]).inc(value)
+    if not usage:
+        return
+    cached = cached_tokens(usage)
+    if cached:
+        TOKENS.labels(model=model, kind="cached").inc(cached)
+    with _prompt_cache_lock:
+        _prompt_cache["calls"] += 1
+        _prompt_cache["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        if cached:
+            _prompt_cache["calls_with_cached_tokens"] += 1
+            _prompt_cache["cached_tokens"] += cached
+
+
+def prompt_cache_stats():
+    with _prompt_cache_lock:
+        data = dict(_prompt_cache)
+    data["hit_rate"] = round(data["calls_with_cached_tokens"] / data["calls"], 4) if data["calls"] else 0.0
+    data["cached_ratio"] = round(data["cached_tokens"] / data["prompt_tokens"], 4) if data["prompt_tokens"] else 0.0
+    return data
+
+
+def bounded(value, allowed, default="other"):
+    """Valor do rótulo restrito a um conjunto conhecido (evita cardinalidade livre)"""
+    return value if value in allowed else default
+
+
+def register_limiter(limiter, client):
+    """Expõe um limitador de concorrência com a OpenRouter ("sync" ou "async")"""
+    UPSTREAM_IN_FLIGHT.set_function(lambda: limiter.in_flight, client=client)
+    UPSTREAM_WAITING.set_function(lambda: limiter.waiting, client=client)
+    UPSTREAM_LIMIT.set_function(lambda: int(limiter.limit), client=client)
+
+
+def render():
+    return REGISTRY.render()
+
+
+blueprint = Blueprint("metrics", __name__)
+
+
+@blueprint.before_app_request
+def start_request_timer():
+    g.metrics_started = time.perf_counter()
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    HTTP_IN_FLIGHT.labels(endpoint=g.metrics_endpoint).inc()
+
+
+@blueprint.after_app_request
+def count_request(response):
+    endpoint = g.get("metrics_endpoint", "unmatched")
+    HTTP_REQUESTS.labels(endpoint=endpoint, method=request.method, status=response.status_code).inc()
+    return response
+
+
+@blueprint.teardown_app_request
+def stop_request_timer(error=None):
+    # Em respostas com stream_with_context, roda só depois do último byte
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return
+    endpoint = g.pop("metrics_endpoint", "unmatched")
+    HTTP_IN_FLIGHT.labels(endpoint=endpoint).dec()
+    HTTP_DURATION.labels(endpoint=endpoint).observe(time.perf_counter() - started)
+
+
+@blueprint.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,217 @@
+"""Ajustes locais do texto gerado, antes de devolvê-lo ao cliente.
+
+As regras das plataformas aparecem nos prompts só como texto ("Limite: 2200
+caracteres", "2-3 tweets"); quando o modelo não as cumpre, o texto é
+corrigido aqui, de forma determinística e em microssegundos, em vez de
+custar outra chamada à OpenRouter:
+
+- hashtags: normalizadas, sem repetição (ignorando maiúsculas) e reunidas
+  num bloco final, com as ``keywords`` do usuário incluídas; o excedente
+  além da faixa da plataforma sai (as do usuário ficam sempre);
+- limite de caracteres da plataforma (budget.PLATFORM_MAX_CHARS): o texto
+  é cortado no fim de uma frase, preservando o bloco de hashtags;
+- Twitter/X: a thread é dividida em tweets de até 280 caracteres,
+  numerados ("1/3"), respeitando os tweets marcados pelo modelo.
+
+Configuração:
+    POSTPROCESS=1   0 devolve o texto do modelo sem ajustes
+"""
+import os
+import re
+
+import budget
+
+TWEET_CHARS = 280
+THREAD_PLATFORM = "Twitter/X"
+
+# Faixa de hashtags por plataforma, para quem não tem uma configurada
+HASHTAG_RANGES = {
+    "LinkedIn": (3, 5),
+    "Instagram": (5, 10),
+    "Facebook": (1, 3),
+    "Twitter/X": (2, 3)
+}
+DEFAULT_HASHTAG_RANGE = (3, 5)
+
+HASHTAG = re.compile(r"#\w+")
+HASHTAG_LINE = re.compile(r"^[\s,.;·|]*(?:#\w+[\s,.;·|]*)+$")
+TRAILING_HASHTAGS = re.compile(r"(?:\s+#\w+)+\s*$")
+SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*(?=\s|$)")
+TWEET_MARKER = re.compile(r"^\s*(?:\*\*)?(?:tweet\s*\d+(?:\s*/\s*\d+)?|\d+\s*/\s*\d*)\s*[:.\-–—)]?(?:\*\*)?[:.\-–—]?\s*",
+                          re.I | re.M)
+KEYWORD_SEPARATOR = re.compile(r"[,;\n]+")
+BLANK_LINES = re.compile(r"\n\s*\n")
+
+
+def enabled():
+    return os.getenv("POSTPROCESS", "1") != "0"
+
+
+def keyword_hashtags(keywords):
+    """Hashtags das palavras-chave: "#IA, marketing digital" -> ["#IA", "#MarketingDigital"]"""
+    tags = []
+    for piece in KEYWORD_SEPARATOR.split(str(keywords or "")):
+        piece = piece.strip()
+        if not piece:
+            continue
+        if "#" in piece:
+            tags.extend(HASHTAG.findall(piece))
+            continue
+        words = re.findall(r"\w+", piece)
+        if len(words) == 1:
+            tags.append("#" + words[0])
+        elif words:
+            tags.append("#" + "".join(word[:1].upper() + word[1:] for word in words))
+    return tags
+
+
+def dedupe(tags):
+    """Sem repetição, ignorando maiúsculas; fica a primeira grafia"""
+    seen = set()
+    unique = []
+    for tag in tags:
+        key = tag.casefold()
+        if key not in seen:
+            seen.add(key)
+            unique.append(tag)
+    return unique
+
+
+def split_hashtag_block(text):
+    """(corpo, hashtags do fim do texto: linhas só de hashtags e as que fecham a última linha)"""
+    lines = text.rstrip().split("\n")
+    tags = []
+    while lines and (HASHTAG_LINE.match(lines[-1]) or not lines[-1].strip()):
+        tags = HASHTAG.findall(lines.pop()) + tags
+    if lines:
+        match = TRAILING_HASHTAGS.search(lines[-1])
+        if match and match.start() > 0:
+            tags = HASHTAG.findall(match.group(0)) + tags
+            lines[-1] = lines[-1][:match.start()]
+    return "\n".join(lines).rstrip(), tags
+
+
+def trim_to(text, limit):
+    """Corta ``text`` em até ``limit`` caracteres, no fim de uma frase se possível"""
+    if len(text) <= limit:
+        return text
+    head = text[:limit]
+    ends = [match.end() for match in SENTENCE_END.finditer(head)]
+    # Só vale cortar na frase se sobrar ao menos metade do espaço
+    if ends and ends[-1] >= limit // 2:
+        return head[:ends[-1]].rstrip()
+    cut = head[:limit - 1].rsplit(None, 1)[0] if " " in head else head[:limit - 1]
+    return cut.rstrip(" ,;:-–—") + "…"
+
+
+def sentences(text):
+    """Frases de um trecho, com a pontuação final"""
+    parts = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        parts.append(text[start:match.end()].strip())
+        start = match.end()
+    parts.append(text[start:].strip())
+    return [part for part in parts if part]
+
+
+def split_thread(body, tags, limit=TWEET_CHARS):
+    """Tweets de até ``limit`` caracteres, numerados quando há mais de um"""
+    markers = list(TWEET_MARKER.finditer(body))
+    if len(markers) >= 2:
+        # O modelo já marcou os tweets ("Tweet 1:", "1/3"...): cada um fica separado
+        bounds = [match.start() for match in markers] + [len(body)]
+        segments = [body[:bounds[0]].strip()] + [
+            body[match.end():bounds[i + 1]].strip() for i, match in enumerate(markers)]
+        segments = [segment for segment in segments if segment]
+        keep_apart = True
+    else:
+        segments = [part.strip() for part in BLANK_LINES.split(body) if part.strip()]
+        keep_apart = False
+    # Espaço para a numeração " 10/10"
+    room = limit - 6
+    if tags:
+        block = " ".join(tags)
+        if segments and len(segments[-1]) + 2 + len(block) <= room:
+            segments[-1] += "\n\n" + block
+        else:
+            segments.append(block)
+
+    # (trecho, começa_um_tweet_novo)
+    pieces = []
+    for segment in segments:
+        if len(segment) <= room:
+            pieces.append((segment, keep_apart))
+            continue
+        first = keep_apart
+        for sentence in sentences(segment):
+            while len(sentence) > room:
+                cut = trim_to(sentence, room)
+                pieces.append((cut, first))
+                first = False
+                sentence = sentence[len(cut.rstrip("…")):].strip()
+            if sentence:
+                pieces.append((sentence, first))
+                first = False
+
+    tweets = []
+    for piece, apart in pieces:
+        separator = "\n\n" if "\n" in piece or piece.startswith("#") else " "
+        if tweets and not apart and len(tweets[-1]) + len(separator) + len(piece) <= room:
+            tweets[-1] += separator + piece
+        else:
+            tweets.append(piece)
+    if len(tweets) > 1:
+        tweets = [f"{tweet} {i}/{len(tweets)}" for i, tweet in enumerate(tweets, 1)]
+    return tweets
+
+
+def process(text, platform, keywords="", hashtag_range=None):
+    """Texto ajustado às regras da plataforma e o que foi feito.
+
+    Retorna ``{"article", "hashtags", "tweets" (só Twitter/X), "fixes",
+    "original_characters"}``.
+    """
+    fixes = []
+    body, trailing = split_hashtag_block(text)
+    inline = HASHTAG.findall(body)
+    requested = keyword_hashtags(keywords)
+
+    tags = dedupe(requested + trailing)
+    if len(tags) < len(requested) + len(trailing):
+        fixes.append("hashtags_deduplicated")
+    if any(tag.casefold() not in {t.casefold() for t in inline + trailing} for tag in requested):
+        fixes.append("keywords_merged")
+
+    # Excedente da faixa sai, sem tocar nas do usuário nem nas que estão no texto
+    low, high = hashtag_range or HASHTAG_RANGES.get(platform, DEFAULT_HASHTAG_RANGE)
+    inline_keys = {tag.casefold() for tag in inline}
+    block = [tag for tag in tags if tag.casefold() not in inline_keys]
+    allowed = max(high - len(dedupe(inline)), len(requested))
+    if len(block) > allowed:
+        block = block[:allowed]
+        fixes.append("hashtags_limited")
+
+    result = {"hashtags": dedupe(inline + block), "original_characters": len(text)}
+
+    if platform == THREAD_PLATFORM:
+        # Twitter não renderiza **negrito**
+        if "**" in body:
+            body = body.replace("**", "")
+            fixes.append("markdown_removed")
+        tweets = split_thread(body, block)
+        if len(tweets) > 1:
+            fixes.append("thread_split")
+        result["tweets"] = tweets
+        article = "\n\n".join(tweets)
+    else:
+        suffix = "\n\n" + " ".join(block) if block else ""
+        limit = budget.PLATFORM_MAX_CHARS.get(platform)
+        if limit and len(body) + len(suffix) > limit:
+            body = trim_to(body, limit - len(suffix))
+            fixes.append("trimmed")
+        article = body + suffix
+
+    result["article"] = article
+    result["fixes"] = fixes
+    return result
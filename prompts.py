@@ -0,0 +1,160 @@
+"""Templates de prompt pré-compilados.
+
+Cada combinação plataforma × tom × extensão é montada uma única vez, na
+partida (create_app), já normalizada (sem a indentação herdada das f-strings e sem
+linhas em branco repetidas). Por requisição resta apenas encaixar os campos
+variáveis (tema, palavras-chave...) entre trechos estáticos prontos.
+
+Os campos variáveis são marcados no layout como ``{nome}``; no layout das
+aplicações isso aparece como ``{{nome}}`` dentro da f-string.
+
+Com PROMPT_LAYOUT=prefix, todo o texto estático (mensagem de sistema, regras
+da plataforma, tom, extensão) vai numa mensagem de sistema idêntica, byte a
+byte, entre requisições da mesma combinação, e só tema e palavras-chave vão
+na mensagem do usuário, por último. Provedores com cache de prefixo
+(OpenAI, DeepSeek, Anthropic e Gemini via OpenRouter) reaproveitam esse
+prefixo: menos latência até o primeiro token e tokens de entrada mais
+baratos. Para os modelos que pedem a marcação explícita (CACHE_CONTROL_MODELS),
+o prefixo sai com ``cache_control``.
+
+Configuração:
+    PROMPT_LAYOUT=classic   prefix: conteúdo estático primeiro (cache de prefixo)
+    PROMPT_PRECOMPILE=1     0 deixa cada combinação para o primeiro uso
+"""
+import os
+import re
+
+import budget
+
+SLOT_PATTERN = re.compile(r"\{(\w+)\}")
+
+LAYOUTS = ("classic", "prefix")
+# Modelos em que o cache de prefixo só vale com cache_control na mensagem
+CACHE_CONTROL_MODELS = ("anthropic/", "google/gemini")
+
+
+def layout_mode():
+    mode = os.getenv("PROMPT_LAYOUT", "classic")
+    return mode if mode in LAYOUTS else "classic"
+
+
+def precompile():
+    """Compilar todas as combinações em create_app (o padrão)"""
+    return os.getenv("PROMPT_PRECOMPILE", "1") != "0"
+
+
+def wants_cache_control(model):
+    return model.startswith(CACHE_CONTROL_MODELS)
+
+
+def normalize(text):
+    """Remove a indentação das linhas e colapsa linhas em branco repetidas"""
+    lines = []
+    for line in text.strip().splitlines():
+        line = line.strip()
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def estimate_tokens(text):
+    """Tokens do texto (ver budget.count_tokens)"""
+    return budget.count_tokens(text)
+
+
+class _LiteralSlots(dict):
+    """Campos sem valor voltam ao texto como "{nome}" literal"""
+
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+class PromptTemplate:
+    """Prompt normalizado, pronto para receber os campos variáveis"""
+
+    def __init__(self, text):
+        self.text = normalize(text)
+        parts = SLOT_PATTERN.split(self.text)
+        static = parts[0::2]
+        self.slots = tuple(parts[1::2])
+        self.token_count = estimate_tokens("".join(static))
+
+        # Compila para formatação com %: um único passo em C por requisição
+        pieces = [static[0].replace("%", "%%")]
+        for slot, text_after in zip(self.slots, static[1:]):
+            pieces.append(f"%({slot})s")
+            pieces.append(text_after.replace("%", "%%"))
+        self._format = "".join(pieces)
+        self._messages = {}
+
+    def system_message(self, cache_control=False):
+        """Mensagem de sistema com o texto do template (sem campos), criada uma vez"""
+        message = self._messages.get(cache_control)
+        if message is None:
+            content = self.text
+            if cache_control:
+                content = [{"type": "text", "text": self.text, "cache_control": {"type": "ephemeral"}}]
+            message = self._messages[cache_control] = {"role": "system", "content": content}
+        return message
+
+    def render(self, **values):
+        try:
+            return self._format % values
+        except KeyError:
+            # Um "{x}" vindo de texto livre (ex.: tom desconhecido) fica literal
+            return self._format % _LiteralSlots(values)
+
+
+class PromptCatalog:
+    """Templates compilados por (plataforma, tom, extensão).
+
+    ``layout(platform, tone, length)`` devolve o texto do prompt com os
+    campos variáveis marcados. As aplicações chamam ``compile_all`` em
+    create_app, e nenhuma requisição paga a compilação; com
+    PROMPT_PRECOMPILE=0 (partida a frio mais curta) cada combinação conhecida
+    é compilada no primeiro uso e mantida. ``eager`` compila todas já na
+    criação do catálogo. Combinações fora do catálogo (tom ou extensão
+    livres enviados pelo cliente) são compiladas na hora, sem cache, para
+    não crescer com entradas arbitrárias.
+    """
+
+    def __init__(self, layout, platforms, tones, lengths, eager=False):
+        self._layout = layout
+        self._combinations = [(platform, tone, length)
+                              for platform in platforms
+                              for tone in tones
+                              for length in lengths]
+        self._known = frozenset(self._combinations)
+        self._templates = {}
+        if eager:
+            self.compile_all()
+
+    def get(self, platform, tone, length):
+        key = (platform, tone, length)
+        template = self._templates.get(key)
+        if template is None:
+            template = PromptTemplate(self._layout(platform, tone, length))
+            if key in self._known:
+                self._templates[key] = template
+        return template
+
+    def compile_all(self):
+        """Compila as combinações que ainda não foram usadas; retorna o total"""
+        for key in self._combinations:
+            if key not in self._templates:
+                self._templates[key] = PromptTemplate(self._layout(*key))
+        return len(self._templates)
+
+    def token_counts(self):
+        """Tokens estáticos de cada template, por "plataforma|tom|extensão" """
+        self.compile_all()
+        return {"|".join(key): self._templates[key].token_count for key in self._combinations}
+
+    def stats(self):
+        counts = [template.token_count for template in list(self._templates.values())]
+        return {
+            "compiled": len(counts),
+            "combinations": len(self._combinations),
+            "min_tokens": min(counts) if counts else 0,
+            "max_tokens": max(counts) if counts else 0
+        }
@@ -0,0 +1,443 @@
+"""Chamadas resilientes à OpenRouter: retentativas, hedging e failover de modelo.
+
+Envolve o cliente de upstream.py com três mecanismos:
+
+- Retentativas limitadas com backoff exponencial e jitter (respeitando
+  ``Retry-After``) em 429, 5xx e erros de conexão.
+- Hedging opcional: se a chamada passar do p95 recente de latência, uma
+  segunda requisição idêntica é disparada e vale a primeira que responder
+  bem. A outra é descartada.
+- Failover por uma lista ordenada de modelos (o modelo do payload e depois
+  OPENROUTER_FALLBACK_MODELS), cada um com seu circuit breaker. Um timeout
+  de leitura passa direto para o próximo modelo em vez de repetir a espera.
+
+Configuração:
+    OPENROUTER_FALLBACK_MODELS=     modelos reserva, separados por vírgula
+    UPSTREAM_MAX_RETRIES=2          retentativas por modelo
+    UPSTREAM_BACKOFF_BASE=0.5       segundos (dobra a cada tentativa)
+    UPSTREAM_BACKOFF_MAX=8          teto do backoff, em segundos
+    UPSTREAM_HEDGE=0                liga o hedging (só gerações sem stream)
+    UPSTREAM_HEDGE_MIN_DELAY=1.0    espera mínima antes da segunda requisição
+    UPSTREAM_BREAKER_THRESHOLD=5    falhas seguidas que abrem o circuito
+    UPSTREAM_BREAKER_RESET=30       segundos com o circuito aberto
+"""
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+import limits
+import upstream
+
+RETRY_STATUS = (429,)
+
+
+class CircuitOpen(limits.Overloaded):
+    """Todos os modelos estão com o circuito aberto"""
+
+
+def is_failure(response):
+    return response.status_code in RETRY_STATUS or response.status_code >= 500
+
+
+def is_client_error(response):
+    """4xx que não é sobrecarga (400, 401...): o pedido é que está errado, não o provedor"""
+    return 400 <= response.status_code < 500 and not is_failure(response)
+
+
+def retry_after(response):
+    """Segundos pedidos em ``Retry-After`` (ou None)"""
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+class CircuitBreaker:
+    """Fechado -> aberto após N falhas seguidas -> meio-aberto (uma tentativa)"""
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_at = None  # tentativa do estado meio-aberto em andamento
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            now = time.monotonic()
+            # Uma tentativa que nunca voltou (ex.: barrada no limitador) expira
+            if state == "half_open" and (self._trial_at is None or now - self._trial_at >= self.reset_timeout):
+                self._trial_at = now
+                return True
+            return False
+
+    def retry_in(self):
+        if self.opened_at is None:
+            return 0
+        return max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_at = None
+
+    def record_ignored(self):
+        """Resposta que não diz nada da saúde do modelo: só libera a tentativa meio-aberta"""
+        with self._lock:
+            self._trial_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial_at = None
+
+
+class LatencyWindow:
+    """Latências recentes das chamadas bem-sucedidas (para o p95 do hedge)"""
+
+    def __init__(self, size=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+
+    def percentile(self, pct):
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class _Policy:
+    """Configuração, breakers e contadores comuns às versões síncrona e assíncrona"""
+
+    def __init__(self, client, fallback_models=None, max_retries=None, backoff_base=None,
+                 backoff_max=None, hedge=None, hedge_min_delay=None,
+                 breaker_threshold=None, breaker_reset=None):
+        self.client = client
+        if fallback_models is None:
+            fallback_models = os.getenv("OPENROUTER_FALLBACK_MODELS", "")
+        if isinstance(fallback_models, str):
+            fallback_models = [m.strip() for m in fallback_models.split(",") if m.strip()]
+        self.fallback_models = list(fallback_models)
+        self.max_retries = int(max_retries if max_retries is not None
+                               else os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+        self.backoff_base = float(backoff_base if backoff_base is not None
+                                  else os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+        self.backoff_max = float(backoff_max if backoff_max is not None
+                                 else os.getenv("UPSTREAM_BACKOFF_MAX", "8"))
+        if hedge is None:
+            hedge = os.getenv("UPSTREAM_HEDGE", "0") not in ("0", "false", "False", "")
+        self.hedge = hedge
+        self.hedge_min_delay = float(hedge_min_delay if hedge_min_delay is not None
+                                     else os.getenv("UPSTREAM_HEDGE_MIN_DELAY", "1.0"))
+        self.breaker_threshold = int(breaker_threshold if breaker_threshold is not None
+                                     else os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+        self.breaker_reset = float(breaker_reset if breaker_reset is not None
+                                   else os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+        self.latencies = LatencyWindow()
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "attempts": 0, "retries": 0, "failovers": 0,
+                         "hedges": 0, "hedge_wins": 0, "circuit_rejections": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def models_for(self, primary):
+        return [primary] + [m for m in self.fallback_models if m != primary]
+
+    def breaker(self, model):
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = self._breakers[model] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+            return breaker
+
+    def backoff(self, attempt, response=None):
+        """Backoff exponencial com jitter total, nunca abaixo do Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        requested = retry_after(response)
+        if requested is not None:
+            delay = max(delay, min(requested, self.backoff_max))
+        return delay
+
+    def hedge_delay(self, stream):
+        if not self.hedge or stream:
+            return None
+        p95 = self.latencies.percentile(95)
+        if p95 is None:
+            return None
+        return max(p95, self.hedge_min_delay)
+
+    def unavailable(self, models):
+        self._count("circuit_rejections")
+        retry_in = min(self.breaker(model).retry_in() for model in models)
+        return CircuitOpen(retry_after=max(1, math.ceil(retry_in)))
+
+    def stats(self):
+        with self._lock:
+            breakers = {model: {"state": b.state, "failures": b.failures}
+                        for model, b in self._breakers.items()}
+            counters = dict(self.counters)
+        p95 = self.latencies.percentile(95)
+        return dict(
+            counters,
+            fallback_models=self.fallback_models,
+            hedge=self.hedge,
+            p95_ms=round(p95 * 1000, 1) if p95 is not None else None,
+            breakers=breakers
+        )
+
+
+def _discard(future):
+    """Fecha a resposta da requisição perdedora de um hedge"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class ResilientUpstream(_Policy):
+    """Versão síncrona (requests), usada pelas aplicações Flask"""
+
+    # Timeout de leitura: melhor trocar de modelo do que esperar de novo
+    FAILOVER_ERRORS = (requests.exceptions.ReadTimeout,)
+    RETRY_ERRORS = (requests.exceptions.ConnectionError,)
+
+    def __init__(self, client, **kwargs):
+        super().__init__(client, **kwargs)
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="hedge")
+        return self._pool
+
+    def chat_completion(self, payload, headers=None, stream=False):
+        """Mesmo contrato de UpstreamClient.chat_completion"""
+        self._count("calls")
+        models = self.models_for(payload["model"])
+        last_response = None
+        last_error = None
+        tried = False
+
+        for model in models:
+            breaker = self.breaker(model)
+            if not breaker.allow():
+                continue
+            # Meio-aberto: uma única chamada de teste, sem retentativa nem hedge
+            trial = breaker.state != "closed"
+            if tried:
+                self._count("failovers")
+            tried = True
+            body = payload if model == payload["model"] else dict(payload, model=model)
+
+            for attempt in range(1 if trial else self.max_retries + 1):
+                if attempt:
+                    self._count("retries")
+                    time.sleep(self.backoff(attempt, last_response))
+                self._count("attempts")
+                started = time.perf_counter()
+                try:
+                    response = self._send(body, headers, stream, hedge=not trial)
+                except self.FAILOVER_ERRORS as e:
+                    breaker.record_failure()
+                    last_error, last_response = e, None
+                    break
+                except self.RETRY_ERRORS as e:
+                    breaker.record_failure()
+                    last_error, last_response = e, None
+                    continue
+
+                if is_failure(response):
+                    breaker.record_failure()
+                    response.content  # lê o corpo do erro antes de liberar a conexão
+                    response.close()
+                    last_error, last_response = None, response
+                    continue
+
+                if is_client_error(response):
+                    breaker.record_ignored()
+                    return response
+                breaker.record_success()
+                if not stream:
+                    self.latencies.add(time.perf_counter() - started)
+                return response
+
+        if last_response is not None:
+            return last_response
+        if last_error is not None:
+            raise last_error
+        raise self.unavailable(models)
+
+    def _send(self, body, headers, stream, hedge=True):
+        delay = self.hedge_delay(stream) if hedge else None
+        if delay is None:
+            return self.client.chat_completion(body, headers=headers, stream=stream)
+
+        pool = self._executor()
+        primary = pool.submit(self.client.chat_completion, body, headers=headers)
+        if wait([primary], timeout=delay).done:
+            return primary.result()
+
+        self._count("hedges")
+        backup = pool.submit(self.client.chat_completion, body, headers=headers)
+        pending = {primary, backup}
+        winner = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and not is_failure(future.result()):
+                    winner = future
+                    break
+        if winner is None:
+            winner = backup
+        if winner is backup:
+            self._count("hedge_wins")
+        for future in (primary, backup):
+            if future is not winner:
+                future.add_done_callback(_discard)
+        return winner.result()
+
+
+class AsyncResilientUpstream(_Policy):
+    """Versão assíncrona (httpx), usada por asgi_app.py"""
+
+    def __init__(self, client, **kwargs):
+        super().__init__(client, **kwargs)
+        self.FAILOVER_ERRORS = (upstream.httpx.ReadTimeout,)
+        self.RETRY_ERRORS = (upstream.httpx.TransportError,)
+
+    async def chat_completion(self, payload, headers=None):
+        import asyncio  # só o modo ASGI usa; fora da partida das apps Flask
+        self._count("calls")
+        models = self.models_for(payload["model"])
+        last_response = None
+        last_error = None
+        tried = False
+
+        for model in models:
+            breaker = self.breaker(model)
+            if not breaker.allow():
+                continue
+            # Meio-aberto: uma única chamada de teste, sem retentativa nem hedge
+            trial = breaker.state != "closed"
+            if tried:
+                self._count("failovers")
+            tried = True
+            body = payload if model == payload["model"] else dict(payload, model=model)
+
+            for attempt in range(1 if trial else self.max_retries + 1):
+                if attempt:
+                    self._count("retries")
+                    await asyncio.sleep(self.backoff(attempt, last_response))
+                self._count("attempts")
+                started = time.perf_counter()
+                try:
+                    response = await self._send(body, headers, hedge=not trial)
+                except self.FAILOVER_ERRORS as e:
+                    breaker.record_failure()
+                    last_error, last_response = e, None
+                    break
+                except self.RETRY_ERRORS as e:
+                    breaker.record_failure()
+                    last_error, last_response = e, None
+                    continue
+
+                if is_failure(response):
+                    breaker.record_failure()
+                    last_error, last_response = None, response
+                    continue
+
+                if is_client_error(response):
+                    breaker.record_ignored()
+                    return response
+                breaker.record_success()
+                self.latencies.add(time.perf_counter() - started)
+                return response
+
+        if last_response is not None:
+            return last_response
+        if last_error is not None:
+            raise last_error
+        raise self.unavailable(models)
+
+    async def _send(self, body, headers, hedge=True):
+        import asyncio
+        delay = self.hedge_delay(False) if hedge else None
+        if delay is None:
+            return await self.client.chat_completion(body, headers=headers)
+
+        primary = asyncio.ensure_future(self.client.chat_completion(body, headers=headers))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self._count("hedges")
+        backup = asyncio.ensure_future(self.client.chat_completion(body, headers=headers))
+        pending = {primary, backup}
+        winner = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and not is_failure(task.result()):
+                        winner = task
+                        break
+        finally:
+            # A perdedora (ou as duas, se o cliente desistiu) é cancelada
+            for task in (primary, backup):
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # marca erros da perdedora como lidos
+        if winner is None:
+            winner = backup
+        if winner is backup:
+            self._count("hedge_wins")
+        return winner.result()
+
+
+_upstream = None
+_upstream_lock = threading.Lock()
+
+
+def get_upstream():
+    """Camada resiliente sobre o cliente compartilhado do processo"""
+    global _upstream
+    if _upstream is None:
+        with _upstream_lock:
+            if _upstream is None:
+                _upstream = ResilientUpstream(upstream.get_client())
+    return _upstream
+
+
+def stats():
+    """Contadores para /stats"""
+    return get_upstream().stats()
@@ -0,0 +1,297 @@
+"""Cache semântico: reaproveita gerações de temas parecidos.
+
+O cache de respostas (cache.py) só acerta quando o payload é idêntico; aqui
+"IA no marketing" e "Inteligência Artificial no Marketing Digital" caem na
+mesma entrada. Tema e palavras-chave são normalizados (minúsculas, sem
+acentos, sem palavras vazias, siglas expandidas) e viram um vetor por hashing
+de palavras e trigramas de caracteres, sem modelo nem download. A busca é
+pela maior similaridade de cosseno dentro da partição (plataforma, tom,
+extensão, modelo...), então só textos gerados com as mesmas instruções são
+comparados. Acima do limiar, o texto em cache volta na hora como rascunho
+(metadata.semantic), sem chamar a OpenRouter.
+
+Negações e números mudam o sentido sem mudar quase nada do vetor ("Como não
+usar IA no RH" e "Como usar IA no RH" passam de 0,95; "10 dicas" e "3
+dicas" também ficam próximos). Por isso a entrada só vale se as palavras de
+negação e os números forem exatamente os mesmos do tema pedido. As entradas
+acima do limiar são tentadas da mais parecida para a menos parecida:
+vencidas ou com negação/números diferentes dão a vez à seguinte.
+
+Com numpy instalado (opcional), cada partição mantém uma matriz que cresce
+linha a linha (capacidade dobrada quando enche) e a busca é um único produto
+matriz-vetor; sem ele, o produto é feito nos vetores esparsos.
+
+A busca é exata, uma varredura da partição, e não um índice de vizinhos
+aproximados (HNSW, IVF): cada partição guarda no máximo SEMANTIC_CACHE_SIZE
+entradas, e 2048 x 1024 são uns 2 milhões de multiplicações, menos de um
+milissegundo. Um índice aproximado traria dependência e memória a mais e
+perderia vizinhos (recall < 1) sem ganho visível nessa escala.
+
+Configuração (variáveis de ambiente):
+    SEMANTIC_CACHE=1                  habilita o cache (desligado por padrão)
+    SEMANTIC_CACHE_SIZE=2048          entradas no total (LRU entre as partições)
+    SEMANTIC_CACHE_TTL=86400          validade de cada entrada, em segundos
+    SEMANTIC_CACHE_THRESHOLD=0.9      similaridade mínima (0 a 1)
+    SEMANTIC_CACHE_DIM=1024           dimensão dos vetores
+"""
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:  # opcional: sem ele, produto nos vetores esparsos
+    numpy = None
+
+# Palavras que não mudam o assunto
+STOPWORDS = frozenset(
+    "a o as os um uma uns umas de do da dos das no na nos nas em para por pelo pela "
+    "com sobre e ou que como seu sua seus suas ao aos the of in on for and to".split()
+)
+
+# Palavras que invertem o sentido do tema ("no" fica de fora: em português é "em + o")
+NEGATIONS = frozenset(
+    "nao sem nunca jamais nem nenhum nenhuma nada not without never none".split()
+)
+
+# Siglas comuns nos temas do time, escritas por extenso
+EXPANSIONS = {
+    "ia": "inteligencia artificial",
+    "ai": "inteligencia artificial",
+    "ml": "aprendizado maquina",
+    "mkt": "marketing",
+    "rh": "recursos humanos",
+    "ti": "tecnologia informacao",
+    "ux": "experiencia usuario"
+}
+
+# Peso das palavras inteiras em relação aos trigramas
+WORD_WEIGHT = 2.0
+TRIGRAM_WEIGHT = 1.0
+
+WORD = re.compile(r"[a-z0-9]+")
+NUMBER = re.compile(r"[0-9]+")
+
+
+def tokens(text):
+    """Palavras em minúsculas e sem acentos, com as siglas expandidas"""
+    text = unicodedata.normalize("NFKD", str(text or "").lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    words = []
+    for word in WORD.findall(text):
+        words.extend(EXPANSIONS.get(word, word).split())
+    return words
+
+
+def normalize(text):
+    """Palavras do texto: minúsculas, sem acentos, sem palavras vazias, siglas expandidas"""
+    return [word for word in tokens(text) if word not in STOPWORDS]
+
+
+def signature(text):
+    """Negações e números do texto: precisam ser iguais para a entrada valer"""
+    words = tokens(text)
+    negations = frozenset(word for word in words if word in NEGATIONS)
+    numbers = frozenset(int(number) for word in words for number in NUMBER.findall(word))
+    return negations, numbers
+
+
+def features(words):
+    """(feature, peso): cada palavra e seus trigramas (com bordas)"""
+    for word in words:
+        yield "w:" + word, WORD_WEIGHT
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            yield padded[i:i + 3], TRIGRAM_WEIGHT
+
+
+def embed(text, dim):
+    """Vetor esparso normalizado {índice: peso}; vazio se não sobrar nenhuma palavra"""
+    vector = {}
+    for feature, weight in features(normalize(text)):
+        # crc32 é estável entre processos (hash() de str não é)
+        index = zlib.crc32(feature.encode("utf-8")) % dim
+        vector[index] = vector.get(index, 0.0) + weight
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {index: value / norm for index, value in vector.items()} if norm else {}
+
+
+def dot(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+
+class Partition:
+    """Entradas de uma combinação de parâmetros; com numpy, uma linha da matriz por entrada"""
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.entries = {}  # texto normalizado -> (expira_em, vetor, texto, valor, assinatura)
+        self._matrix = None  # linhas [0, len(_keys)) em uso; o resto é capacidade livre
+        self._keys = []  # linha -> chave
+        self._rows = {}  # chave -> linha
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        if numpy is None:
+            return
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = len(self._keys)
+            self._keys.append(key)
+            if self._matrix is None or row == len(self._matrix):
+                self._grow()
+        vector = entry[1]
+        self._matrix[row] = 0
+        self._matrix[row, list(vector)] = list(vector.values())
+
+    def remove(self, key):
+        if self.entries.pop(key, None) is None or numpy is None:
+            return
+        # A última linha ocupa o lugar da removida
+        row = self._rows.pop(key)
+        last_key = self._keys.pop()
+        if last_key != key:
+            self._matrix[row] = self._matrix[len(self._keys)]
+            self._keys[row] = last_key
+            self._rows[last_key] = row
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self._keys))
+        matrix = numpy.zeros((capacity, self.dim), dtype=numpy.float32)
+        if self._matrix is not None:
+            matrix[:len(self._matrix)] = self._matrix
+        self._matrix = matrix
+
+    def nearest(self, vector, threshold):
+        """(chave, similaridade) das entradas com similaridade >= ``threshold``, da mais parecida"""
+        if not self.entries:
+            return []
+        if numpy is None:
+            scored = ((key, dot(vector, entry[1])) for key, entry in self.entries.items())
+            return sorted((item for item in scored if item[1] >= threshold),
+                          key=lambda item: item[1], reverse=True)
+        query = numpy.zeros(self.dim, dtype=numpy.float32)
+        query[list(vector)] = list(vector.values())
+        similarities = self._matrix[:len(self._keys)] @ query
+        rows = numpy.flatnonzero(similarities >= threshold)
+        rows = rows[numpy.argsort(-similarities[rows], kind="stable")]
+        return [(self._keys[row], float(similarities[row])) for row in rows]
+
+
+class SemanticCache:
+    """Busca por similaridade por partição, com LRU global e TTL"""
+
+    def __init__(self, max_entries=2048, ttl=86400, threshold=0.9, dim=1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.dim = dim
+        self._partitions = {}
+        self._lru = OrderedDict()  # (partição, chave) -> None, do mais antigo ao mais recente
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0}
+
+    def lookup(self, partition, text):
+        """Entrada mais parecida acima do limiar: (valor, similaridade, texto_original) ou None
+
+        Entradas vencidas são removidas e as com negações ou números
+        diferentes ignoradas; a busca segue para a próxima candidata.
+        """
+        vector = embed(text, self.dim)
+        wanted = signature(text)
+        now = time.time()
+        with self._lock:
+            bucket = self._partitions.get(partition)
+            matches = bucket.nearest(vector, self.threshold) if bucket is not None and vector else []
+            for key, similarity in matches:
+                expires_at, _, original, value, stored = bucket.entries[key]
+                if expires_at <= now:
+                    self._drop(partition, key)
+                    self.counters["expired"] += 1
+                elif stored == wanted:
+                    self._lru.move_to_end((partition, key))
+                    self.counters["hits"] += 1
+                    return value, round(similarity, 4), original
+            self.counters["misses"] += 1
+            return None
+
+    def add(self, partition, text, value):
+        vector = embed(text, self.dim)
+        if not vector:
+            return
+        key = " ".join(normalize(text))
+        with self._lock:
+            bucket = self._partitions.get(partition)
+            if bucket is None:
+                bucket = self._partitions[partition] = Partition(self.dim)
+            bucket.put(key, (time.time() + self.ttl, vector, text, value, signature(text)))
+            self._lru[(partition, key)] = None
+            self._lru.move_to_end((partition, key))
+            self.counters["sets"] += 1
+            while len(self._lru) > self.max_entries:
+                oldest_partition, oldest_key = next(iter(self._lru))
+                self._drop(oldest_partition, oldest_key)
+                self.counters["evictions"] += 1
+
+    def _drop(self, partition, key):
+        self._lru.pop((partition, key), None)
+        bucket = self._partitions.get(partition)
+        if bucket is not None:
+            bucket.remove(key)
+            if not bucket.entries:
+                del self._partitions[partition]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(
+                self.counters,
+                size=len(self._lru),
+                partitions=len(self._partitions),
+                max_entries=self.max_entries,
+                threshold=self.threshold,
+                numpy=numpy is not None,
+                hit_rate=round(self.counters["hits"] / lookups, 4) if lookups else 0.0
+            )
+
+
+def query_text(params):
+    """Texto comparado entre requisições: tema e palavras-chave"""
+    return f"{params['topic']} {params.get('keywords') or ''}".strip()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_configured = False
+
+
+def get_cache():
+    """Cache do processo, ou None se SEMANTIC_CACHE não estiver ativo"""
+    global _cache, _configured
+    if not _configured:
+        with _cache_lock:
+            if not _configured:
+                if os.getenv("SEMANTIC_CACHE", "0") not in ("0", "false", "False", ""):
+                    _cache = SemanticCache(
+                        max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "2048")),
+                        ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "86400")),
+                        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+                        dim=int(os.getenv("SEMANTIC_CACHE_DIM", "1024"))
+                    )
+                _configured = True
+    return _cache
+
+
+def stats():
+    """Contadores para /stats"""
+    current = get_cache()
+    if current is None:
+        return {"enabled": False}
+    return dict(current.stats(), enabled=True)
@@ -0,0 +1,50 @@
+"""Utilitários de streaming (SSE) entre a OpenRouter e o navegador."""
+import fastjson
+
+
+def iter_completion_chunks(response):
+    """Percorre o stream SSE da OpenRouter e devolve cada chunk JSON.
+
+    Linhas de comentário (``: OPENROUTER PROCESSING``) e o marcador final
+    ``[DONE]`` são descartados.
+    """
+    # Linhas em bytes: o JSON é lido sem decodificar para str antes
+    for line in response.iter_lines():
+        if not line or not line.startswith(b"data:"):
+            continue
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            break
+        try:
+            yield fastjson.loads(data)
+        except ValueError:
+            continue
+
+
+def chunk_delta(chunk):
+    """Texto incremental contido num chunk (ou string vazia)"""
+    choices = chunk.get("choices") or []
+    if not choices:
+        return ""
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+
+def sse(data, event=None):
+    """Formata um evento Server-Sent Events (bytes)"""
+    message = b"data: " + fastjson.dumps(data) + b"\n\n"
+    if event:
+        message = f"event: {event}\n".encode("ascii") + message
+    return message
+
+
+def error_message(error_data):
+    """Mensagem de erro de um corpo já lido (None se não era JSON)"""
+    error = error_data.get('error') if isinstance(error_data, dict) else None
+    if isinstance(error, dict):
+        return error.get('message') or 'Erro desconhecido'
+    return error if isinstance(error, str) and error else 'Erro desconhecido'
+
+
+def upstream_error_message(response):
+    """Mensagem de erro de uma resposta não-200 da OpenRouter"""
+    return error_message(fastjson.parse_response(response))
@@ -0,0 +1,633 @@
+"""Chaves de API por cliente (tenant), com cotas e registro do consumo de tokens.
+
+Com TENANTS=1, as rotas de geração (POST /generate*, POST /jobs) exigem a
+chave de um tenant em ``X-API-Key`` ou ``Authorization: Bearer``; sem ela a
+resposta é 401. Cada tenant tem cotas numa janela deslizante (gerações e
+tokens) e um limite de gerações simultâneas, para que um cliente pesado não
+ocupe todas as vagas com a OpenRouter; acima delas a resposta é 429 com
+``Retry-After``.
+
+As cotas e as vagas valem por geração (cada chamada à OpenRouter), não por
+requisição HTTP: um lote de 4 itens ou ``variants=5`` conta 4 ou 5 gerações,
+e cada uma ocupa uma vaga enquanto a chamada está em andamento, inclusive
+nos jobs executados pelos workers. Na entrada, a requisição só é conferida
+(chave, cotas e vagas livres), sem consumir nada; itens de lote e variantes
+esperam por uma vaga até TENANT_SLOT_TIMEOUT segundos.
+
+As chaves ficam no SQLite só como hash (sha256) e são carregadas num índice
+em memória: a verificação é um hash e uma consulta a dicionário, sem acesso
+ao disco. O ``usage`` de cada chamada à OpenRouter é somado em memória e
+gravado em lote, por uma thread de escrita, numa tabela só de inserções
+(usage_ledger). GET /usage mostra totais e percentis por tenant.
+
+As cotas valem por processo (como RATE_LIMIT_PER_MINUTE); na partida, a
+janela de tokens é reconstruída a partir do registro.
+
+Configuração:
+    TENANTS=1                     exige chave de tenant nas rotas de geração
+    TENANTS_DB_PATH=tenants.db    arquivo SQLite (tenants e registro de consumo)
+    TENANTS_ADMIN_KEY=            chave que vê o consumo de todos em /usage
+    TENANT_QUOTA_WINDOW=3600      janela das cotas, em segundos
+    TENANT_MAX_REQUESTS=1000      gerações por janela (0 = sem cota)
+    TENANT_MAX_TOKENS=500000      tokens por janela (0 = sem cota)
+    TENANT_MAX_CONCURRENT=4       gerações simultâneas por tenant (0 = sem limite)
+    TENANT_SLOT_TIMEOUT=30        segundos de espera por uma vaga livre
+    TENANT_FLUSH_INTERVAL=1.0     segundos entre gravações em lote do registro
+
+Administração:
+    python tenants.py add "Time de marketing" --max-tokens 200000
+    python tenants.py list
+    python tenants.py revoke <id>
+"""
+import contextlib
+import contextvars
+import hashlib
+import hmac
+import logging
+import math
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+from flask import Blueprint, g, jsonify, request
+
+import limits
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tenants (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    key_hash TEXT NOT NULL UNIQUE,
+    max_requests INTEGER,
+    max_tokens INTEGER,
+    active INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS usage_ledger (
+    id INTEGER PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    total_tokens INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_usage_tenant ON usage_ledger (tenant_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_usage_created ON usage_ledger (created_at);
+"""
+
+KEY_PREFIX = "pg_"
+# Chamadas recentes guardadas por tenant para os percentis de /usage
+RECENT_CALLS = 1000
+# Tenants novos ou revogados pela CLI valem sem reiniciar o servidor
+RELOAD_INTERVAL = 30
+
+# Tenant da requisição atual; segue para as threads de lote e variantes
+_current = contextvars.ContextVar("tenant", default=None)
+
+
+class Rejected(Exception):
+    """Requisição recusada pela autenticação ou pelas cotas do tenant"""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class Busy(Rejected):
+    """Todas as vagas de gerações simultâneas do tenant estão ocupadas"""
+
+    def __init__(self):
+        super().__init__(429, "Muitas gerações simultâneas para esta chave", retry_after=1)
+
+
+class SlidingWindow:
+    """Soma dos últimos ``window`` segundos, em ``slots`` fatias (O(1) amortizado)"""
+
+    def __init__(self, window, slots=60):
+        self.width = window / slots
+        self.slots = slots
+        self.total = 0
+        self._buckets = deque()  # [fatia, soma]
+
+    def _expire(self, now):
+        oldest = int(now // self.width) - self.slots + 1
+        while self._buckets and self._buckets[0][0] < oldest:
+            self.total -= self._buckets.popleft()[1]
+
+    def add(self, value, now):
+        self._expire(now)
+        index = int(now // self.width)
+        if self._buckets and self._buckets[-1][0] == index:
+            self._buckets[-1][1] += value
+        else:
+            self._buckets.append([index, value])
+        self.total += value
+
+    def value(self, now):
+        self._expire(now)
+        return self.total
+
+    def retry_after(self, now):
+        """Segundos até a fatia mais antiga sair da janela"""
+        if not self._buckets:
+            return 0
+        return max(0, (self._buckets[0][0] + self.slots) * self.width - now)
+
+
+class Tenant:
+    def __init__(self, tenant_id, name, max_requests, max_tokens, window):
+        self.id = tenant_id
+        self.name = name
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self.requests = SlidingWindow(window)
+        self.tokens = SlidingWindow(window)
+        self.in_flight = 0
+        self.totals = dict.fromkeys(("requests", "calls", "prompt_tokens", "completion_tokens", "total_tokens"), 0)
+        self.recent = deque(maxlen=RECENT_CALLS)
+        # Um lock por tenant: um cliente pesado não disputa o lock dos outros
+        self.lock = threading.Lock()
+        self.slot_freed = threading.Condition(self.lock)
+
+
+def hash_key(key):
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0
+
+
+class TenantRegistry:
+    def __init__(self, path, window=3600, max_requests=1000, max_tokens=500000, max_concurrent=4,
+                 flush_interval=1.0, batch_size=500, queue_size=10000):
+        self.path = path
+        self.window = window
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self.max_concurrent = max_concurrent
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._by_hash = {}
+        self._by_id = {}
+        self._reload_lock = threading.Lock()
+        self._loaded_at = 0
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        conn.commit()
+        self.reload()
+        self._restore_usage()
+
+        self._writer = threading.Thread(target=self._write_loop, name="usage-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Índice de chaves ------------------------------------------------------
+
+    def reload(self):
+        """Relê os tenants ativos, preservando janelas e totais dos que já existiam"""
+        rows = self._connect().execute(
+            "SELECT id, name, key_hash, max_requests, max_tokens FROM tenants WHERE active = 1").fetchall()
+        by_hash, by_id = {}, {}
+        for tenant_id, name, key_hash, max_requests, max_tokens in rows:
+            tenant = self._by_id.get(tenant_id) or Tenant(tenant_id, name, 0, 0, self.window)
+            tenant.name = name
+            tenant.max_requests = self.max_requests if max_requests is None else max_requests
+            tenant.max_tokens = self.max_tokens if max_tokens is None else max_tokens
+            by_hash[key_hash] = tenant
+            by_id[tenant_id] = tenant
+        # Troca atômica: leitores nunca veem um índice pela metade
+        self._by_hash, self._by_id = by_hash, by_id
+        self._loaded_at = time.monotonic()
+
+    def _restore_usage(self):
+        """Totais e janela de tokens a partir do registro gravado"""
+        conn = self._connect()
+        for tenant_id, calls, prompt, completion, total in conn.execute(
+                "SELECT tenant_id, count(*), sum(prompt_tokens), sum(completion_tokens), sum(total_tokens) "
+                "FROM usage_ledger GROUP BY tenant_id"):
+            tenant = self._by_id.get(tenant_id)
+            if tenant is not None:
+                tenant.totals.update(calls=calls, prompt_tokens=prompt, completion_tokens=completion,
+                                     total_tokens=total)
+        for tenant_id, created_at, total in conn.execute(
+                "SELECT tenant_id, created_at, total_tokens FROM usage_ledger WHERE created_at > ? "
+                "ORDER BY created_at", (time.time() - self.window,)):
+            tenant = self._by_id.get(tenant_id)
+            if tenant is not None:
+                tenant.tokens.add(total, created_at)
+
+    def lookup(self, api_key):
+        """Tenant da chave (ou None): um hash e uma consulta ao índice em memória"""
+        if time.monotonic() - self._loaded_at > RELOAD_INTERVAL and self._reload_lock.acquire(blocking=False):
+            try:
+                self.reload()
+            finally:
+                self._reload_lock.release()
+        return self._by_hash.get(hash_key(api_key))
+
+    def get(self, tenant_id):
+        return self._by_id.get(tenant_id)
+
+    # Cotas -----------------------------------------------------------------
+
+    def admit(self, api_key):
+        """Autentica e confere cotas e vagas, sem consumi-las; levanta Rejected se não houver"""
+        tenant = self.lookup(api_key) if api_key else None
+        if tenant is None:
+            raise Rejected(401, "Chave de API inválida ou ausente")
+        with tenant.lock:
+            # Requisição nova com todas as vagas ocupadas: 429 na hora, sem esperar
+            if self.max_concurrent and tenant.in_flight >= self.max_concurrent:
+                raise Busy()
+            self._check_quota(tenant, time.time(), 1)
+        return tenant
+
+    def _check_quota(self, tenant, now, count):
+        if tenant.max_requests and tenant.requests.value(now) + count > tenant.max_requests:
+            raise Rejected(429, "Cota de gerações excedida", retry_after=tenant.requests.retry_after(now))
+        if tenant.max_tokens and tenant.tokens.value(now) >= tenant.max_tokens:
+            raise Rejected(429, "Cota de tokens excedida", retry_after=tenant.tokens.retry_after(now))
+
+    def acquire(self, tenant, count=1, timeout=0):
+        """Reserva uma vaga para uma chamada à OpenRouter e conta ``count`` gerações na cota.
+
+        Espera até ``timeout`` segundos por uma vaga (levanta Busy depois);
+        cota esgotada levanta Rejected na hora.
+        """
+        deadline = time.monotonic() + timeout
+        with tenant.slot_freed:
+            while self.max_concurrent and tenant.in_flight >= self.max_concurrent:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Busy()
+                tenant.slot_freed.wait(remaining)
+            now = time.time()
+            self._check_quota(tenant, now, count)
+            tenant.requests.add(count, now)
+            tenant.totals["requests"] += count
+            tenant.in_flight += 1
+
+    def release(self, tenant):
+        with tenant.slot_freed:
+            tenant.in_flight -= 1
+            tenant.slot_freed.notify()
+
+    # Registro de consumo ---------------------------------------------------
+
+    def charge(self, tenant, model, usage):
+        """Soma o ``usage`` de uma chamada e o enfileira para o registro"""
+        prompt = int(usage.get("prompt_tokens") or 0)
+        completion = int(usage.get("completion_tokens") or 0)
+        total = int(usage.get("total_tokens") or prompt + completion)
+        now = time.time()
+        with tenant.lock:
+            tenant.tokens.add(total, now)
+            tenant.totals["calls"] += 1
+            tenant.totals["prompt_tokens"] += prompt
+            tenant.totals["completion_tokens"] += completion
+            tenant.totals["total_tokens"] += total
+            tenant.recent.append(total)
+        row = (tenant.id, now, model or "", prompt, completion, total)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            # Fila cheia: grava direto para não perder o lançamento
+            self._insert([row])
+
+    def _insert(self, rows):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO usage_ledger (tenant_id, created_at, model, prompt_tokens, completion_tokens, "
+                "total_tokens) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def _write_loop(self):
+        while True:
+            rows = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(rows) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    rows.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._insert(rows)
+            except sqlite3.Error as e:
+                logger.error(f"Falha ao gravar consumo ({len(rows)} lançamentos): {e}")
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Bloqueia até a fila de gravação esvaziar"""
+        self._queue.join()
+
+    def usage(self, tenant):
+        """Consumo do tenant para /usage"""
+        now = time.time()
+        with tenant.lock:
+            requests_window = tenant.requests.value(now)
+            tokens_window = tenant.tokens.value(now)
+            totals = dict(tenant.totals)
+            recent = sorted(tenant.recent)
+            in_flight = tenant.in_flight
+        return {
+            "id": tenant.id,
+            "name": tenant.name,
+            "window": {
+                "seconds": self.window,
+                "requests": requests_window,
+                "max_requests": tenant.max_requests or None,
+                "tokens": tokens_window,
+                "max_tokens": tenant.max_tokens or None
+            },
+            "totals": totals,
+            "tokens_per_call": {
+                "samples": len(recent),
+                "p50": percentile(recent, 50),
+                "p95": percentile(recent, 95),
+                "p99": percentile(recent, 99),
+                "max": recent[-1] if recent else 0
+            },
+            "in_flight": in_flight
+        }
+
+    def usage_all(self):
+        return [self.usage(tenant) for tenant in sorted(self._by_id.values(), key=lambda t: t.name)]
+
+    # Administração ---------------------------------------------------------
+
+    def create(self, name, max_requests=None, max_tokens=None):
+        """Cria um tenant; retorna (id, chave). A chave não é guardada, só o hash"""
+        tenant_id = uuid.uuid4().hex[:12]
+        key = KEY_PREFIX + secrets.token_urlsafe(32)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO tenants (id, name, key_hash, max_requests, max_tokens, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (tenant_id, name, hash_key(key), max_requests, max_tokens, time.time())
+            )
+        self.reload()
+        return tenant_id, key
+
+    def revoke(self, tenant_id):
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute("UPDATE tenants SET active = 0 WHERE id = ?", (tenant_id,))
+        self.reload()
+        return cursor.rowcount
+
+
+def enabled():
+    return os.getenv("TENANTS", "0") not in ("0", "false", "False", "")
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = TenantRegistry(
+                    os.getenv("TENANTS_DB_PATH", "tenants.db"),
+                    window=float(os.getenv("TENANT_QUOTA_WINDOW", "3600")),
+                    max_requests=int(os.getenv("TENANT_MAX_REQUESTS", "1000")),
+                    max_tokens=int(os.getenv("TENANT_MAX_TOKENS", "500000")),
+                    max_concurrent=int(os.getenv("TENANT_MAX_CONCURRENT", "4")),
+                    flush_interval=float(os.getenv("TENANT_FLUSH_INTERVAL", "1.0"))
+                )
+    return _registry
+
+
+def slot_timeout():
+    return float(os.getenv("TENANT_SLOT_TIMEOUT", "30"))
+
+
+def current():
+    """Tenant da requisição (ou job) em andamento, ou None"""
+    return _current.get()
+
+
+def activate(tenant):
+    """Define o tenant atual; retorna o token para ``deactivate``"""
+    return _current.set(tenant)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def scoped(key):
+    """Chave de agrupamento (coalesce.py) separada por tenant: cada um paga e espera pela sua geração"""
+    tenant = _current.get()
+    return key if tenant is None else f"{key}:{tenant.id}"
+
+
+def record_usage(model, usage):
+    """Lança o ``usage`` de uma chamada à OpenRouter na conta do tenant atual"""
+    tenant = _current.get()
+    if tenant is not None and usage:
+        get_registry().charge(tenant, model, usage)
+
+
+@contextlib.contextmanager
+def generation(count=1):
+    """Vaga e cota de uma chamada à OpenRouter do tenant atual (sem tenant, não faz nada).
+
+    ``count`` é o número de gerações pedidas na chamada (``n`` das variantes).
+    """
+    tenant = _current.get()
+    if tenant is None:
+        yield
+        return
+    registry = get_registry()
+    registry.acquire(tenant, count, slot_timeout())
+    try:
+        yield
+    finally:
+        registry.release(tenant)
+
+
+@contextlib.asynccontextmanager
+async def async_generation(count=1):
+    """Como ``generation``, esperando pela vaga sem bloquear o event loop"""
+    tenant = _current.get()
+    if tenant is None:
+        yield
+        return
+    import asyncio  # só o modo ASGI usa; fora da partida das apps Flask
+
+    registry = get_registry()
+    deadline = time.monotonic() + slot_timeout()
+    while True:
+        try:
+            registry.acquire(tenant, count)
+            break
+        except Busy:
+            if time.monotonic() >= deadline:
+                raise
+            await asyncio.sleep(0.05)
+    try:
+        yield
+    finally:
+        registry.release(tenant)
+
+
+def hold_generation():
+    """Reserva a vaga de uma geração em stream até o fim da resposta.
+
+    A chamada começa na view e termina no corpo: a vaga fica em ``g`` e é
+    liberada no teardown ou, se o corpo for enviado, por ``streaming``.
+    """
+    tenant = _current.get()
+    if tenant is not None:
+        get_registry().acquire(tenant, 1, slot_timeout())
+        g.setdefault("tenant_slots", []).append(tenant)
+
+
+def release_held():
+    for tenant in g.pop("tenant_slots", []):
+        get_registry().release(tenant)
+
+
+def streaming(iterable):
+    """Mantém o tenant da requisição (e as vagas reservadas) até o fim de uma resposta em stream.
+
+    O teardown da requisição roda quando a view retorna, antes do corpo ser
+    gerado; aqui o tenant passa para o gerador, que libera as vagas ao terminar.
+    """
+    tenant = g.pop("tenant", None)
+    held = g.pop("tenant_slots", [])
+    if tenant is None:
+        return iterable
+
+    def generate():
+        _current.set(tenant)
+        try:
+            yield from iterable
+        finally:
+            _current.set(None)
+            for slot in held:
+                get_registry().release(slot)
+
+    return generate()
+
+
+def rejected_body(error):
+    body = {"error": str(error)}
+    if error.retry_after is not None:
+        body["retry_after"] = max(1, math.ceil(error.retry_after))
+    return body
+
+
+def rejected_response(error):
+    response = jsonify(rejected_body(error))
+    response.status_code = error.status
+    if error.retry_after is not None:
+        response.headers["Retry-After"] = str(max(1, math.ceil(error.retry_after)))
+    return response
+
+
+def is_admin(key):
+    admin_key = os.getenv("TENANTS_ADMIN_KEY")
+    return bool(admin_key and key) and hmac.compare_digest(admin_key.encode("utf-8"), key.encode("utf-8"))
+
+
+blueprint = Blueprint("tenants", __name__)
+
+
+@blueprint.before_app_request
+def authenticate_tenant():
+    """Exige a chave de um tenant nas rotas de geração; cotas e vagas são só conferidas"""
+    if not enabled() or not limits.is_generation_request(request.method, request.path):
+        return None
+    try:
+        tenant = get_registry().admit(limits.api_key(request.headers))
+    except Rejected as e:
+        return rejected_response(e)
+    g.tenant = tenant
+    activate(tenant)
+    return None
+
+
+@blueprint.teardown_app_request
+def release_tenant(exc):
+    # Vagas de um stream que não chegou a ser enviado (erro antes do primeiro byte)
+    release_held()
+    g.pop("tenant", None)
+    # A thread do servidor é reaproveitada: o tenant não pode vazar para a próxima requisição
+    # (num stream, o gerador de ``streaming`` define o seu)
+    _current.set(None)
+
+
+@blueprint.route('/usage', methods=['GET'])
+def usage():
+    """Consumo do tenant da chave (ou de todos, com TENANTS_ADMIN_KEY)"""
+    if not enabled():
+        return jsonify({"error": "Tenants desativados (TENANTS=1)"}), 404
+    key = limits.api_key(request.headers)
+    registry = get_registry()
+    if is_admin(key):
+        return jsonify({"tenants": registry.usage_all()})
+    tenant = registry.lookup(key) if key else None
+    if tenant is None:
+        return jsonify({"error": "Chave de API inválida ou ausente"}), 401
+    return jsonify(registry.usage(tenant))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Administração dos tenants")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="cria um tenant e mostra a chave (uma única vez)")
+    add.add_argument("name")
+    add.add_argument("--max-requests", type=int, help="requisições por janela (padrão: TENANT_MAX_REQUESTS)")
+    add.add_argument("--max-tokens", type=int, help="tokens por janela (padrão: TENANT_MAX_TOKENS)")
+    commands.add_parser("list", help="tenants ativos e consumo")
+    revoke = commands.add_parser("revoke", help="desativa a chave de um tenant")
+    revoke.add_argument("id")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    registry = get_registry()
+    if args.command == "add":
+        tenant_id, key = registry.create(args.name, args.max_requests, args.max_tokens)
+        print(f"id:    {tenant_id}\nchave: {key}")
+    elif args.command == "list":
+        for item in registry.usage_all():
+            print(f"{item['id']}  {item['name']:<30} {item['totals']['total_tokens']:>10} tokens "
+                  f"{item['totals']['calls']:>6} chamadas")
+    elif not registry.revoke(args.id):
+        parser.exit(1, "Tenant não encontrado\n")
@@ -0,0 +1,98 @@
+"""Caminho ASGI: mesmo contrato de /generate, com a OpenRouter aguardada sem bloquear"""
+import asyncio
+import importlib
+import time
+
+import httpx
+import pytest
+
+import history
+import limits
+from conftest import FakeUpstream
+
+
+class AsyncFakeUpstream(FakeUpstream):
+    """FakeUpstream com chat_completion assíncrono e uma espera opcional"""
+
+    delay = 0
+
+    async def chat_completion(self, body, headers=None, stream=False):
+        await asyncio.sleep(self.delay)
+        return FakeUpstream.chat_completion(self, body, headers, stream)
+
+
+@pytest.fixture
+def asgi(monkeypatch, tmp_path):
+    monkeypatch.setenv("HISTORY_DB_PATH", str(tmp_path / "history.db"))
+    monkeypatch.setenv("JOBS_DB_PATH", str(tmp_path / "jobs.db"))
+    monkeypatch.setenv("RATE_LIMIT_PER_MINUTE", "0")
+    monkeypatch.setattr(limits, "_rate_limiter", None)
+    monkeypatch.setattr(history, "_store", None)
+    module = importlib.import_module("asgi_app")
+    monkeypatch.setattr(module.core, "OPENROUTER_API_KEY", "chave-de-teste")
+    fake = AsyncFakeUpstream()
+    monkeypatch.setattr(module, "_resilient", fake)
+    return module, fake
+
+
+def call(module, *requests):
+    """Envia as requisições (método, caminho, json) ao mesmo tempo"""
+    async def main():
+        transport = httpx.ASGITransport(app=module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://teste") as client:
+            return await asyncio.gather(*(client.request(method, path, json=body) for method, path, body in requests))
+    return asyncio.run(main())
+
+
+def test_generate_matches_the_flask_contract(asgi):
+    module, fake = asgi
+    fake.texts = ["Post sobre IA."]
+    response, = call(module, ("POST", "/generate", {"topic": "IA no marketing"}))
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] and data["article"] == "Post sobre IA."
+    assert data["metadata"]["platform"] == "LinkedIn"
+    assert fake.calls[0]["model"] == module.core.OPENROUTER_MODEL
+
+
+def test_validation_and_routing_errors(asgi):
+    module, fake = asgi
+    bad, missing, wrong_method = call(module, ("POST", "/generate", {}), ("GET", "/nada", None),
+                                      ("GET", "/generate", None))
+    assert bad.status_code == 400 and "error" in bad.json()
+    assert (missing.status_code, wrong_method.status_code) == (404, 405)
+    assert fake.calls == []
+
+
+def test_upstream_error_is_a_500(asgi):
+    module, fake = asgi
+    fake.status_code = 429
+    response, = call(module, ("POST", "/generate", {"topic": "IA no marketing"}))
+    assert response.status_code == 500 and "recusado" in response.json()["error"]
+
+
+def test_waiting_generations_do_not_block_each_other(asgi):
+    module, fake = asgi
+    fake.delay = 0.2
+    started = time.perf_counter()
+    responses = call(module, *[("POST", "/generate", {"topic": f"Tema {i}"}) for i in range(5)])
+    assert [response.status_code for response in responses] == [200] * 5
+    # Cinco esperas de 0,2 s em paralelo, não em série
+    assert time.perf_counter() - started < 0.8
+
+
+def test_identical_generations_share_one_call(asgi):
+    module, fake = asgi
+    fake.delay = 0.05
+    responses = call(module, *[("POST", "/generate", {"topic": "IA no marketing"})] * 3)
+    assert len(fake.calls) == 1
+    assert sum(bool(response.json()["metadata"].get("coalesced")) for response in responses) == 2
+
+
+def test_health_templates_and_metrics(asgi):
+    module, _ = asgi
+    health, templates, metrics_page = call(module, ("GET", "/health", None), ("GET", "/templates", None),
+                                           ("GET", "/metrics", None))
+    assert health.status_code == 200 and "limits" in health.json()
+    assert templates.json()["templates"] and templates.headers["etag"].startswith('W/"')
+    assert "generation_stage_seconds" in metrics_page.text
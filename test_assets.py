@@ -0,0 +1,76 @@
+"""Página principal: CSS/JS extraídos com hash no nome, ETag e versões comprimidas"""
+import gzip
+import json
+
+import assets
+
+HTML = """<html>
+  <head>
+    <style>
+      /* comentário */
+      a :hover { color: red; }
+    </style>
+  </head>
+  <body>
+    <script>
+      // comentário
+      const x = 1;
+    </script>
+    <script src="https://cdn.example/lib.js"></script>
+  </body>
+</html>"""
+
+
+def test_minify_css_keeps_descendant_selectors():
+    assert assets.minify_css("/* c */ a :hover { color: red; }\n") == "a :hover{color:red}"
+
+
+def test_bundle_extracts_inline_blocks():
+    bundle = assets.Bundle(HTML)
+    css, js = sorted(bundle.assets.values(), key=lambda asset: asset.mimetype)
+    assert css.name.startswith("index.") and css.name.endswith(".css") and css.body == b"a :hover{color:red}"
+    assert js.body == b"const x = 1;"
+    page = bundle.index.body.decode()
+    assert f'<link rel="stylesheet" href="/assets/{css.name}">' in page
+    assert f'<script src="/assets/{js.name}"></script>' in page
+    assert '<script src="https://cdn.example/lib.js"></script>' in page
+    assert "<style>" not in page
+
+
+def test_name_changes_with_content():
+    other = assets.Bundle(HTML.replace("red", "blue"))
+    assert sorted(other.assets) != sorted(assets.Bundle(HTML).assets)
+
+
+def test_only_large_bodies_are_precompressed():
+    assert assets.Asset("a.css", b"a{}", "text/css").encoded == {}
+    body = b"a{color:red}" * 200
+    assert gzip.decompress(assets.Asset("a.css", body, "text/css").encoded["gzip"]) == body
+
+
+def test_write_bundle(tmp_path):
+    bundle = assets.Bundle(HTML)
+    written = dict(assets.write_bundle(bundle, str(tmp_path)))
+    assert set(bundle.assets) <= set(written) and "index.html" in written
+    assert json.loads((tmp_path / "manifest.json").read_text())["assets"] == sorted(bundle.assets)
+
+
+def test_index_and_assets_are_served_with_etag(client):
+    page = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert page.status_code == 200
+    assert page.headers["Cache-Control"] == assets.PAGE_CACHE_CONTROL
+    assert client.get("/", headers={"If-None-Match": page.headers["ETag"],
+                                    "Accept-Encoding": "identity"}).status_code == 304
+    for name in client.application.extensions["assets"].assets:
+        response = client.get(f"/assets/{name}", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == assets.ASSET_CACHE_CONTROL
+        assert response.headers["Vary"] == "Accept-Encoding"
+    assert client.get("/assets/index.nada.css").status_code == 404
+
+
+def test_gzip_is_served_when_accepted(client):
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.get_data()).startswith(b"<")
+    assert response.headers["ETag"].endswith('-gzip"')
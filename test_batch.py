@@ -0,0 +1,90 @@
+"""Lote: expansão dos itens, paralelismo limitado e NDJSON na ordem de término"""
+import json
+import threading
+import time
+
+import pytest
+
+import batch
+
+PLATFORMS = ["LinkedIn", "Instagram", "Facebook"]
+
+
+def test_items_inherit_batch_defaults():
+    specs, error = batch.expand_specs({"tone": "Técnico", "parallelism": 2,
+                                       "items": [{"topic": "a"}, {"topic": "b", "tone": "Engraçado"}]}, PLATFORMS)
+    assert error is None
+    assert specs == [{"tone": "Técnico", "topic": "a"}, {"tone": "Engraçado", "topic": "b"}]
+
+
+def test_platforms_all_expands_to_supported():
+    specs, _ = batch.expand_specs({"topic": "a", "platforms": "all"}, PLATFORMS)
+    assert [spec["platform"] for spec in specs] == PLATFORMS
+
+
+@pytest.mark.parametrize("data", [None, {"topic": "a"}, {"items": []}, {"items": ["a"]},
+                                  {"topic": "a", "platforms": "LinkedIn"}])
+def test_invalid_batches(data):
+    specs, error = batch.expand_specs(data, PLATFORMS)
+    assert specs is None and error
+
+
+def test_batch_size_limit(monkeypatch):
+    monkeypatch.setenv("BATCH_MAX_ITEMS", "2")
+    _, error = batch.expand_specs({"items": [{"topic": "a"}] * 3}, PLATFORMS)
+    assert "máximo 2" in error
+
+
+def test_parallelism_is_bounded(monkeypatch):
+    monkeypatch.setenv("BATCH_MAX_PARALLELISM", "4")
+    assert batch.parallelism_for({"parallelism": 10}, 8) == 4
+    assert batch.parallelism_for({"parallelism": 10}, 2) == 2
+    assert batch.parallelism_for({"parallelism": "x"}, 8) == 4
+    assert batch.parallelism_for({"parallelism": 0}, 8) == 1
+
+
+def test_run_batch_respects_parallelism():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def run_one(spec):
+        with lock:
+            running.append(spec)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(spec)
+        return {"article": spec["topic"]}, 200
+
+    results = list(batch.run_batch([{"topic": str(i)} for i in range(6)], run_one, 2))
+    assert sorted(index for index, _, _ in results) == list(range(6))
+    assert max(peak) == 2
+
+
+def test_ndjson_reports_failures_and_summary():
+    def run_one(spec):
+        if spec["topic"] == "erro":
+            raise RuntimeError("falhou")
+        return {"article": spec["topic"]}, 200
+
+    lines = [json.loads(line) for line in batch.ndjson_stream([{"topic": "ok"}, {"topic": "erro"}], run_one, 1)]
+    by_index = {line["index"]: line for line in lines[:-1]}
+    assert by_index[0]["result"] == {"article": "ok"}
+    assert by_index[1]["status"] == 500 and "falhou" in by_index[1]["error"]
+    assert lines[-1]["done"] and (lines[-1]["succeeded"], lines[-1]["failed"]) == (1, 1)
+
+
+def test_batch_route_streams_ndjson(client, fake_upstream):
+    response = client.post("/generate/batch", json={"topic": "IA no marketing",
+                                                     "platforms": ["LinkedIn", "Instagram"]})
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(line["result"]["metadata"]["platform"] for line in lines[:-1]) == ["Instagram", "LinkedIn"]
+    assert lines[-1]["succeeded"] == 2
+    assert len(fake_upstream.calls) == 2
+
+
+def test_batch_route_rejects_invalid_body(client):
+    assert client.post("/generate/batch", json={"topic": "a"}).status_code == 400
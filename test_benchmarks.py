@@ -0,0 +1,89 @@
+"""Ferramentas de benchmark: stub da OpenRouter reprodutível e comparação com a linha de base"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+import bench_load  # noqa: E402
+import common  # noqa: E402
+import stub_upstream  # noqa: E402
+import upstream  # noqa: E402
+
+
+def test_same_seed_same_sequence():
+    options = dict(latency=0.2, distribution="lognormal", jitter=0.5, error_rate=0.3, error_statuses=(429, 503))
+    first = stub_upstream.StubServer(seed=7, **options)
+    second = stub_upstream.StubServer(seed=7, **options)
+    assert [first.next_response() for _ in range(50)] == [second.next_response() for _ in range(50)]
+
+
+@pytest.mark.parametrize("distribution", ["uniform", "exponential", "lognormal"])
+def test_latency_distributions_keep_the_mean(distribution):
+    server = stub_upstream.StubServer(latency=0.1, distribution=distribution, jitter=0.05)
+    delays = [server.next_response()[0] for _ in range(4000)]
+    assert min(delays) >= 0
+    assert sum(delays) / len(delays) == pytest.approx(0.1, rel=0.1)
+
+
+def test_error_rate_and_statuses():
+    server = stub_upstream.StubServer(error_rate=0.25, error_statuses=(429, 503))
+    errors = [error for _, error in (server.next_response() for _ in range(4000)) if error]
+    assert len(errors) / 4000 == pytest.approx(0.25, abs=0.03)
+    assert set(errors) == {429, 503} and server.errors == len(errors)
+
+
+def test_unknown_distribution():
+    with pytest.raises(ValueError):
+        stub_upstream.StubServer(distribution="normal")
+
+
+def test_completion_size_and_usage():
+    server = stub_upstream.StubServer(completion_tokens=400)
+    assert len(server.article) / 4 == pytest.approx(400, rel=0.1)
+    usage = server.usage_for({"messages": [{"content": "x" * 400}]})
+    assert usage == {"prompt_tokens": 100, "completion_tokens": 400, "total_tokens": 500}
+    assert stub_upstream.StubServer().usage_for({}) == stub_upstream.FAKE_USAGE
+
+
+def test_stub_serves_json_and_errors_over_http():
+    server = stub_upstream.start_stub(error_rate=1.0, error_statuses=(429,))
+    try:
+        client = upstream.UpstreamClient(base_url=server.base_url)
+        response = client.chat_completion({"model": "m", "messages": []})
+        assert response.status_code == 429 and response.headers["Retry-After"] == "1"
+        server.error_rate = 0
+        response = client.chat_completion({"model": "m", "messages": []})
+        assert response.json()["choices"][0]["message"]["content"] == stub_upstream.FAKE_ARTICLE
+        assert (server.connections, server.requests) == (1, 2)
+        client.close()
+    finally:
+        server.shutdown()
+
+
+def test_stub_streams_words_and_usage():
+    server = stub_upstream.start_stub()
+    try:
+        client = upstream.UpstreamClient(base_url=server.base_url)
+        response = client.chat_completion({"model": "m", "messages": [], "stream": True}, stream=True)
+        events = [line for line in response.iter_lines() if line.startswith(b"data: ")]
+        response.close()
+        assert events[-1] == b"data: [DONE]"
+        assert b'"usage"' in events[-2]
+        client.close()
+    finally:
+        server.shutdown()
+
+
+def test_percentile_interpolates():
+    assert common.percentile([4, 1, 3, 2], 50) == 2.5
+    assert common.percentile([], 99) == 0.0
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {"app/generate/c8": {"throughput_rps": 100, "p50_ms": 10, "p99_ms": 50, "error_rate": 0.0}}
+    better = {"app/generate/c8": {"throughput_rps": 105, "p50_ms": 9, "p99_ms": 55, "error_rate": 0.0}}
+    worse = {"app/generate/c8": {"throughput_rps": 70, "p50_ms": 10, "p99_ms": 50, "error_rate": 0.05}}
+    assert bench_load.compare(better, baseline, 0.15) == []
+    assert bench_load.compare(worse, baseline, 0.15) == ["app/generate/c8 throughput_rps", "app/generate/c8 error_rate"]
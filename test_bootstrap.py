@@ -0,0 +1,40 @@
+"""Chave das sessões: FLASK_SECRET_KEY, nunca derivada da chave da API"""
+import logging
+
+from flask import Flask
+
+import bootstrap
+
+
+def create(config=None):
+    return bootstrap.init_app(Flask(__name__), config)
+
+
+def test_secret_key_comes_from_the_environment(monkeypatch):
+    monkeypatch.setenv("FLASK_SECRET_KEY", "segredo")
+    assert create().config["SECRET_KEY"] == "segredo"
+
+
+def test_missing_key_is_an_error_outside_debug(monkeypatch, caplog):
+    monkeypatch.delenv("FLASK_SECRET_KEY", raising=False)
+    monkeypatch.setenv("OPENROUTER_API_KEY", "sk-or-chave")
+    with caplog.at_level(logging.WARNING, logger="bootstrap"):
+        app = create()
+    # Nada derivado da chave da API
+    assert app.config["SECRET_KEY"] == bootstrap.DEV_SECRET_KEY
+    assert [record.levelno for record in caplog.records] == [logging.ERROR]
+
+
+def test_missing_key_is_only_a_warning_in_debug(monkeypatch, caplog):
+    monkeypatch.delenv("FLASK_SECRET_KEY", raising=False)
+    with caplog.at_level(logging.WARNING, logger="bootstrap"):
+        create({"TESTING": True})
+    assert [record.levelno for record in caplog.records] == [logging.WARNING]
+
+
+def test_config_key_wins(monkeypatch, caplog):
+    monkeypatch.delenv("FLASK_SECRET_KEY", raising=False)
+    with caplog.at_level(logging.WARNING, logger="bootstrap"):
+        app = create({"SECRET_KEY": "da-config"})
+    assert app.config["SECRET_KEY"] == "da-config"
+    assert caplog.records == []
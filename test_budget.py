@@ -0,0 +1,42 @@
+"""Orçamento de tokens: max_tokens por plataforma, estimativa e custo previsto"""
+import json
+
+import pytest
+
+import budget
+
+BODY = {
+    "model": "openai/gpt-4o-mini",
+    "max_tokens": 500,
+    "messages": [{"role": "system", "content": "Regras."}, {"role": "user", "content": "Post sobre IA no marketing"}]
+}
+
+
+def test_max_tokens_respects_the_platform_limit():
+    # Twitter/X: 3 tweets de 280 caracteres, menos que um texto "longo"
+    assert budget.max_tokens("Twitter/X", "longo") < budget.max_tokens("LinkedIn", "longo")
+    assert budget.max_tokens("LinkedIn", "curto") < budget.max_tokens("LinkedIn", "longo")
+
+
+def test_projection_scales_with_calls():
+    single = budget.projection(BODY)
+    assert single["prompt_tokens"] > 0
+    assert single["projected_cost_usd"] > 0
+    assert budget.projection(BODY, calls=3)["projected_cost_usd"] == pytest.approx(single["projected_cost_usd"] * 3)
+
+
+def test_unknown_model_has_no_cost():
+    assert budget.projection(dict(BODY, model="desconhecido/modelo"))["projected_cost_usd"] is None
+
+
+def test_generate_metadata_carries_the_projection(client, fake_upstream):
+    metadata = client.post("/generate", json={"topic": "IA no marketing"}).get_json()["metadata"]
+    assert metadata["prompt_tokens"] > 0
+    assert "projected_cost_usd" in metadata
+
+
+def test_stream_done_event_carries_the_projection(client, fake_upstream):
+    response = client.post("/generate/stream", json={"topic": "IA no marketing"})
+    done = json.loads(response.get_data(as_text=True).rsplit("event: done\ndata: ", 1)[1])
+    assert done["metadata"]["prompt_tokens"] > 0
+    assert "projected_cost_usd" in done["metadata"]
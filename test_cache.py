@@ -0,0 +1,66 @@
+"""Regras de acerto e falha do cache de respostas"""
+import pytest
+
+import cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    return now
+
+
+def completion(text, tokens=100):
+    return {"content": text, "usage": {"total_tokens": tokens}, "model": "modelo"}
+
+
+def test_cache_key_ignores_stream_fields():
+    payload = {"model": "m", "messages": [{"role": "user", "content": "x"}]}
+    assert cache.cache_key(payload) == cache.cache_key(dict(payload, stream=True, stream_options={}))
+    assert cache.cache_key(payload) != cache.cache_key(dict(payload, temperature=0.9))
+
+
+def test_response_cache_hit_miss_and_ttl(clock):
+    responses = cache.ResponseCache(max_entries=10, ttl=60)
+    assert responses.get("k") is None
+    responses.set("k", completion("a"))
+    assert responses.get("k")["content"] == "a"
+    clock[0] += 61
+    assert responses.get("k") is None
+    stats = responses.stats()
+    assert (stats["hits"], stats["misses"], stats["tokens_saved"]) == (1, 2, 100)
+
+
+def test_response_cache_lru_eviction():
+    responses = cache.ResponseCache(max_entries=2)
+    responses.set("a", completion("a"))
+    responses.set("b", completion("b"))
+    responses.get("a")
+    responses.set("c", completion("c"))
+    assert responses.get("b") is None
+    assert responses.get("a") is not None
+    assert responses.stats()["evictions"] == 1
+
+
+def test_response_cache_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache.ResponseCache(path=path).set("k", completion("a"))
+    reopened = cache.ResponseCache(path=path)
+    assert reopened.get("k")["content"] == "a"
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_warm_variants_rotate():
+    responses = cache.ResponseCache()
+    responses.set("k", {"variants": [completion("a"), completion("b")]})
+    served = [responses.get("k")["content"] for _ in range(4)]
+    assert sorted(served[:2]) == ["a", "b"]
+    assert served[:2] == served[2:]
+    assert responses.stats()["warm_hits"] == 4
+
+
+def test_bypass_flag():
+    assert cache.wants_bypass({"cache": "Bypass"})
+    assert not cache.wants_bypass({"cache": "use"})
+    assert not cache.wants_bypass(None)
@@ -0,0 +1,83 @@
+"""Single-flight: chamadas idênticas simultâneas viram uma só"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import coalesce
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    group = coalesce.SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+        return "texto"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(group.do, "k", fn) for _ in range(4)]
+        # Libera só depois que todos entraram no grupo
+        while group.stats()["requests"] < 4:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result() for future in futures]
+    assert calls == [1]
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert {result for result, _ in results} == {"texto"}
+    assert group.stats()["in_flight"] == 0
+
+
+def test_errors_reach_every_waiter():
+    group = coalesce.SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(2)
+        raise RuntimeError("falhou")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(group.do, "k", fn)
+        started.wait(2)
+        follower = pool.submit(group.do, "k", fn)
+        while group.stats()["requests"] < 2:
+            time.sleep(0.001)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError):
+                future.result()
+
+
+def test_nothing_is_kept_after_the_call():
+    group = coalesce.SingleFlight()
+    assert group.do("k", lambda: 1) == (1, False)
+    assert group.do("k", lambda: 2) == (2, False)
+
+
+def test_run_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("GENERATION_COALESCING", "0")
+    assert coalesce.run("k", lambda: 1) == (1, False)
+    assert coalesce.run(None, lambda: 2) == (2, False)
+
+
+def test_async_single_flight():
+    group = coalesce.AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "texto"
+
+    async def main():
+        return await asyncio.gather(*(group.do("k", fn) for _ in range(3)))
+
+    results = asyncio.run(main())
+    assert calls == [1]
+    assert [shared for _, shared in results] == [False, True, True]
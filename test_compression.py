@@ -0,0 +1,106 @@
+"""gzip nas respostas JSON/NDJSON e GET condicional com ETag fraco"""
+import gzip
+import importlib
+import json
+
+import pytest
+from flask import Flask, Response, jsonify
+
+import compression
+
+BIG = {"items": ["texto repetido " * 10] * 20}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(compression.blueprint)
+    app.add_url_rule("/big", "big", lambda: jsonify(BIG))
+    app.add_url_rule("/small", "small", lambda: jsonify({"ok": True}))
+    app.add_url_rule("/conditional", "conditional", lambda: compression.conditional(jsonify(BIG)))
+    app.add_url_rule("/ndjson", "ndjson", lambda: Response(
+        (json.dumps({"i": i}) + "\n" for i in range(3)), mimetype="application/x-ndjson"))
+    app.add_url_rule("/sse", "sse", lambda: Response(
+        ("data: %d\n\n" % i for i in range(3)), mimetype="text/event-stream"))
+    return app.test_client()
+
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def test_large_json_is_gzipped(client):
+    response = client.get("/big", headers=GZIP)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert json.loads(gzip.decompress(response.data)) == BIG
+
+
+def test_no_gzip_without_accept_encoding(client):
+    response = client.get("/big")
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json() == BIG
+
+
+def test_small_bodies_stay_uncompressed(client):
+    assert "Content-Encoding" not in client.get("/small", headers=GZIP).headers
+
+
+def test_compression_can_be_disabled(client, monkeypatch):
+    monkeypatch.setenv("COMPRESSION", "0")
+    assert "Content-Encoding" not in client.get("/big", headers=GZIP).headers
+
+
+def test_ndjson_stream_is_gzipped_per_chunk(client):
+    response = client.get("/ndjson", headers=GZIP)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    lines = gzip.decompress(response.data).decode().splitlines()
+    assert [json.loads(line)["i"] for line in lines] == [0, 1, 2]
+
+
+def test_sse_is_not_compressed(client):
+    response = client.get("/sse", headers=GZIP)
+    assert "Content-Encoding" not in response.headers
+
+
+def test_etag_and_not_modified(client):
+    first = client.get("/conditional")
+    etag = first.headers["ETag"]
+    assert etag.startswith("W/")
+    assert first.headers["Cache-Control"] == "no-cache"
+    second = client.get("/conditional", headers={"If-None-Match": etag})
+    assert second.status_code == 304 and second.data == b""
+
+
+def test_weak_etag_matches_gzipped_version(client):
+    etag = client.get("/conditional").headers["ETag"]
+    compressed = client.get("/conditional", headers=GZIP)
+    assert compressed.headers["ETag"] == etag
+    assert client.get("/conditional", headers=dict(GZIP, **{"If-None-Match": etag})).status_code == 304
+
+
+def test_stale_etag_gets_full_body(client):
+    response = client.get("/conditional", headers={"If-None-Match": 'W/"outro"'})
+    assert response.status_code == 200 and response.get_json() == BIG
+
+
+def test_etag_helpers():
+    etag = compression.weak_etag(b"corpo")
+    assert compression.etag_matches(f'W/"{etag}"', etag)
+    assert compression.etag_matches(f'"x", W/"{etag}"', etag)
+    assert not compression.etag_matches(None, etag)
+    assert compression.accepts_gzip("br, gzip;q=0.5")
+    assert not compression.accepts_gzip("gzip;q=0")
+
+
+def test_templates_endpoint_is_conditional(monkeypatch, tmp_path):
+    monkeypatch.setenv("HISTORY_DB_PATH", str(tmp_path / "history.db"))
+    monkeypatch.setenv("JOBS_DB_PATH", str(tmp_path / "jobs.db"))
+    # O corpo de /templates fica perto do mínimo padrão (1024 bytes)
+    monkeypatch.setenv("COMPRESSION_MIN_SIZE", "256")
+    app = importlib.import_module("app-simply").create_app({"TESTING": True})
+    client = app.test_client()
+    first = client.get("/templates", headers=GZIP)
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(first.data))["templates"]
+    assert client.get("/templates", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
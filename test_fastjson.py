@@ -0,0 +1,35 @@
+"""Serialização JSON: bytes UTF-8 compactos, com ou sem orjson"""
+import datetime
+
+import fastjson
+from conftest import FakeResponse
+
+
+def test_dumps_is_compact_utf8():
+    assert fastjson.dumps({"tópico": "IA", "n": [1, 2]}) == '{"tópico":"IA","n":[1,2]}'.encode("utf-8")
+
+
+def test_unknown_types_fall_back_to_str():
+    assert fastjson.loads(fastjson.dumps({"quando": datetime.date(2024, 1, 2)})) == {"quando": "2024-01-02"}
+
+
+def test_roundtrip_from_bytes():
+    assert fastjson.loads('{"texto":"ação"}'.encode("utf-8")) == {"texto": "ação"}
+
+
+def test_parse_response_reads_the_body_once():
+    assert fastjson.parse_response(FakeResponse(200, {"ok": True})) == {"ok": True}
+
+
+def test_parse_response_ignores_non_json():
+    class Html:
+        content = b"<html>502 Bad Gateway</html>"
+
+    assert fastjson.parse_response(Html()) is None
+
+
+def test_jsonify_goes_through_the_provider(client):
+    response = client.get("/health")
+    assert response.mimetype == "application/json"
+    assert response.get_data().endswith(b"\n")
+    assert isinstance(client.application.json, fastjson.JSONProvider)
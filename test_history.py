@@ -0,0 +1,84 @@
+"""Histórico no servidor: gravação em lote, paginação por cursor, busca e isolamento por sessão"""
+import json
+
+import pytest
+
+import history
+
+
+@pytest.fixture
+def store(tmp_path):
+    return history.HistoryStore(str(tmp_path / "history.db"), flush_interval=0.01)
+
+
+def add(store, session_id, topic, platform="LinkedIn", tone="Profissional", article=None):
+    store.add(session_id, platform, tone, "medio", topic, article or f"Texto sobre {topic}", tokens_used=10)
+
+
+def test_list_pages_newest_first(store):
+    for i in range(5):
+        add(store, "s1", f"tema {i}")
+    store.flush()
+    page, cursor = store.list("s1", limit=2)
+    assert [item["topic"] for item in page] == ["tema 4", "tema 3"]
+    page, cursor = store.list("s1", cursor=cursor, limit=2)
+    assert [item["topic"] for item in page] == ["tema 2", "tema 1"]
+    page, cursor = store.list("s1", cursor=cursor, limit=2)
+    assert [item["topic"] for item in page] == ["tema 0"] and cursor is None
+
+
+def test_filters_and_search(store):
+    add(store, "s1", "IA no marketing", platform="Instagram")
+    add(store, "s1", "Vendas B2B", tone="Técnico", article="Funil de vendas com dados")
+    store.flush()
+    assert [item["topic"] for item in store.list("s1", platform="Instagram")[0]] == ["IA no marketing"]
+    assert [item["topic"] for item in store.list("s1", tone="Técnico")[0]] == ["Vendas B2B"]
+    assert [item["topic"] for item in store.list("s1", query="funil")[0]] == ["Vendas B2B"]
+    # Operadores da busca vêm como texto, não como sintaxe FTS
+    assert store.list("s1", query='"OR marketing')[0] == []
+
+
+def test_sessions_are_isolated(store):
+    add(store, "s1", "meu tema")
+    store.flush()
+    item_id = store.list("s1")[0][0]["id"]
+    assert store.list("s2")[0] == []
+    assert store.get("s2", item_id) is None
+    assert store.delete("s2", item_id) == 0
+    assert store.get("s1", item_id)["article"] == "Texto sobre meu tema"
+
+
+def test_delete_item_and_session(store):
+    for i in range(3):
+        add(store, "s1", f"tema {i}")
+    store.flush()
+    first = store.list("s1")[0][-1]["id"]
+    assert store.delete("s1", first) == 1
+    assert store.delete("s1") == 2
+    assert store.list("s1")[0] == []
+
+
+def test_export_yields_bounded_batches(store):
+    for i in range(5):
+        add(store, "s1", f"tema {i}")
+    store.flush()
+    batches = list(store.iter_items("s1", batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0][0]["article"] == "Texto sobre tema 4"
+
+
+def test_invalid_page_size_is_a_bad_request(client):
+    assert client.get("/history?limit=abc").status_code == 400
+
+
+def test_generation_is_recorded_for_the_session(client, fake_upstream):
+    client.post("/generate", json={"topic": "IA no marketing"})
+    history.get_store().flush()
+    items = client.get("/history").get_json()["history"]
+    assert [item["topic"] for item in items] == ["IA no marketing"]
+    exported = client.get("/history/export").get_data(as_text=True).splitlines()
+    assert json.loads(exported[0])["article"]
+    # Outra sessão (sem o cookie) não vê o item
+    other = client.application.test_client()
+    assert other.get("/history").get_json()["history"] == []
+    assert other.get(f"/history/{items[0]['id']}").status_code == 404
@@ -0,0 +1,120 @@
+"""Lista de hosts permitidos e bloqueio de destinos internos nos callbacks de jobs"""
+import socket
+
+import pytest
+from flask import Flask
+
+import jobs
+
+
+def resolving_to(*addresses):
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET6 if ":" in address else socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, 0))
+                for address in addresses]
+    return getaddrinfo
+
+
+def test_callbacks_denied_without_allowlist(monkeypatch):
+    monkeypatch.delenv("JOBS_CALLBACK_HOSTS", raising=False)
+    assert not jobs.callback_allowed("https://example.com/hook")
+
+
+def test_callbacks_follow_allowlist(monkeypatch):
+    monkeypatch.setenv("JOBS_CALLBACK_HOSTS", "hooks.example.com, Outro.example.com")
+    assert jobs.callback_allowed("https://hooks.example.com/x")
+    assert jobs.callback_allowed("http://outro.example.com/x")
+    assert not jobs.callback_allowed("https://evil.example.com/x")
+    assert not jobs.callback_allowed("ftp://hooks.example.com/x")
+    assert not jobs.callback_allowed("https:///sem-host")
+
+
+@pytest.mark.parametrize("address", [
+    "127.0.0.1", "10.0.0.5", "172.16.1.1", "192.168.0.10", "169.254.169.254",
+    "0.0.0.0", "::1", "fe80::1", "fc00::1", "::ffff:127.0.0.1"
+])
+def test_internal_addresses_are_refused(monkeypatch, address):
+    monkeypatch.setattr(jobs.socket, "getaddrinfo", resolving_to(address))
+    assert not jobs.public_host("hooks.example.com")
+
+
+def test_any_internal_address_refuses_the_host(monkeypatch):
+    monkeypatch.setattr(jobs.socket, "getaddrinfo", resolving_to("93.184.216.34", "10.0.0.1"))
+    assert not jobs.public_host("hooks.example.com")
+
+
+def test_public_address_is_accepted(monkeypatch):
+    monkeypatch.setattr(jobs.socket, "getaddrinfo", resolving_to("93.184.216.34"))
+    assert jobs.public_host("hooks.example.com")
+
+
+def test_unresolvable_host_is_refused(monkeypatch):
+    def fail(*args, **kwargs):
+        raise socket.gaierror("sem DNS")
+    monkeypatch.setattr(jobs.socket, "getaddrinfo", fail)
+    assert not jobs.public_host("hooks.example.com")
+
+
+def make_queue(tmp_path):
+    store = jobs.JobStore(str(tmp_path / "jobs.db"))
+    return jobs.JobQueue(store, jobs.MemoryBroker(), lambda spec, sid: ({}, 200), lambda data: (data, None),
+                         ["LinkedIn"])
+
+
+def test_submit_rejects_callback_outside_allowlist(monkeypatch, tmp_path):
+    monkeypatch.delenv("JOBS_CALLBACK_HOSTS", raising=False)
+    queue = make_queue(tmp_path)
+    job_id, error = queue.submit({"topic": "x", "callback_url": "http://127.0.0.1/hook"}, "sessao")
+    assert job_id is None and "callback_url" in error
+
+
+def test_delivery_refuses_internal_destination(monkeypatch, tmp_path):
+    monkeypatch.setenv("JOBS_CALLBACK_HOSTS", "hooks.example.com")
+    monkeypatch.setattr(jobs.socket, "getaddrinfo", resolving_to("10.0.0.1"))
+    posted = []
+    monkeypatch.setattr(jobs.requests, "post", lambda *args, **kwargs: posted.append(args))
+    queue = make_queue(tmp_path)
+    job_id, error = queue.submit({"topic": "x", "callback_url": "https://hooks.example.com/x"}, "sessao")
+    assert error is None
+    queue._deliver(job_id, "https://hooks.example.com/x")
+    assert posted == []
+    assert queue.store.get(job_id)["callback_status"] == "failed"
+
+
+def test_delivery_does_not_sleep_after_last_attempt(monkeypatch, tmp_path):
+    monkeypatch.setenv("JOBS_CALLBACK_HOSTS", "hooks.example.com")
+    monkeypatch.setattr(jobs.socket, "getaddrinfo", resolving_to("93.184.216.34"))
+
+    def fail(*args, **kwargs):
+        raise jobs.requests.exceptions.ConnectionError("recusado")
+    monkeypatch.setattr(jobs.requests, "post", fail)
+    sleeps = []
+    monkeypatch.setattr(jobs.time, "sleep", sleeps.append)
+    queue = make_queue(tmp_path)
+    job_id, _ = queue.submit({"topic": "x", "callback_url": "https://hooks.example.com/x"}, "sessao")
+    queue._deliver(job_id, "https://hooks.example.com/x")
+    assert sleeps == [2 ** attempt for attempt in range(jobs.CALLBACK_ATTEMPTS - 1)]
+    assert queue.store.get(job_id)["callback_status"] == "failed"
+
+
+@pytest.fixture
+def tenant_client(monkeypatch, tmp_path):
+    monkeypatch.setenv("TENANTS", "1")
+    monkeypatch.setenv("TENANTS_ADMIN_KEY", "admin")
+    registry = jobs.tenants.TenantRegistry(str(tmp_path / "tenants.db"))
+    monkeypatch.setattr(jobs.tenants, "_registry", registry)
+    queue = make_queue(tmp_path)
+    monkeypatch.setattr(jobs, "_queue", queue)
+    app = Flask(__name__)
+    app.register_blueprint(jobs.blueprint)
+    return app.test_client(), registry, queue
+
+
+def test_job_is_visible_only_to_its_tenant(tenant_client):
+    client, registry, queue = tenant_client
+    owner_id, owner_key = registry.create("dono")
+    _, other_key = registry.create("outro")
+    job_id = queue.store.create("sessao", "generate", {"topic": "x"}, tenant_id=owner_id)
+    assert client.get(f"/jobs/{job_id}", headers={"X-API-Key": owner_key}).status_code == 200
+    assert client.get(f"/jobs/{job_id}", headers={"X-API-Key": other_key}).status_code == 404
+    assert client.get(f"/jobs/{job_id}").status_code == 404
+    assert client.get(f"/jobs/{job_id}", headers={"X-API-Key": "admin"}).status_code == 200
@@ -0,0 +1,101 @@
+"""Token bucket de entrada, identificação do cliente e ajuste AIMD de saída"""
+import pytest
+from flask import Flask
+
+import limits
+
+
+class FakeTenant:
+    id = "t1"
+
+
+def test_bucket_allows_burst_then_limits():
+    limiter = limits.RateLimiter(per_minute=60, burst=3)
+    results = [limiter.allow("ip:1.2.3.4") for _ in range(4)]
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    # 1 token por segundo: o próximo sai em até 1s
+    assert 0 < results[-1][1] <= 1
+
+
+def test_bucket_refills_over_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(limits.time, "monotonic", lambda: now[0])
+    bucket = limits.TokenBucket(rate=1, burst=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() > 0
+    now[0] += 1.5
+    assert bucket.take() == 0
+
+
+def test_buckets_are_per_client():
+    limiter = limits.RateLimiter(per_minute=60, burst=1)
+    assert limiter.allow("ip:a")[0]
+    assert not limiter.allow("ip:a")[0]
+    assert limiter.allow("ip:b")[0]
+
+
+def test_disabled_limiter_allows_everything():
+    limiter = limits.RateLimiter(per_minute=0, burst=1)
+    assert all(limiter.allow("ip:a")[0] for _ in range(10))
+
+
+def test_lru_drops_least_recent_client():
+    limiter = limits.RateLimiter(per_minute=60, burst=1, max_clients=2)
+    limiter.allow("ip:a")
+    limiter.allow("ip:b")
+    limiter.allow("ip:c")
+    assert limiter.stats()["clients"] == 2
+    # "a" saiu do LRU: volta com o bucket cheio
+    assert limiter.allow("ip:a")[0]
+
+
+def test_client_key_ignores_unverified_api_keys():
+    # Chave enviada mas não conferida: conta o IP, não abre bucket novo
+    assert limits.client_key("1.2.3.4") == "ip:1.2.3.4"
+    assert limits.client_key("1.2.3.4", FakeTenant()) == "tenant:t1"
+
+
+def test_rotating_keys_share_the_ip_bucket(monkeypatch):
+    monkeypatch.setattr(limits, "_rate_limiter", limits.RateLimiter(per_minute=60, burst=2))
+    app = Flask(__name__)
+    app.register_blueprint(limits.blueprint)
+    app.add_url_rule("/generate", "generate", lambda: "ok", methods=["POST"])
+    client = app.test_client()
+    statuses = [client.post("/generate", headers={"X-API-Key": key}).status_code for key in ("k1", "k2", "k3")]
+    assert statuses == [200, 200, 429]
+
+
+def test_api_key_headers():
+    assert limits.api_key({"X-API-Key": "abc"}) == "abc"
+    assert limits.api_key({"Authorization": "Bearer xyz "}) == "xyz"
+    assert limits.api_key({"Authorization": "Basic xyz"}) is None
+
+
+def test_aimd_backs_off_on_overload():
+    limiter = limits.AdaptiveLimiter(initial=10, maximum=20, cooldown=0)
+    limiter.acquire()
+    limiter.release(0.1, overloaded=True)
+    assert limiter.limit == 7
+
+
+def test_aimd_ignores_uncounted_responses():
+    limiter = limits.AdaptiveLimiter(initial=1, maximum=20)
+    limiter.acquire()
+    limiter.release(0.1, overloaded=False, counted=False)
+    assert limiter.limit == 1
+    assert limiter.samples == 0 and limiter.latency is None
+
+
+def test_aimd_grows_when_saturated():
+    limiter = limits.AdaptiveLimiter(initial=1, maximum=20)
+    limiter.acquire()
+    limiter.release(0.1)
+    assert limiter.limit == 2
+
+
+def test_aimd_rejects_when_queue_is_full():
+    limiter = limits.AdaptiveLimiter(initial=1, maximum=1, max_queue=0)
+    limiter.acquire()
+    with pytest.raises(limits.Overloaded):
+        limiter.acquire()
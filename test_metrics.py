@@ -0,0 +1,63 @@
+"""Métricas Prometheus: formato texto, etapas do pipeline e rótulos limitados"""
+import metrics
+
+
+def test_counter_and_labels_render():
+    counter = metrics.Counter("c_total", "Ajuda", ("status",))
+    counter.labels(status=200).inc()
+    counter.labels(status=200).inc(2)
+    counter.labels(status='a"b').inc()
+    assert counter.render() == ["# HELP c_total Ajuda", "# TYPE c_total counter",
+                                'c_total{status="200"} 3', 'c_total{status="a\\"b"} 1']
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("h_seconds", "Ajuda", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+    lines = histogram.render()[2:]
+    assert lines == ['h_seconds_bucket{le="0.1"} 1', 'h_seconds_bucket{le="1"} 2', 'h_seconds_bucket{le="+Inf"} 3',
+                     "h_seconds_sum 5.55", "h_seconds_count 3"]
+
+
+def test_gauge_function_is_read_at_collection():
+    gauge = metrics.Gauge("g", "Ajuda", ("client",))
+    state = {"value": 1}
+    gauge.set_function(lambda: state["value"], client="sync")
+    state["value"] = 7
+    assert gauge.render()[-1] == 'g{client="sync"} 7'
+
+
+def test_stage_observes_the_block():
+    child = metrics.STAGE_SECONDS.labels(stage="teste")
+    before = child.count
+    with metrics.stage("teste"):
+        pass
+    assert child.count == before + 1
+
+
+def test_bounded_labels():
+    assert metrics.bounded("LinkedIn", {"LinkedIn": 1}) == "LinkedIn"
+    assert metrics.bounded("qualquer coisa", {"LinkedIn": 1}) == "other"
+
+
+def test_usage_and_prompt_cache_tokens():
+    usage = {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120,
+             "prompt_tokens_details": {"cached_tokens": 80}}
+    cached = metrics.TOKENS.labels(model="teste/metricas", kind="cached")
+    before = cached.value
+    metrics.record_usage("teste/metricas", usage)
+    assert cached.value == before + 80
+    assert metrics.cached_tokens(usage) == 80 and metrics.cached_tokens(None) == 0
+
+
+def test_metrics_endpoint_after_a_generation(client, fake_upstream):
+    client.post("/generate", json={"topic": "IA no marketing", "platform": "Plataforma inventada"})
+    response = client.get("/metrics")
+    assert response.content_type == metrics.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    for stage in ("validation", "prompt_build", "serialization"):
+        assert f'generation_stage_seconds_count{{stage="{stage}"}}' in text
+    # Plataforma fora da lista não vira série nova
+    assert 'platform="Plataforma inventada"' not in text
+    assert 'http_requests_total{endpoint="/generate",method="POST",status=' in text
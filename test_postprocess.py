@@ -0,0 +1,71 @@
+"""Pós-processamento: hashtags, limite de caracteres e divisão em thread"""
+import postprocess
+
+
+def test_keyword_hashtags():
+    assert postprocess.keyword_hashtags("#IA, marketing digital; dados") == ["#IA", "#MarketingDigital", "#dados"]
+    assert postprocess.keyword_hashtags(None) == []
+
+
+def test_hashtags_are_deduplicated_and_merged_with_keywords():
+    post = postprocess.process("Texto sobre IA.\n\n#ia #Marketing #IA", "LinkedIn", "IA, dados")
+    assert post["article"] == "Texto sobre IA.\n\n#IA #dados #Marketing"
+    assert "hashtags_deduplicated" in post["fixes"] and "keywords_merged" in post["fixes"]
+
+
+def test_hashtag_block_is_capped_to_the_platform_range():
+    tags = " ".join(f"#tag{i}" for i in range(8))
+    post = postprocess.process(f"Texto.\n\n{tags}", "Facebook")
+    assert post["hashtags"] == ["#tag0", "#tag1", "#tag2"]
+    assert "hashtags_limited" in post["fixes"]
+
+
+def test_inline_hashtags_stay_in_place():
+    post = postprocess.process("Falando de #IA hoje.\n\n#IA #dados", "LinkedIn")
+    assert post["article"] == "Falando de #IA hoje.\n\n#dados"
+    assert post["hashtags"] == ["#IA", "#dados"]
+
+
+def test_long_post_is_trimmed_at_a_sentence_keeping_hashtags():
+    body = "Uma frase completa sobre o tema. " * 100
+    post = postprocess.process(body + "\n\n#IA", "Instagram")
+    assert len(post["article"]) <= 2200
+    assert post["article"].endswith(".\n\n#IA")
+    assert "trimmed" in post["fixes"]
+    assert post["original_characters"] == len(body + "\n\n#IA")
+
+
+def test_short_post_is_untouched():
+    post = postprocess.process("Post curto.\n\n#IA #dados #marketing", "LinkedIn")
+    assert post["article"] == "Post curto.\n\n#IA #dados #marketing"
+    assert post["fixes"] == []
+
+
+def test_thread_follows_model_markers():
+    text = "**Tweet 1:** Gancho forte.\n**Tweet 2:** Um dado.\n**Tweet 3:** Conclusão. #IA #dados"
+    post = postprocess.process(text, "Twitter/X")
+    assert post["tweets"] == ["Gancho forte. 1/3", "Um dado. 2/3", "Conclusão.\n\n#IA #dados 3/3"]
+    assert "markdown_removed" in post["fixes"] and "thread_split" in post["fixes"]
+
+
+def test_long_thread_is_split_within_tweet_limit():
+    text = " ".join(f"Frase número {i} com algum conteúdo." for i in range(30))
+    tweets = postprocess.process(text, "Twitter/X")["tweets"]
+    assert len(tweets) > 1
+    assert all(len(tweet) <= postprocess.TWEET_CHARS for tweet in tweets)
+    assert tweets[-1].endswith(f"{len(tweets)}/{len(tweets)}")
+
+
+def test_generate_returns_the_processed_post(client, fake_upstream):
+    fake_upstream.texts = ["Post sobre IA.\n\n#IA #ia"]
+    body = client.post("/generate", json={"topic": "IA no marketing", "keywords": "dados"}).get_json()
+    assert body["article"] == "Post sobre IA.\n\n#dados #IA"
+    assert body["post"]["hashtags"] == ["#dados", "#IA"]
+
+
+def test_postprocess_can_be_turned_off(client, fake_upstream, monkeypatch):
+    monkeypatch.setenv("POSTPROCESS", "0")
+    fake_upstream.texts = ["Post sobre IA.\n\n#IA #ia"]
+    body = client.post("/generate", json={"topic": "IA no marketing"}).get_json()
+    assert body["article"] == "Post sobre IA.\n\n#IA #ia"
+    assert "post" not in body
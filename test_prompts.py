@@ -0,0 +1,98 @@
+"""Templates de prompt compilados: normalização, campos e catálogo"""
+import prompts
+
+
+def layout(platform, tone, length):
+    return f"""
+        Plataforma: {platform}
+
+            Tom: {tone} ({length})
+
+
+        Tema: {{topic}} com 100% de {{keywords}}
+    """
+
+
+def catalog(**kwargs):
+    return prompts.PromptCatalog(layout, ["LinkedIn", "Instagram"], ["Profissional"], ["curto", "longo"], **kwargs)
+
+
+def test_template_is_normalized_and_filled():
+    template = prompts.PromptTemplate(layout("LinkedIn", "Profissional", "curto"))
+    assert template.text == "Plataforma: LinkedIn\n\nTom: Profissional (curto)\n\nTema: {topic} com 100% de {keywords}"
+    assert template.slots == ("topic", "keywords")
+    assert template.render(topic="IA", keywords="dados").endswith("Tema: IA com 100% de dados")
+    assert template.token_count > 0
+
+
+def test_missing_fields_stay_literal():
+    template = prompts.PromptTemplate("Tom {tone}: {topic}")
+    assert template.render(topic="IA") == "Tom {tone}: IA"
+
+
+def test_catalog_keeps_known_combinations_only():
+    templates = catalog()
+    assert templates.get("LinkedIn", "Profissional", "curto") is templates.get("LinkedIn", "Profissional", "curto")
+    assert templates.get("LinkedIn", "Livre", "curto") is not templates.get("LinkedIn", "Livre", "curto")
+    assert templates.stats()["compiled"] == 1
+
+
+def test_eager_catalog_compiles_everything():
+    stats = catalog(eager=True).stats()
+    assert stats["compiled"] == stats["combinations"] == 4
+
+
+def fresh_catalog(app_module, monkeypatch):
+    fresh = prompts.PromptCatalog(app_module.prompt_layout, ["LinkedIn"], ["Profissional"], ["curto"])
+    monkeypatch.setattr(app_module, "PROMPT_CATALOG", fresh)
+    monkeypatch.setattr(app_module, "PROMPT_LAYOUT", "classic")
+    return fresh
+
+
+def test_create_app_precompiles_the_catalog(app_module, monkeypatch):
+    monkeypatch.delenv("PROMPT_PRECOMPILE", raising=False)
+    fresh = fresh_catalog(app_module, monkeypatch)
+    app_module.create_app({"TESTING": True})
+    assert fresh.stats()["compiled"] == 1
+
+
+def test_precompile_can_be_turned_off(app_module, monkeypatch):
+    monkeypatch.setenv("PROMPT_PRECOMPILE", "0")
+    fresh = fresh_catalog(app_module, monkeypatch)
+    app_module.create_app({"TESTING": True})
+    assert fresh.stats()["compiled"] == 0
+
+
+def test_wants_cache_control():
+    assert prompts.wants_cache_control("anthropic/claude-3.5-haiku")
+    assert prompts.wants_cache_control("google/gemini-2.0-flash-001")
+    assert not prompts.wants_cache_control("openai/gpt-4o-mini")
+
+
+def test_system_message_with_cache_control():
+    template = prompts.PromptTemplate("Regras fixas")
+    assert template.system_message() == {"role": "system", "content": "Regras fixas"}
+    marked = template.system_message(cache_control=True)["content"]
+    assert marked == [{"type": "text", "text": "Regras fixas", "cache_control": {"type": "ephemeral"}}]
+    assert template.system_message(True) is template.system_message(True)
+
+
+def test_prefix_layout_keeps_the_system_message_identical(client, app_module, fake_upstream, monkeypatch):
+    monkeypatch.setattr(app_module, "PROMPT_LAYOUT", "prefix")
+    monkeypatch.setattr(app_module, "PREFIX_CACHE_CONTROL", False)
+    for topic in ("IA no marketing", "Vendas B2B"):
+        client.post("/generate", json={"topic": topic, "keywords": "dados", "platform": "Instagram"})
+    first, second = (body["messages"] for body in fake_upstream.calls)
+    assert first[0] == second[0] and isinstance(first[0]["content"], str)
+    # Tema e palavras-chave só na mensagem do usuário, por último
+    assert "IA no marketing" not in first[0]["content"]
+    assert "IA no marketing" in first[-1]["content"] and "dados" in first[-1]["content"]
+    assert client.get("/stats").get_json()["prompt_cache"]["layout"] == "prefix"
+
+
+def test_prefix_layout_marks_cache_control(client, app_module, fake_upstream, monkeypatch):
+    monkeypatch.setattr(app_module, "PROMPT_LAYOUT", "prefix")
+    monkeypatch.setattr(app_module, "PREFIX_CACHE_CONTROL", True)
+    client.post("/generate", json={"topic": "IA no marketing"})
+    system = fake_upstream.calls[0]["messages"][0]
+    assert system["content"][0]["cache_control"] == {"type": "ephemeral"}
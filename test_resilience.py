@@ -0,0 +1,177 @@
+"""Circuit breaker e o que conta como falha ou sucesso do provedor"""
+import asyncio
+
+import pytest
+
+import resilience
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+        self.content = b""
+
+    def close(self):
+        pass
+
+
+class FakeClient:
+    """Responde com os códigos da lista, em ordem"""
+
+    def __init__(self, *codes):
+        self.codes = list(codes)
+        self.calls = []
+
+    def chat_completion(self, body, headers=None, stream=False):
+        self.calls.append(body["model"])
+        return FakeResponse(self.codes.pop(0))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def upstream_for(client, **kwargs):
+    kwargs.setdefault("fallback_models", [])
+    kwargs.setdefault("hedge", False)
+    return resilience.ResilientUpstream(client, max_retries=kwargs.pop("max_retries", 0), backoff_base=0,
+                                        **kwargs)
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = resilience.CircuitBreaker(threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.retry_in() == 30
+
+
+def test_breaker_half_open_allows_one_trial(clock):
+    breaker = resilience.CircuitBreaker(threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_breaker_trial_success_closes(clock):
+    breaker = resilience.CircuitBreaker(threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_breaker_trial_failure_reopens(clock):
+    breaker = resilience.CircuitBreaker(threshold=5, reset_timeout=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock[0] += 30
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_breaker_ignored_response_frees_trial(clock):
+    breaker = resilience.CircuitBreaker(threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    breaker.allow()
+    breaker.record_ignored()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_overload_and_server_errors_are_failures(status):
+    client = FakeClient(status)
+    upstream = upstream_for(client)
+    assert upstream.chat_completion({"model": "m"}).status_code == status
+    assert upstream.breaker("m").failures == 1
+
+
+@pytest.mark.parametrize("status", [400, 401, 404])
+def test_client_errors_are_not_successes(status):
+    client = FakeClient(500, status)
+    upstream = upstream_for(client, max_retries=1)
+    assert upstream.chat_completion({"model": "m"}).status_code == status
+    # A falha anterior continua contada: um 4xx não fecha o circuito
+    assert upstream.breaker("m").failures == 1
+    assert len(upstream.latencies._samples) == 0
+
+
+def test_client_errors_are_not_retried():
+    client = FakeClient(400, 200)
+    upstream = upstream_for(client, max_retries=2)
+    assert upstream.chat_completion({"model": "m"}).status_code == 400
+    assert len(client.calls) == 1
+
+
+def test_success_resets_failures():
+    client = FakeClient(500, 200)
+    upstream = upstream_for(client, max_retries=1)
+    assert upstream.chat_completion({"model": "m"}).status_code == 200
+    assert upstream.breaker("m").failures == 0
+
+
+def test_failover_skips_open_circuit():
+    client = FakeClient(200)
+    upstream = upstream_for(client, fallback_models=["reserva"], breaker_threshold=1)
+    upstream.breaker("m").record_failure()
+    assert upstream.chat_completion({"model": "m"}).status_code == 200
+    assert client.calls == ["reserva"]
+
+
+def test_all_circuits_open_raises():
+    upstream = upstream_for(FakeClient(), breaker_threshold=1)
+    upstream.breaker("m").record_failure()
+    with pytest.raises(resilience.CircuitOpen):
+        upstream.chat_completion({"model": "m"})
+
+
+def test_half_open_trial_is_a_single_attempt(clock):
+    client = FakeClient(500, 200)
+    upstream = upstream_for(client, fallback_models=["reserva"], max_retries=2, breaker_threshold=1,
+                            breaker_reset=30)
+    upstream.breaker("m").record_failure()
+    clock[0] += 30
+    assert upstream.chat_completion({"model": "m"}).status_code == 200
+    # Uma chamada de teste em "m", sem retentativa; depois o modelo reserva
+    assert client.calls == ["m", "reserva"]
+    assert upstream.breaker("m").state == "open"
+
+
+def test_half_open_trial_skips_hedge(clock, monkeypatch):
+    upstream = upstream_for(FakeClient(200), hedge=True, breaker_threshold=1, breaker_reset=30)
+    asked = []
+    monkeypatch.setattr(upstream, "hedge_delay", lambda stream: asked.append(stream))
+    upstream.breaker("m").record_failure()
+    clock[0] += 30
+    assert upstream.chat_completion({"model": "m"}).status_code == 200
+    assert asked == []
+    assert upstream.breaker("m").state == "closed"
+
+
+def test_async_half_open_trial_is_a_single_attempt(clock):
+    pytest.importorskip("httpx")
+
+    class AsyncClient(FakeClient):
+        async def chat_completion(self, body, headers=None):
+            return FakeClient.chat_completion(self, body)
+
+    client = AsyncClient(500, 200)
+    upstream = resilience.AsyncResilientUpstream(client, fallback_models=["reserva"], max_retries=2,
+                                                 backoff_base=0, hedge=False, breaker_threshold=1,
+                                                 breaker_reset=30)
+    upstream.breaker("m").record_failure()
+    clock[0] += 30
+    assert asyncio.run(upstream.chat_completion({"model": "m"})).status_code == 200
+    assert client.calls == ["m", "reserva"]
@@ -0,0 +1,93 @@
+"""Cache semântico: temas parecidos acertam; negações, números e entradas vencidas não"""
+import pytest
+
+import semantic
+
+PARTITION = ("LinkedIn", "Profissional", "medio", "modelo")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic.time, "time", lambda: now[0])
+    return now
+
+
+def completion(text):
+    return {"content": text, "usage": {"total_tokens": 100}, "model": "modelo"}
+
+
+def test_semantic_hit_for_similar_topic():
+    semantic_cache = semantic.SemanticCache()
+    semantic_cache.add(PARTITION, "IA no marketing", completion("texto"))
+    match = semantic_cache.lookup(PARTITION, "Inteligência Artificial no Marketing Digital")
+    assert match is not None
+    value, similarity, original = match
+    assert value["content"] == "texto" and original == "IA no marketing"
+    assert similarity >= semantic_cache.threshold
+
+
+def test_semantic_partitions_are_isolated():
+    semantic_cache = semantic.SemanticCache()
+    semantic_cache.add(PARTITION, "IA no marketing", completion("texto"))
+    assert semantic_cache.lookup(("Instagram",) + PARTITION[1:], "IA no marketing") is None
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("Como usar IA no RH", "Como não usar IA no RH"),
+    ("Marketing com IA", "Marketing sem IA"),
+    ("10 dicas de vendas", "3 dicas de vendas"),
+])
+def test_semantic_requires_same_negations_and_numbers(stored, asked):
+    semantic_cache = semantic.SemanticCache(threshold=0.5)
+    semantic_cache.add(PARTITION, stored, completion("texto"))
+    assert semantic_cache.lookup(PARTITION, asked) is None
+    assert semantic_cache.lookup(PARTITION, stored) is not None
+
+
+def test_semantic_below_threshold_is_a_miss():
+    semantic_cache = semantic.SemanticCache()
+    semantic_cache.add(PARTITION, "IA no marketing", completion("texto"))
+    assert semantic_cache.lookup(PARTITION, "Receitas de bolo de cenoura") is None
+    assert semantic_cache.stats()["misses"] == 1
+
+
+def test_semantic_expired_nearest_falls_through_to_next(clock):
+    semantic_cache = semantic.SemanticCache(ttl=60)
+    semantic_cache.add(PARTITION, "IA no marketing", completion("antigo"))
+    clock[0] += 30
+    semantic_cache.add(PARTITION, "IA no marketing digital", completion("novo"))
+    clock[0] += 40
+    # A mais parecida ("IA no marketing") venceu: vale a seguinte
+    value, _, original = semantic_cache.lookup(PARTITION, "IA no marketing")
+    assert value["content"] == "novo" and original == "IA no marketing digital"
+    stats = semantic_cache.stats()
+    assert (stats["expired"], stats["hits"], stats["size"]) == (1, 1, 1)
+
+
+def test_semantic_lru_eviction():
+    semantic_cache = semantic.SemanticCache(max_entries=1)
+    semantic_cache.add(PARTITION, "IA no marketing", completion("a"))
+    semantic_cache.add(PARTITION, "Vendas no varejo", completion("b"))
+    assert semantic_cache.lookup(PARTITION, "IA no marketing") is None
+    assert semantic_cache.stats()["evictions"] == 1
+
+
+@pytest.mark.skipif(semantic.numpy is None, reason="numpy não instalado")
+def test_matrix_grows_without_rebuild_and_matches_sparse_scan():
+    partition = semantic.Partition(64)
+    topics = [f"tema {i} sobre marketing digital" for i in range(40)]
+    for topic in topics:
+        partition.put(topic, (0, semantic.embed(topic, 64), topic, None, None))
+    matrix = partition._matrix
+    partition.put("extra", (0, semantic.embed("extra", 64), "extra", None, None))
+    assert partition._matrix is matrix
+    for topic in topics[::3]:
+        partition.remove(topic)
+    # Substituir uma entrada reaproveita a linha
+    partition.put(topics[1], (0, semantic.embed("outro assunto", 64), topics[1], None, None))
+    query = semantic.embed("tema 7 sobre marketing", 64)
+    expected = {key: round(semantic.dot(query, entry[1]), 4) for key, entry in partition.entries.items()}
+    found = partition.nearest(query, 0.0)
+    assert {key: round(value, 4) for key, value in found} == expected
+    assert [value for _, value in found] == sorted((value for _, value in found), reverse=True)
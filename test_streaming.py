@@ -0,0 +1,49 @@
+"""/generate/stream: eventos SSE e erros no contrato JSON de /generate"""
+import json
+
+import pytest
+
+TOPIC = {"topic": "IA no marketing", "platform": "LinkedIn"}
+
+
+def sse_events(response):
+    """Lista de (evento, dados) de um corpo text/event-stream"""
+    events = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+
+@pytest.mark.parametrize("path", ["/generate", "/generate/stream"])
+def test_malformed_json_is_a_bad_request(client, path):
+    response = client.post(path, data="{nao é json", content_type="application/json")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Nenhum dado recebido"
+
+
+def test_invalid_request_is_rejected_before_streaming(client, fake_upstream):
+    response = client.post("/generate/stream", json={"platform": "LinkedIn"})
+    assert response.status_code == 400
+    assert fake_upstream.calls == []
+
+
+def test_stream_sends_deltas_then_done(client, fake_upstream):
+    response = client.post("/generate/stream", json=TOPIC)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = sse_events(response)
+    deltas = [data["content"] for event, data in events if event == "message"]
+    assert "".join(deltas) == fake_upstream.texts[0]
+    event, done = events[-1]
+    assert event == "done"
+    assert done["article"].startswith("Post sobre IA no marketing.")
+    assert done["metadata"]["platform"] == "LinkedIn"
+    assert fake_upstream.calls[0]["stream"] is True
+
+
+def test_upstream_error_before_first_byte_is_json(client, fake_upstream):
+    fake_upstream.status_code = 401
+    response = client.post("/generate/stream", json=TOPIC)
+    assert response.status_code == 500
+    assert "recusado" in response.get_json()["error"]
@@ -0,0 +1,118 @@
+"""Cotas e vagas dos tenants: contadas por geração (chamada à OpenRouter)"""
+import threading
+
+import pytest
+
+import tenants
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return tenants.TenantRegistry(str(tmp_path / "tenants.db"), window=3600, max_requests=3,
+                                  max_tokens=1000, max_concurrent=2)
+
+
+@pytest.fixture
+def tenant(registry):
+    _, key = registry.create("acme")
+    return registry.admit(key)
+
+
+def test_admit_rejects_unknown_key(registry):
+    with pytest.raises(tenants.Rejected) as error:
+        registry.admit("chave-inventada")
+    assert error.value.status == 401
+    with pytest.raises(tenants.Rejected):
+        registry.admit(None)
+
+
+def test_admit_only_checks(registry, tenant):
+    _, key = registry.create("outro")
+    for _ in range(5):
+        registry.admit(key)
+    assert registry.lookup(key).totals["requests"] == 0
+    assert registry.lookup(key).in_flight == 0
+
+
+def test_quota_counts_generations(registry, tenant):
+    registry.acquire(tenant, count=2)
+    registry.release(tenant)
+    assert tenant.totals["requests"] == 2
+    # Sobra 1: um pedido de 2 gerações passa da cota
+    with pytest.raises(tenants.Rejected) as error:
+        registry.acquire(tenant, count=2)
+    assert error.value.status == 429 and not isinstance(error.value, tenants.Busy)
+    assert error.value.retry_after > 0
+    registry.acquire(tenant)
+    registry.release(tenant)
+    with pytest.raises(tenants.Rejected):
+        registry.acquire(tenant)
+
+
+def test_admit_rejects_when_quota_is_spent(registry):
+    _, key = registry.create("cheio")
+    tenant = registry.admit(key)
+    registry.acquire(tenant, count=3)
+    registry.release(tenant)
+    with pytest.raises(tenants.Rejected) as error:
+        registry.admit(key)
+    assert "gerações" in str(error.value)
+
+
+def test_token_quota(registry, tenant):
+    registry.charge(tenant, "m", {"prompt_tokens": 600, "completion_tokens": 400})
+    assert tenant.totals["total_tokens"] == 1000
+    with pytest.raises(tenants.Rejected) as error:
+        registry.acquire(tenant)
+    assert "tokens" in str(error.value)
+
+
+def test_concurrency_slots(registry):
+    _, key = registry.create("ocupado")
+    tenant = registry.admit(key)
+    registry.acquire(tenant)
+    registry.acquire(tenant)
+    with pytest.raises(tenants.Busy):
+        registry.acquire(tenant)
+    # Requisição nova com todas as vagas ocupadas: 429 na entrada
+    with pytest.raises(tenants.Busy):
+        registry.admit(key)
+    with pytest.raises(tenants.Busy):
+        registry.acquire(tenant, timeout=0.05)
+    registry.release(tenant)
+    assert tenant.in_flight == 1
+
+
+def test_acquire_waits_for_a_freed_slot(registry, tenant):
+    registry.acquire(tenant)
+    registry.acquire(tenant)
+    threading.Timer(0.05, registry.release, (tenant,)).start()
+    registry.acquire(tenant, timeout=2)
+    assert tenant.in_flight == 2
+
+
+def test_generation_context_charges_current_tenant(monkeypatch, registry, tenant):
+    monkeypatch.setattr(tenants, "_registry", registry)
+    token = tenants.activate(tenant)
+    try:
+        with tenants.generation(2):
+            assert tenant.in_flight == 1
+        assert tenant.in_flight == 0
+        assert tenant.totals["requests"] == 2
+        assert tenants.scoped("k") == f"k:{tenant.id}"
+    finally:
+        tenants.deactivate(token)
+    # Sem tenant: nada é contado
+    with tenants.generation():
+        pass
+    assert tenant.totals["requests"] == 2
+    assert tenants.scoped("k") == "k"
+
+
+def test_sliding_window_expires():
+    window = tenants.SlidingWindow(60, slots=6)
+    window.add(5, now=1000)
+    window.add(2, now=1030)
+    assert window.value(1030) == 7
+    assert window.value(1065) == 2
+    assert window.value(1100) == 0
@@ -0,0 +1,80 @@
+"""Cliente compartilhado: conexões keep-alive reaproveitadas entre chamadas e threads"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import upstream
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        self.server.connections.add(self.client_address)
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.connections = set()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def client_for(server, **kwargs):
+    return upstream.UpstreamClient(base_url=f"http://127.0.0.1:{server.server_port}/api/v1", **kwargs)
+
+
+def test_sequential_calls_reuse_one_connection(server):
+    client = client_for(server)
+    for _ in range(5):
+        response = client.chat_completion({"model": "m"})
+        assert response.json()["choices"][0]["message"]["content"] == "ok"
+    assert len(server.connections) == 1
+    stats = client.stats()
+    assert (stats["connections_opened"], stats["requests"]) == (1, 5)
+    assert stats["reuse_rate"] == 0.8
+    client.close()
+
+
+def test_threads_share_the_pool_within_its_size(server):
+    client = client_for(server, pool_maxsize=2)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        statuses = list(pool.map(lambda _: client.chat_completion({"model": "m"}).status_code, range(20)))
+    assert statuses == [200] * 20
+    # pool_block: nunca mais conexões que pool_maxsize
+    assert len(server.connections) <= 2
+    assert client.limiter.in_flight == 0
+    client.close()
+
+
+def test_sessions_are_per_thread_over_one_adapter(server):
+    client = client_for(server)
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(client.session()))
+    thread.start()
+    thread.join()
+    assert sessions[0] is not client.session()
+    assert sessions[0].get_adapter("http://x") is client.session().get_adapter("http://x")
+
+
+def test_timeouts_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("UPSTREAM_CONNECT_TIMEOUT", "2")
+    monkeypatch.setenv("UPSTREAM_READ_TIMEOUT", "30")
+    assert upstream.UpstreamClient(base_url="http://127.0.0.1:1").timeout == (2.0, 30.0)
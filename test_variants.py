@@ -0,0 +1,62 @@
+"""Variantes: validação, nota local e escolha da melhor candidata"""
+import pytest
+
+import variants
+
+PARAMS = {"platform": "LinkedIn", "length": "Médio", "keywords": "marketing, dados"}
+GOOD = ("A IA mudou o marketing. Os dados mostram ganhos reais em campanhas.\n\n"
+        "Três lições para o seu time. Qual foi a sua?\n\n#IA #marketing #dados")
+BAD = "texto sem pontuação nem hashtags " * 30
+
+
+@pytest.mark.parametrize("value", [0, 6, "3", True, 2.5])
+def test_requested_rejects_invalid_counts(value):
+    count, error = variants.requested({"variants": value})
+    assert count is None and "variants" in error
+
+
+def test_requested_defaults_to_one():
+    assert variants.requested({}) == (1, None)
+    assert variants.requested({"variants": None}) == (1, None)
+    assert variants.requested({"variants": 3}) == (3, None)
+
+
+def test_rank_puts_the_best_candidate_first():
+    candidates = [{"content": BAD, "model": "m", "usage": {}}, {"content": GOOD, "model": "m", "usage": {}}]
+    ranked = variants.rank(candidates, PARAMS, (3, 5))
+    assert ranked[0]["article"] == GOOD
+    assert ranked[0]["score"] > ranked[1]["score"]
+    assert ranked[0]["scores"]["hashtags"] == 1.0
+    assert ranked[0]["scores"]["keywords"] == 1.0
+
+
+def test_total_usage_counts_each_call_once():
+    completion = {"content": "a", "alternatives": ["a", "b"], "usage": {"total_tokens": 70}, "model": "m"}
+    candidates = variants.split(completion) + [{"content": "c", "usage": {"total_tokens": 30}, "model": "m"}]
+    assert variants.total_usage(candidates) == {"total_tokens": 100}
+
+
+def test_generate_returns_ranked_variants(client, fake_upstream):
+    fake_upstream.texts = [BAD, GOOD]
+    response = client.post("/generate", json={"topic": "IA no marketing", "keywords": "marketing, dados",
+                                              "variants": 2})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(fake_upstream.calls) == 2
+    assert body["metadata"]["variants"] == 2
+    assert body["metadata"]["score"] == body["variants"][0]["score"]
+    assert body["article"] == body["variants"][0]["article"]
+    assert "#IA" in body["article"]
+
+
+def test_variants_keep_the_model_that_answered(client, fake_upstream):
+    # Após failover, quem respondeu foi o modelo reserva
+    fake_upstream.model = "reserva/modelo"
+    response = client.post("/generate", json={"topic": "IA no marketing", "variants": 2})
+    assert {item["model"] for item in response.get_json()["variants"]} == {"reserva/modelo"}
+
+
+def test_invalid_variants_is_a_bad_request(client, fake_upstream):
+    response = client.post("/generate", json={"topic": "IA no marketing", "variants": 10})
+    assert response.status_code == 400
+    assert fake_upstream.calls == []
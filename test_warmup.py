@@ -0,0 +1,75 @@
+"""Aquecimento do cache: combinações template x tema, versões em rodízio e relatório"""
+import time
+
+import pytest
+
+import cache
+import warmup
+
+TEMPLATES = [
+    {"id": "a", "platform": "LinkedIn", "tone": "Profissional", "length": "curto", "example_topic": "IA no RH"},
+    {"id": "b", "platform": "Instagram", "tone": "Casual", "length": "curto"},
+]
+
+
+def test_combinations_add_topics_without_repeats():
+    specs = warmup.combinations(TEMPLATES, ["IA no RH", "Vendas"])
+    assert [(spec["template"], spec["topic"]) for spec in specs] == [
+        ("a", "IA no RH"), ("a", "Vendas"), ("b", "IA no RH"), ("b", "Vendas")]
+
+
+def test_load_topics_skips_blanks_and_comments(tmp_path):
+    path = tmp_path / "temas.txt"
+    path.write_text("# temas\nIA no RH\n\n  Vendas  \n", encoding="utf-8")
+    assert warmup.load_topics(str(path)) == ["IA no RH", "Vendas"]
+    assert warmup.load_topics(None) == []
+
+
+def test_in_window_wraps_midnight():
+    at = lambda hour: time.mktime((2024, 1, 2, hour, 30, 0, 0, 0, -1))
+    assert warmup.in_window("2-6", at(3)) and not warmup.in_window("2-6", at(6))
+    assert warmup.in_window("22-4", at(23)) and warmup.in_window("22-4", at(1))
+    assert not warmup.in_window("22-4", at(12))
+    assert warmup.in_window("", at(12))
+
+
+@pytest.fixture
+def warmed(app_module, fake_upstream, monkeypatch):
+    """Aplicação configurada no warmup, com um cache de respostas só em memória"""
+    fake_upstream.texts = ["Versão um.", "Versão dois."]
+    monkeypatch.setattr(warmup, "_app", None)
+    warmup.configure(*app_module.WARMUP)
+    responses = cache.ResponseCache()
+    monkeypatch.setattr(cache, "_cache", responses)
+    monkeypatch.setattr(cache, "_configured", True)
+    specs = warmup.combinations(app_module.WARMUP[3], ["IA no marketing"])[:2]
+    return specs, responses
+
+
+def test_warm_fills_variants_and_keeps_fresh_entries(warmed, fake_upstream):
+    specs, responses = warmed
+    report = warmup.warm(specs, responses, variants=2, concurrency=2)
+    assert (report["warmed"], report["variants"], report["calls"]) == (2, 4, 4)
+    assert report["total_tokens"] == 4 * 70
+    again = warmup.warm(specs, responses, variants=2)
+    assert (again["fresh"], again["calls"]) == (2, 0)
+    assert len(fake_upstream.calls) == 4
+
+
+def test_dry_run_does_not_call_upstream(warmed, fake_upstream):
+    specs, responses = warmed
+    report = warmup.warm(specs, responses, variants=3, dry_run=True)
+    assert report["pending"] == 2 and report["warmed"] == 0
+    assert fake_upstream.calls == []
+
+
+def test_generate_serves_the_warmed_versions(warmed, client, fake_upstream, monkeypatch):
+    monkeypatch.setenv("GENERATION_CACHE", "1")
+    specs, responses = warmed
+    warmup.warm(specs[:1], responses, variants=2, concurrency=1)
+    calls = len(fake_upstream.calls)
+    data = {key: specs[0][key] for key in ("topic", "platform", "tone", "length")}
+    articles = {client.post("/generate", json=data).get_json()["article"] for _ in range(2)}
+    assert articles == {"Versão um.", "Versão dois."}
+    assert len(fake_upstream.calls) == calls
+    assert responses.stats()["warm_hits"] == 2
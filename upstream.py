@@ -0,0 +1,282 @@
+"""Cliente HTTP compartilhado para as chamadas à API OpenRouter.
+
+Mantém um pool de conexões keep-alive limitado por host, de forma que cada
+geração reaproveita conexões TCP/TLS já abertas em vez de pagar DNS, connect
+e handshake a cada requisição. O número de chamadas simultâneas passa por um
+limitador adaptativo (limits.py) que recua quando o provedor dá sinais de
+sobrecarga.
+"""
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import limits
+import metrics
+
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+
+_httpx = None
+
+
+def load_httpx():
+    """httpx, importado no primeiro uso; None se não estiver instalado.
+
+    Opcional e só usado pelo caminho ASGI (asgi_app.py): as aplicações
+    Flask não pagam o import na partida.
+    """
+    global _httpx
+    if _httpx is None:
+        try:
+            import httpx
+        except ImportError:
+            return None
+        _httpx = httpx
+    return _httpx
+
+
+def __getattr__(name):
+    # upstream.httpx continua valendo para quem trata as exceções do httpx
+    if name == "httpx":
+        return load_httpx()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _TimedConnect:
+    """Mede o connect (TCP + TLS) de cada conexão nova do pool"""
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        metrics.observe_stage("upstream_connect", time.perf_counter() - started)
+
+
+class TimedHTTPConnection(_TimedConnect, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnect, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool
+        }
+
+
+def _httpx_trace(started):
+    """Callback de trace do httpx: connect e tempo até os headers (TTFB)"""
+    marks = {}
+
+    async def trace(event, info):
+        now = time.perf_counter()
+        if event == "connection.connect_tcp.started":
+            marks["connect"] = now
+        elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            marks["connected"] = now
+        elif event.endswith("receive_response_headers.complete"):
+            if "connect" in marks and "connected" in marks:
+                metrics.observe_stage("upstream_connect", marks["connected"] - marks["connect"])
+            metrics.observe_stage("upstream_ttfb", now - started)
+
+    return trace
+
+
+class UpstreamClient:
+    """Pool de conexões thread-safe para a OpenRouter.
+
+    O adaptador (e portanto o pool do urllib3) é único e compartilhado;
+    cada thread recebe sua própria ``requests.Session`` montada sobre ele,
+    já que o estado da sessão (cookies, headers) não é thread-safe.
+    """
+
+    def __init__(self, base_url=None, pool_connections=None, pool_maxsize=None,
+                 pool_block=None, connect_timeout=None, read_timeout=None):
+        self.base_url = (base_url or os.getenv("OPENROUTER_BASE_URL", DEFAULT_BASE_URL)).rstrip("/")
+        self.connect_timeout = float(connect_timeout if connect_timeout is not None
+                                     else os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = float(read_timeout if read_timeout is not None
+                                  else os.getenv("UPSTREAM_READ_TIMEOUT", "45"))
+
+        # pool_connections: quantos hosts distintos ficam em cache
+        # pool_maxsize: limite de conexões simultâneas por host
+        # pool_block: quando o pool está cheio, espera por uma conexão livre
+        # em vez de abrir conexões extras descartáveis
+        if pool_block is None:
+            pool_block = os.getenv("UPSTREAM_POOL_BLOCK", "1") not in ("0", "false", "False")
+        pool_maxsize = int(pool_maxsize or os.getenv("UPSTREAM_POOL_MAXSIZE", "20"))
+        self._adapter = TimedHTTPAdapter(
+            pool_connections=int(pool_connections or os.getenv("UPSTREAM_POOL_CONNECTIONS", "4")),
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0
+        )
+        self._local = threading.local()
+        self.limiter = limits.AdaptiveLimiter(
+            **limits.upstream_limit_settings(maximum=pool_maxsize, initial=10, max_queue=100))
+        metrics.register_limiter(self.limiter, "sync")
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def session(self):
+        """Retorna a sessão da thread atual, criando-a se necessário"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            self._local.session = session
+        return session
+
+    def post(self, path, payload, headers=None, stream=False, timeout=None):
+        """POST JSON para ``base_url + path`` reaproveitando o pool.
+
+        Levanta ``limits.Overloaded`` se não houver vaga no limitador. Com
+        ``stream=True`` a vaga é liberada quando chegam os headers.
+        """
+        self.limiter.acquire()
+        started = time.perf_counter()
+        overloaded = True  # exceções (timeout, conexão) também contam como sobrecarga
+        counted = True  # erros do pedido (400, 401...) não ajustam o limite
+        status = "error"
+        try:
+            response = self.session().post(
+                f"{self.base_url}{path}",
+                json=payload,
+                headers=headers,
+                stream=stream,
+                timeout=timeout or self.timeout
+            )
+            overloaded = response.status_code in limits.OVERLOAD_STATUS
+            status = response.status_code
+            counted = overloaded or status < 400
+            # elapsed: do envio até os headers da resposta
+            metrics.observe_stage("upstream_ttfb", response.elapsed.total_seconds())
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            self.limiter.release(elapsed, overloaded, counted)
+            if not stream:
+                metrics.observe_stage("upstream_total", elapsed)
+            metrics.UPSTREAM_REQUESTS.labels(model=payload.get("model", ""), status=status).inc()
+
+    def chat_completion(self, payload, headers=None, stream=False, timeout=None):
+        """Chama /chat/completions"""
+        return self.post("/chat/completions", payload, headers=headers, stream=stream, timeout=timeout)
+
+    def stats(self):
+        """Conexões abertas x requisições feitas pelo pool (taxa de reuso)"""
+        pools = self._adapter.poolmanager.pools
+        connections = 0
+        requests_made = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            requests_made += pool.num_requests
+        reuse_rate = 1 - connections / requests_made if requests_made else 0.0
+        return {
+            "connections_opened": connections,
+            "requests": requests_made,
+            "reuse_rate": round(reuse_rate, 4)
+        }
+
+    def close(self):
+        self._adapter.close()
+
+
+class AsyncUpstreamClient:
+    """Equivalente não-bloqueante de UpstreamClient (httpx.AsyncClient).
+
+    Cada geração em andamento ocupa só uma corrotina e uma conexão, então
+    um único processo consegue manter milhares de chamadas aguardando o
+    provedor. O cliente httpx é criado na primeira chamada, já dentro do
+    event loop que vai usá-lo.
+    """
+
+    def __init__(self, base_url=None, max_connections=None, max_keepalive=None,
+                 connect_timeout=None, read_timeout=None):
+        if load_httpx() is None:
+            raise RuntimeError("O modo assíncrono requer o pacote httpx (pip install httpx)")
+        self.base_url = (base_url or os.getenv("OPENROUTER_BASE_URL", DEFAULT_BASE_URL)).rstrip("/")
+        self.connect_timeout = float(connect_timeout if connect_timeout is not None
+                                     else os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = float(read_timeout if read_timeout is not None
+                                  else os.getenv("UPSTREAM_READ_TIMEOUT", "45"))
+        self.max_connections = int(max_connections or os.getenv("ASYNC_UPSTREAM_MAX_CONNECTIONS", "1000"))
+        self.max_keepalive = int(max_keepalive or os.getenv("ASYNC_UPSTREAM_MAX_KEEPALIVE", "100"))
+        self._client = None
+        self.limiter = limits.AsyncAdaptiveLimiter(
+            **limits.upstream_limit_settings(maximum=self.max_connections, initial=100, max_queue=1000,
+                                             prefix="ASYNC_UPSTREAM"))
+        metrics.register_limiter(self.limiter, "async")
+
+    def client(self):
+        if self._client is None:
+            httpx = load_httpx()
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_keepalive),
+                # pool: quanto esperar por uma conexão livre quando o limite é atingido
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout,
+                                      pool=self.read_timeout)
+            )
+        return self._client
+
+    async def chat_completion(self, payload, headers=None):
+        await self.limiter.acquire()
+        started = time.perf_counter()
+        overloaded = True
+        counted = True
+        status = "error"
+        try:
+            response = await self.client().post("/chat/completions", json=payload, headers=headers,
+                                                extensions={"trace": _httpx_trace(started)})
+            overloaded = response.status_code in limits.OVERLOAD_STATUS
+            status = response.status_code
+            counted = overloaded or status < 400
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            await self.limiter.release(elapsed, overloaded, counted)
+            metrics.observe_stage("upstream_total", elapsed)
+            metrics.UPSTREAM_REQUESTS.labels(model=payload.get("model", ""), status=status).inc()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Cliente compartilhado do processo (criado na primeira chamada)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = UpstreamClient()
+    return _client
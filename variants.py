@@ -0,0 +1,195 @@
+"""Várias versões de um post numa única requisição (``"variants": N`` em /generate).
+
+As N candidatas são pedidas em paralelo à OpenRouter (ou numa única chamada
+com o parâmetro ``n``, com VARIANTS_USE_N=1, para modelos que o aceitam) e
+pontuadas localmente, sem outra chamada ao modelo:
+
+- extensão: cabe no limite da plataforma e chega perto do tamanho pedido;
+- hashtags: quantidade dentro da faixa da plataforma;
+- legibilidade: frases e parágrafos curtos;
+- palavras-chave: fração das palavras-chave pedidas presentes no texto.
+
+A melhor candidata vai em ``article`` e a lista ordenada, com as notas, em
+``variants``. Uma ida e volta em paralelo substitui vários cliques em
+"gerar" seguidos.
+
+Configuração:
+    VARIANTS_MAX=5      máximo de candidatas por requisição
+    VARIANTS_USE_N=0    pede as candidatas numa única chamada com ``n``
+"""
+import contextvars
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import budget
+
+# Peso de cada critério na nota final (soma 1)
+WEIGHTS = {
+    "length": 0.3,
+    "hashtags": 0.2,
+    "readability": 0.25,
+    "keywords": 0.25
+}
+
+# Legibilidade: acima disso a nota começa a cair
+MAX_SENTENCE_WORDS = 20
+MAX_PARAGRAPH_WORDS = 60
+
+HASHTAG = re.compile(r"#\w+")
+SENTENCE_END = re.compile(r"[.!?…]+(?=\s|$)")
+WORD = re.compile(r"\w+")
+KEYWORD_SEPARATOR = re.compile(r"[,;\s]+")
+
+
+def max_variants():
+    return int(os.getenv("VARIANTS_MAX", "5"))
+
+
+def use_n():
+    return os.getenv("VARIANTS_USE_N", "0") == "1"
+
+
+def requested(data):
+    """Número de candidatas pedido; retorna (n, mensagem_de_erro)"""
+    value = data.get("variants", 1) if isinstance(data, dict) else 1
+    if value is None:
+        return 1, None
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= max_variants():
+        return None, f"'variants' deve ser um inteiro entre 1 e {max_variants()}"
+    return value, None
+
+
+def closeness(value, low, high, tolerance):
+    """1 dentro de [low, high]; cai linearmente até 0 a ``tolerance`` da faixa"""
+    if low <= value <= high:
+        return 1.0
+    distance = low - value if value < low else value - high
+    return max(0.0, 1 - distance / max(tolerance, 1))
+
+
+def length_score(text, platform, length):
+    max_chars = budget.PLATFORM_MAX_CHARS.get(platform)
+    target = budget.target_words(platform, length) * budget.CHARS_PER_WORD
+    high = max_chars or target * 1.5
+    # Passar do limite da plataforma pesa mais que ficar curto
+    if max_chars and len(text) > max_chars:
+        return closeness(len(text), 0, max_chars, max_chars * 0.1)
+    return closeness(len(text), target * 0.5, high, target * 0.5)
+
+
+def hashtag_score(text, hashtag_range):
+    low, high = hashtag_range
+    return closeness(len(HASHTAG.findall(text)), low, high, max(2, high))
+
+
+def readability_score(text):
+    """Média de duas notas: palavras por frase e palavras por parágrafo"""
+    # Hashtags e linhas só com elas não contam como frase
+    prose = HASHTAG.sub("", text)
+    sentences = [s for s in SENTENCE_END.split(prose) if WORD.search(s)]
+    paragraphs = [p for p in re.split(r"\n\s*\n", prose) if WORD.search(p)]
+    if not sentences:
+        return 0.0
+    words = len(WORD.findall(prose))
+    per_sentence = words / len(sentences)
+    per_paragraph = words / max(len(paragraphs), 1)
+    return (closeness(per_sentence, 0, MAX_SENTENCE_WORDS, MAX_SENTENCE_WORDS)
+            + closeness(per_paragraph, 0, MAX_PARAGRAPH_WORDS, MAX_PARAGRAPH_WORDS)) / 2
+
+
+def keyword_score(text, keywords):
+    """Fração das palavras-chave presentes (1 se nenhuma foi pedida)"""
+    terms = {term.lstrip("#").lower() for term in KEYWORD_SEPARATOR.split(str(keywords or ""))}
+    terms.discard("")
+    if not terms:
+        return 1.0
+    lowered = text.lower()
+    return sum(term in lowered for term in terms) / len(terms)
+
+
+def score(text, params, hashtag_range):
+    """Nota final (0 a 1) e a nota de cada critério"""
+    scores = {
+        "length": length_score(text, params['platform'], params['length']),
+        "hashtags": hashtag_score(text, hashtag_range),
+        "readability": readability_score(text),
+        "keywords": keyword_score(text, params.get('keywords'))
+    }
+    total = sum(WEIGHTS[name] * value for name, value in scores.items())
+    return round(total, 3), {name: round(value, 3) for name, value in scores.items()}
+
+
+def rank(candidates, params, hashtag_range):
+    """Candidatas pontuadas, da melhor para a pior"""
+    ranked = []
+    for candidate in candidates:
+        total, scores = score(candidate["content"], params, hashtag_range)
+        ranked.append({
+            "article": candidate["content"],
+            "score": total,
+            "scores": scores,
+            "model": candidate["model"],
+            "characters": len(candidate["content"])
+        })
+    # sorted é estável: empate fica com a que chegou primeiro
+    return sorted(ranked, key=lambda item: item["score"], reverse=True)
+
+
+def total_usage(candidates):
+    """Soma do usage das chamadas (cada chamada contada uma vez)"""
+    usage = {}
+    for candidate in candidates:
+        if candidate.get("shared_usage"):
+            continue
+        for key, value in candidate["usage"].items():
+            if isinstance(value, (int, float)):
+                usage[key] = usage.get(key, 0) + value
+    return usage
+
+
+def split(completion):
+    """Candidatas de uma resposta com ``n`` escolhas (ver fetch_completion)"""
+    contents = completion.get("alternatives") or [completion["content"]]
+    return [dict(completion, content=content, shared_usage=index > 0)
+            for index, content in enumerate(contents)]
+
+
+def collect(outcomes):
+    """Junta os resultados das chamadas; retorna (candidatas, corpo_de_erro).
+
+    Cada resultado é ``(completion, corpo_de_erro)`` ou a exceção levantada.
+    Sem nenhuma candidata, a primeira exceção é relançada (e tratada como
+    numa geração simples); sem exceções, vale o primeiro corpo de erro.
+    """
+    candidates = []
+    error_body = None
+    error = None
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            error = error or outcome
+            continue
+        completion, body = outcome
+        if body:
+            error_body = error_body or body
+        else:
+            candidates.extend(split(completion))
+    if not candidates and error_body is None and error is not None:
+        raise error
+    return candidates, error_body
+
+
+def fetch(payload, n, fetch_completion):
+    """``n`` candidatas para o payload; retorna (candidatas, corpo_de_erro)"""
+    if use_n():
+        return collect([fetch_completion(dict(payload, n=n))])
+
+    def attempt(context):
+        try:
+            return context.run(fetch_completion, payload)
+        except Exception as e:
+            return e
+
+    # Cada chamada com uma cópia do contexto da requisição (ex.: o tenant de tenants.py)
+    with ThreadPoolExecutor(max_workers=n, thread_name_prefix="variants") as pool:
+        return collect(list(pool.map(attempt, [contextvars.copy_context() for _ in range(n)])))
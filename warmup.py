@@ -0,0 +1,248 @@
+"""Aquecimento do cache de respostas com os templates mais usados.
+
+Os templates de /templates (e o ``example_topic`` de cada um) costumam ser
+usados sem mudança, e cada clique vira uma chamada fria à OpenRouter. Este
+comando gera de antemão, fora do horário de pico, as combinações template x
+tema e grava no cache de respostas (cache.py) algumas versões de cada uma,
+com validade própria: quem clica recebe o texto na hora e, como as versões
+se alternam a cada acerto, não vê sempre o mesmo post.
+
+As combinações são os templates com o ``example_topic`` e com cada tema da
+lista (``--topics``, um por linha, ``#`` para comentários). O payload é
+montado pela própria aplicação, então a chave bate com a de /generate e de
+/generate/stream. Entradas ainda com mais de ``--refresh`` da validade são
+mantidas; as demais são geradas de novo (rotação diária, com o TTL padrão).
+
+O cache precisa do nível em disco (GENERATION_CACHE_PATH) compartilhado com
+o servidor: é por ele que o texto aquecido chega aos processos web.
+
+    GENERATION_CACHE_PATH=cache.db python warmup.py app-simply --topics temas.txt \\
+        --variants 3 --concurrency 2 --hours 2-6
+
+Ou agendado, por exemplo no cron, às 3h:
+
+    0 3 * * * cd /srv/app && GENERATION_CACHE_PATH=cache.db python warmup.py app-simply
+
+Ao final, o relatório mostra a cobertura dos templates e o gasto com a
+OpenRouter; os acertos servidos pelo cache aquecido aparecem em /stats
+(``cache.warm_hits`` e ``cache.tokens_saved``).
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import budget
+import cache
+
+_app = None
+
+
+def configure(validate, build_payload, fetch_completion, templates):
+    """Registra como a aplicação monta e executa uma geração (``WARMUP`` do módulo da aplicação)"""
+    global _app
+    _app = (validate, build_payload, fetch_completion, templates)
+
+
+def load_topics(path):
+    """Temas do arquivo: um por linha, sem linhas vazias nem comentários"""
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+def combinations(templates, topics):
+    """Especificações template x tema, sem repetição"""
+    specs = []
+    seen = set()
+    for template in templates:
+        template_topics = [template["example_topic"]] if template.get("example_topic") else []
+        for topic in template_topics + list(topics):
+            spec = {
+                "topic": topic,
+                "platform": template["platform"],
+                "tone": template["tone"],
+                "length": template["length"]
+            }
+            key = (topic, spec["platform"], spec["tone"], spec["length"])
+            if key not in seen:
+                seen.add(key)
+                specs.append(dict(spec, template=template["id"]))
+    return specs
+
+
+def in_window(hours, now=None):
+    """True se a hora local está na janela "INÍCIO-FIM" (fim exclusivo, pode virar a meia-noite)"""
+    if not hours:
+        return True
+    start, _, end = hours.partition("-")
+    start, end = int(start), int(end)
+    hour = time.localtime(now).tm_hour
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+def cost_usd(model, usage):
+    prices = budget.prices_for(model)
+    if not prices or not usage:
+        return None
+    return (usage.get("prompt_tokens", 0) * prices[0] + usage.get("completion_tokens", 0) * prices[1]) / 1e6
+
+
+def warm(specs, response_cache, variants=3, concurrency=2, ttl=86400, refresh=0.25, dry_run=False):
+    """Gera e grava as combinações que faltam; retorna o relatório"""
+    validate, build_payload, fetch_completion, _ = _app
+    report = {
+        "combinations": len(specs), "warmed": 0, "fresh": 0, "failed": 0, "invalid": 0,
+        "variants": 0, "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+        "cost_usd": None, "projected_cost_usd": None
+    }
+    pending = []
+    for spec in specs:
+        params, error = validate({k: v for k, v in spec.items() if k != "template"})
+        if error:
+            print(f"  ignorado ({spec['template']}): {error}")
+            report["invalid"] += 1
+            continue
+        payload = build_payload(params)
+        key = cache.cache_key(payload)
+        if response_cache.remaining(key) > ttl * refresh:
+            report["fresh"] += 1
+            continue
+        pending.append((spec, payload, key))
+
+    if dry_run:
+        # Só a previsão do gasto (budget.estimate), sem chamar a OpenRouter
+        projected = [budget.estimate(payload)["projected_cost_usd"] for _, payload, _ in pending]
+        if projected and None not in projected:
+            report["projected_cost_usd"] = round(sum(projected) * variants, 6)
+        report["pending"] = len(pending)
+        return report
+
+    # Uma tarefa por versão: ``concurrency`` limita as chamadas simultâneas no total
+    results = {key: [] for _, _, key in pending}
+    cost = 0.0
+    priced = True
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="warmup") as pool:
+        futures = {pool.submit(fetch_completion, payload): (spec, payload, key)
+                   for spec, payload, key in pending for _ in range(variants)}
+        for future in as_completed(futures):
+            spec, payload, key = futures[future]
+            report["calls"] += 1
+            try:
+                completion, error_body = future.result()
+            except Exception as e:
+                completion, error_body = None, {"error": str(e)}
+            if error_body:
+                print(f"  falha ({spec['template']}, {spec['topic'][:40]}): {error_body.get('error')}")
+                continue
+            results[key].append(completion)
+            usage = completion.get("usage") or {}
+            for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                report[field] += usage.get(field, 0)
+            call_cost = cost_usd(completion.get("model") or payload["model"], usage)
+            if call_cost is None:
+                priced = False
+            else:
+                cost += call_cost
+
+    for spec, payload, key in pending:
+        completions = results[key]
+        if not completions:
+            report["failed"] += 1
+            continue
+        response_cache.set(key, {"variants": completions}, ttl=ttl)
+        report["warmed"] += 1
+        report["variants"] += len(completions)
+    report["cost_usd"] = round(cost, 6) if priced else None
+    return report
+
+
+def print_report(report, elapsed):
+    valid = report["combinations"] - report["invalid"]
+    covered = report["warmed"] + report["fresh"]
+    coverage = covered / valid * 100 if valid else 0.0
+    print(f"combinações: {report['combinations']}  aquecidas: {report['warmed']}  "
+          f"já válidas: {report['fresh']}  falhas: {report['failed']}")
+    print(f"cobertura: {covered}/{valid} ({coverage:.1f}%) em {elapsed:.1f}s")
+    if "pending" in report:
+        cost = report["projected_cost_usd"]
+        print(f"simulação: {report['pending']} combinações a gerar, "
+              f"custo previsto {'US$ %.4f' % cost if cost is not None else 'desconhecido'}")
+        return
+    cost = report["cost_usd"]
+    print(f"versões geradas: {report['variants']} em {report['calls']} chamadas, "
+          f"{report['total_tokens']} tokens (entrada {report['prompt_tokens']}, saída {report['completion_tokens']}), "
+          f"custo {'US$ %.4f' % cost if cost is not None else 'desconhecido'}")
+    if report["variants"]:
+        # Cada clique servido do cache deixa de gastar uma geração
+        per_hit = report["total_tokens"] / report["variants"]
+        line = f"cada clique servido do cache poupa ~{per_hit:.0f} tokens"
+        if cost:
+            line += f" (US$ {cost / report['variants']:.5f})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-gera os templates de /templates no cache de respostas")
+    parser.add_argument("app", nargs="?", default="app-simply", help="módulo da aplicação (app ou app-simply)")
+    parser.add_argument("--topics", help="arquivo com temas extras, um por linha")
+    parser.add_argument("--variants", type=int, default=int(os.getenv("WARMUP_VARIANTS", "3")),
+                        help="versões por combinação, servidas em rodízio")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("WARMUP_CONCURRENCY", "2")),
+                        help="chamadas simultâneas à OpenRouter")
+    parser.add_argument("--ttl", type=float, default=float(os.getenv("WARMUP_TTL", "86400")),
+                        help="validade das entradas aquecidas, em segundos")
+    parser.add_argument("--refresh", type=float, default=0.25,
+                        help="gera de novo entradas com menos que esta fração da validade")
+    parser.add_argument("--hours", default=os.getenv("WARMUP_HOURS", ""),
+                        help='janela fora de pico, "INÍCIO-FIM" na hora local (ex.: 2-6)')
+    parser.add_argument("--every", type=float, default=0,
+                        help="repete a cada N segundos (dentro da janela) em vez de sair")
+    parser.add_argument("--dry-run", action="store_true", help="só mostra o que seria gerado e o custo previsto")
+    parser.add_argument("--json", action="store_true", help="relatório em JSON")
+    args = parser.parse_args()
+
+    # Sem o cache ligado não há onde gravar; sem o disco o texto morre com este processo
+    os.environ.setdefault("GENERATION_CACHE", "1")
+    module = importlib.import_module(args.app)
+    # A aplicação não importa este módulo (fica fora da partida): expõe WARMUP
+    if getattr(module, "WARMUP", None) is not None:
+        configure(*module.WARMUP)
+    response_cache = cache.get_cache()
+    if response_cache is None or not response_cache.stats()["disk"]:
+        print("ERRO: configure GENERATION_CACHE_PATH (o mesmo do servidor) para o cache aquecido chegar a ele")
+        sys.exit(2)
+    if _app is None:
+        print(f"ERRO: {args.app} não define WARMUP")
+        sys.exit(2)
+    if not args.dry_run and not getattr(module, "OPENROUTER_API_KEY", None):
+        print("ERRO: OPENROUTER_API_KEY não configurada")
+        sys.exit(2)
+
+    specs = combinations(_app[3], load_topics(args.topics))
+    if not specs:
+        print("Nenhuma combinação: os templates não têm example_topic; informe --topics")
+        sys.exit(2)
+    while True:
+        if in_window(args.hours):
+            started = time.perf_counter()
+            report = warm(specs, response_cache, args.variants, args.concurrency, args.ttl, args.refresh,
+                          args.dry_run)
+            if args.json:
+                print(json.dumps(report, ensure_ascii=False))
+            else:
+                print_report(report, time.perf_counter() - started)
+        elif not args.every:
+            print(f"fora da janela {args.hours}h; nada a fazer")
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Workers da fila de jobs num processo separado do servidor web.
+
+Com JOBS_BROKER=sqlite os servidores web podem só enfileirar (JOB_WORKERS=0)
+e a execução fica com quantos processos forem necessários, apontando para o
+mesmo JOBS_DB_PATH:
+
+    JOBS_BROKER=sqlite python worker.py app-simply --workers 8
+
+O módulo da aplicação é importado para registrar a geração usada pelos
+jobs (o mesmo caminho de /generate).
+"""
+import argparse
+import importlib
+import os
+import time
+
+import jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa jobs de POST /jobs")
+    parser.add_argument("app", nargs="?", default="app-simply", help="módulo da aplicação (app ou app-simply)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("JOB_WORKERS", "4")))
+    args = parser.parse_args()
+
+    if os.getenv("JOBS_BROKER", "memory") != "sqlite":
+        print("AVISO: sem JOBS_BROKER=sqlite este processo só vê jobs criados por ele mesmo")
+
+    os.environ["JOB_WORKERS"] = str(args.workers)
+    importlib.import_module(args.app)
+    job_queue = jobs.get_queue()
+    print(f"{args.workers} workers ({job_queue.broker.name}) em {job_queue.store.path}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()